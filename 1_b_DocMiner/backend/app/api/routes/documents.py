@@ -1,15 +1,16 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Optional
 import os
 import tempfile
 from datetime import datetime
 
-from app.services.document_parser import DocumentParser
 from app.services.chunking import TextChunker
 from app.services.embeddings import EmbeddingService
 from app.services.vector_store import VectorStore
+from app.services.ingestion_queue import IngestionQueue, IngestionQueueFull
+from app.services.search_cache import QueryEmbeddingCache, SearchResultCache
 from app.models.schemas import (
-    DocumentUploadResponse, 
     DocumentListResponse, 
     DocumentDeleteResponse,
     DocumentChunk
@@ -18,14 +19,17 @@ from app.models.schemas import (
 router = APIRouter()
 
 # Initialize services
-document_parser = DocumentParser()
-chunker = TextChunker(max_chars=1000, overlap=100)
-embedding_service = EmbeddingService()
-vector_store = VectorStore()
+embedding_service = EmbeddingService(query_cache=QueryEmbeddingCache(max_size=1024))
+# Chunks fit the model's sequence length, longer chunks would be truncated when embedded
+chunker = TextChunker(token_counter=embedding_service.count_tokens, max_tokens=embedding_service.max_tokens,
+                      overlap_tokens=16)
+vector_store = VectorStore(embedding_model=embedding_service.model_name, batch_size=256,
+                           result_cache=SearchResultCache(ttl=60.0, max_size=512))
+ingestion_queue = IngestionQueue(chunker, embedding_service, vector_store, max_workers=2, embed_batch_size=32)
 
-@router.post("/upload", response_model=DocumentUploadResponse)
+@router.post("/upload", status_code=status.HTTP_202_ACCEPTED)
 async def upload_document(file: UploadFile = File(...)):
-    """Upload and index a document"""
+    """Upload a document and queue it for indexing, poll /jobs/{job_id} for its progress"""
     try:
         # Validate file type
         allowed_extensions = ['.pdf', '.docx', '.txt']
@@ -43,47 +47,42 @@ async def upload_document(file: UploadFile = File(...)):
             temp_file.write(content)
             temp_file_path = temp_file.name
         
+        # Parsing, chunking and embedding run on the ingestion workers, the job deletes the file
         try:
-            # Parse document
-            text, language = document_parser.parse_document(temp_file_path)
-            
-            if not text.strip():
-                raise HTTPException(status_code=400, detail="No text content found in document")
-            
-            # Chunk the text
-            chunks = chunker.chunk_text(text, file.filename, language)
-            
-            if not chunks:
-                raise HTTPException(status_code=400, detail="No chunks created from document")
-            
-            # Generate embeddings for all chunks
-            texts = [chunk["text"] for chunk in chunks]
-            embeddings = embedding_service.generate_embeddings(texts)
-            
-            # Add embeddings to chunks
-            for i, chunk in enumerate(chunks):
-                chunk["embedding"] = embeddings[i]
-            
-            # Store in vector database
-            chunks_added = vector_store.add_documents(chunks)
-            
-            return DocumentUploadResponse(
-                success=True,
-                message=f"Document '{file.filename}' indexed successfully",
-                document_id=file.filename,
-                chunks_created=chunks_added
-            )
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            job = ingestion_queue.submit(file.filename, temp_file_path)
+        except IngestionQueueFull as e:
+            os.unlink(temp_file_path)
+            raise HTTPException(status_code=503, detail=str(e))
+        
+        return {
+            "success": True,
+            "message": f"Document '{file.filename}' queued for indexing",
+            "document_id": file.filename,
+            "job": job.to_dict()
+        }
                 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
 
+@router.get("/jobs")
+async def list_ingestion_jobs():
+    """List the ingestion jobs, newest first"""
+    jobs = ingestion_queue.list_jobs()
+    return {
+        "jobs": [job.to_dict() for job in jobs],
+        "total_count": len(jobs)
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(job_id: str):
+    """Get the status and progress of an ingestion job"""
+    job = ingestion_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
+
 @router.get("/list", response_model=DocumentListResponse)
 async def list_documents(
     limit: Optional[int] = Query(None, description="Maximum number of documents to return"),
@@ -137,6 +136,11 @@ async def get_stats():
     """Get collection statistics"""
     try:
         stats = vector_store.get_collection_stats()
+        stats["ingestion_jobs"] = ingestion_queue.get_stats()
+        stats["cache"] = {
+            "query_embeddings": embedding_service.query_cache.get_stats(),
+            "search_results": vector_store.result_cache.get_stats()
+        }
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting stats: {str(e)}")
@@ -150,7 +154,12 @@ async def search_documents(
     """Search for similar documents"""
     try:
         filter_metadata = {"language": language} if language else None
-        results = vector_store.search_documents(query, n_results, filter_metadata)
+        # Embed the query with the model the chunks were embedded with, on a worker thread:
+        # encoding blocks, and waits for the model lock while ingestion embeds a micro-batch
+        query_embedding = await run_in_threadpool(embedding_service.embed_query, query)
+        results = await run_in_threadpool(
+            vector_store.search_documents, query, n_results, filter_metadata, query_embedding
+        )
         
         return {
             "query": query,
@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import documents
+from app.api.routes.documents import ingestion_queue
 
 app = FastAPI(
     title="DocMiner API",
@@ -20,6 +21,11 @@ app.add_middleware(
 # Include routers
 app.include_router(documents.router, prefix="/api/documents", tags=["documents"])
 
+@app.on_event("shutdown")
+def shutdown_event():
+    # Let the running ingestion jobs finish
+    ingestion_queue.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "DocMiner API is running"}
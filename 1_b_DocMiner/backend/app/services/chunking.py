@@ -1,101 +1,187 @@
 import re
-from typing import List, Dict
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
 from datetime import datetime
 
+# Gap after a sentence end (English and Arabic punctuation) or a paragraph break
+_BOUNDARY = re.compile(r'(?<=[.!?؛؟،])\s+|\n\s*\n')
+_WORD = re.compile(r'\S+')
+_WHITESPACE = re.compile(r'\s+')
+
 class TextChunker:
-    """Chunk text into smaller pieces for embedding"""
-    
-    def __init__(self, max_chars: int = 1000, overlap: int = 100):
+    """
+    Chunk text into smaller pieces for embedding
+    Sizes are counted in tokens when a token counter is given, in characters otherwise
+    """
+
+    def __init__(self, max_chars: int = 1000, overlap: int = 100,
+                 token_counter: Optional[Callable[[List[str]], List[int]]] = None,
+                 max_tokens: Optional[int] = None, overlap_tokens: int = 16):
         self.max_chars = max_chars
         self.overlap = overlap
-    
+        self.token_counter = token_counter
+        if token_counter is not None:
+            if not max_tokens:
+                raise ValueError("max_tokens is required with a token counter")
+            self.limit, self.overlap_size = max_tokens, overlap_tokens
+        else:
+            self.limit, self.overlap_size = max_chars, overlap
+
     def chunk_text(self, text: str, filename: str, language: str) -> List[Dict]:
         """Chunk text into smaller pieces with metadata"""
-        chunks = []
-        
-        # Clean and normalize text
-        text = self._clean_text(text)
-        
-        # Split by paragraphs first
-        paragraphs = self._split_by_paragraphs(text)
-        
-        current_chunk = ""
+        return list(self.iter_chunks([text], filename, language))
+
+    def iter_chunks(self, pages: Iterable[str], filename: str, language: str,
+                    paged: bool = False) -> Iterator[Dict]:
+        """
+        Yield chunks with metadata as soon as they are complete
+        pages is consumed lazily, only the pages of the pending chunk are kept,
+        and chunks are cut at sentence and paragraph ends, by offsets into the pages
+        paged adds the 1-based page_number where each chunk starts
+        """
+        upload_date = datetime.now().isoformat()
+        kept_pages: Dict[int, str] = {}
+        # Segments of the pending chunk as (page, start, end, size)
+        pending = deque()
+        pending_size = 0
         chunk_index = 0
-        
-        for paragraph in paragraphs:
-            # If adding this paragraph would exceed max_chars, save current chunk
-            if len(current_chunk) + len(paragraph) > self.max_chars and current_chunk:
-                chunks.append(self._create_chunk_metadata(
-                    current_chunk, filename, language, chunk_index
-                ))
-                chunk_index += 1
-                
-                # Start new chunk with overlap
-                current_chunk = self._get_overlap(current_chunk) + paragraph
-            else:
-                current_chunk += "\n" + paragraph if current_chunk else paragraph
-        
+
+        for page_index, page in enumerate(pages):
+            segments = self._segments(page)
+            if not segments:
+                continue
+            kept_pages[page_index] = page
+            sizes = self._sizes([page[start:end] for start, end in segments])
+
+            for (start, end), size in zip(segments, sizes):
+                for start, end, size in self._fit(page, start, end, size):
+                    if pending and pending_size + size > self.limit:
+                        yield self._create_chunk_metadata(
+                            self._join(kept_pages, pending), filename, language, chunk_index,
+                            upload_date, pending[0][0] + 1 if paged else None
+                        )
+                        chunk_index += 1
+                        pending_size = self._keep_overlap(pending, self.limit - size)
+                        # Pages no pending segment refers to are released
+                        oldest = pending[0][0] if pending else page_index
+                        for index in [index for index in kept_pages if index < oldest]:
+                            del kept_pages[index]
+                    pending.append((page_index, start, end, size))
+                    pending_size += size
+
         # Add the last chunk if it has content
-        if current_chunk.strip():
-            chunks.append(self._create_chunk_metadata(
-                current_chunk, filename, language, chunk_index
-            ))
-        
-        return chunks
-    
-    def _clean_text(self, text: str) -> str:
-        """Clean and normalize text"""
-        # Remove excessive whitespace
-        text = re.sub(r'\s+', ' ', text)
-        # Remove special characters that might interfere with chunking
-        text = re.sub(r'[^\w\s\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF.,!?;:()[]{}"\'-]', '', text)
-        return text.strip()
-    
-    def _split_by_paragraphs(self, text: str) -> List[str]:
-        """Split text by paragraphs, respecting both Arabic and English"""
-        # Split by double newlines, but also by single newlines if they seem like paragraph breaks
-        paragraphs = re.split(r'\n\s*\n', text)
-        
-        # Further split long paragraphs by sentences
-        result = []
-        for para in paragraphs:
-            if len(para) > self.max_chars:
-                # Split by sentences (both Arabic and English punctuation)
-                sentences = re.split(r'[.!?؛،]\s+', para)
-                current_sentence_group = ""
-                
-                for sentence in sentences:
-                    if len(current_sentence_group) + len(sentence) > self.max_chars:
-                        if current_sentence_group:
-                            result.append(current_sentence_group.strip())
-                        current_sentence_group = sentence
-                    else:
-                        current_sentence_group += " " + sentence if current_sentence_group else sentence
-                
-                if current_sentence_group.strip():
-                    result.append(current_sentence_group.strip())
-            else:
-                result.append(para.strip())
-        
-        return [p for p in result if p.strip()]
-    
-    def _get_overlap(self, text: str) -> str:
-        """Get the last part of text for overlap"""
-        if len(text) <= self.overlap:
-            return text
-        return text[-self.overlap:]
-    
-    def _create_chunk_metadata(self, text: str, filename: str, language: str, chunk_index: int) -> Dict:
+        if pending:
+            yield self._create_chunk_metadata(
+                self._join(kept_pages, pending), filename, language, chunk_index,
+                upload_date, pending[0][0] + 1 if paged else None
+            )
+
+    def _segments(self, page: str) -> List[tuple]:
+        """(start, end) offsets of the sentences and paragraphs of a page, without surrounding whitespace"""
+        segments = []
+        start = 0
+        for match in _BOUNDARY.finditer(page):
+            segments.append(self._trim(page, start, match.start()))
+            start = match.end()
+        segments.append(self._trim(page, start, len(page)))
+        # Whitespace-only segments are dropped
+        return [segment for segment in segments if segment is not None]
+
+    @staticmethod
+    def _trim(page: str, start: int, end: int) -> Optional[tuple]:
+        text = page[start:end]
+        stripped = text.strip()
+        if not stripped:
+            return None
+        start += len(text) - len(text.lstrip())
+        return start, start + len(stripped)
+
+    def _sizes(self, texts: List[str]) -> List[int]:
+        if self.token_counter is None:
+            # Characters plus the space that separates the text from the next one
+            return [len(text) + 1 for text in texts]
+        return self.token_counter(texts)
+
+    def _fit(self, page: str, start: int, end: int, size: int) -> List[tuple]:
+        """Split a segment larger than the limit at word boundaries"""
+        if size <= self.limit:
+            return [(start, end, size)]
+        words = [(m.start(), m.end()) for m in _WORD.finditer(page, start, end)]
+        word_sizes = self._sizes([page[s:e] for s, e in words])
+        words, word_sizes = self._split_long_words(words, word_sizes)
+        pieces = []
+        piece_start, piece_end, piece_size = None, None, 0
+        for (s, e), word_size in zip(words, word_sizes):
+            # Counting words separately overestimates the size, so pieces stay within the limit
+            if piece_start is not None and piece_size + word_size > self.limit:
+                pieces.append((piece_start, piece_end, piece_size))
+                piece_start, piece_size = None, 0
+            if piece_start is None:
+                piece_start = s
+            piece_end = e
+            piece_size += word_size
+        if piece_start is not None:
+            pieces.append((piece_start, piece_end, piece_size))
+        return pieces
+
+    def _split_long_words(self, words: List[tuple], sizes: List[int]):
+        # A word larger than the limit is cut into equal slices, with a proportional size estimate
+        if max(sizes, default=0) <= self.limit:
+            return words, sizes
+        split_words, split_sizes = [], []
+        for (s, e), size in zip(words, sizes):
+            if size <= self.limit:
+                split_words.append((s, e))
+                split_sizes.append(size)
+                continue
+            pieces = -(-size // self.limit)
+            step = -(-(e - s) // pieces)
+            for piece_start in range(s, e, step):
+                split_words.append((piece_start, min(piece_start + step, e)))
+                split_sizes.append(-(-size // pieces))
+        return split_words, split_sizes
+
+    def _keep_overlap(self, pending: deque, room: int) -> int:
+        """Drop the emitted segments except the trailing ones that fit the overlap and the room left"""
+        kept_size = 0
+        kept = 0
+        for segment in reversed(pending):
+            if kept_size + segment[3] > min(self.overlap_size, room):
+                break
+            kept_size += segment[3]
+            kept += 1
+        for _ in range(len(pending) - kept):
+            pending.popleft()
+        return kept_size
+
+    def _join(self, pages: Dict[int, str], pending: deque) -> str:
+        """Chunk text: one slice per page of the pending segments, whitespace collapsed"""
+        parts = []
+        first = last = None
+        for page_index, start, end, _ in pending:
+            if first is not None and page_index != first[0]:
+                parts.append(pages[first[0]][first[1]:last])
+                first = None
+            if first is None:
+                first = (page_index, start)
+            last = end
+        parts.append(pages[first[0]][first[1]:last])
+        return _WHITESPACE.sub(' ', ' '.join(parts)).strip()
+
+    def _create_chunk_metadata(self, text: str, filename: str, language: str, chunk_index: int,
+                               upload_date: Optional[str] = None, page_number: Optional[int] = None) -> Dict:
         """Create metadata for a chunk"""
+        metadata = {
+            "filename": filename,
+            "language": language,
+            "chunk_index": chunk_index,
+            "upload_date": upload_date or datetime.now().isoformat(),
+            "word_count": len(text.split()),
+            "char_count": len(text)
+        }
+        if page_number is not None:
+            metadata["page_number"] = page_number
         return {
             "text": text,
-            "metadata": {
-                "filename": filename,
-                "language": language,
-                "chunk_index": chunk_index,
-                "upload_date": datetime.now().isoformat(),
-                "word_count": len(text.split()),
-                "char_count": len(text)
-            }
+            "metadata": metadata
         }
-
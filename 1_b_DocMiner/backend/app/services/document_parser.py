@@ -2,7 +2,7 @@ import os
 import PyPDF2
 from docx import Document
 from langdetect import detect
-from typing import Tuple, Optional
+from typing import List, Tuple, Optional
 
 class DocumentParser:
     """Parse documents and extract text content"""
@@ -11,22 +11,37 @@ class DocumentParser:
     def parse_pdf(file_path: str) -> Tuple[str, str]:
         """Extract text from PDF file"""
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                
-                for page_num, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    if page_text.strip():
-                        text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
-                
-                # Detect language
-                language = DocumentParser._detect_language(text)
-                return text, language
-                
+            pages = DocumentParser.extract_pdf_pages(file_path)
+            return DocumentParser.join_pdf_pages(pages)
         except Exception as e:
             raise Exception(f"Error parsing PDF: {str(e)}")
     
+    @staticmethod
+    def count_pdf_pages(file_path: str) -> int:
+        """Number of pages of a PDF file"""
+        with open(file_path, 'rb') as file:
+            return len(PyPDF2.PdfReader(file).pages)
+    
+    @staticmethod
+    def extract_pdf_pages(file_path: str, start: int = 0, stop: Optional[int] = None) -> List[str]:
+        """Extract the text of pages start to stop, separate calls can run in parallel processes"""
+        with open(file_path, 'rb') as file:
+            pdf_reader = PyPDF2.PdfReader(file)
+            stop = len(pdf_reader.pages) if stop is None else min(stop, len(pdf_reader.pages))
+            return [pdf_reader.pages[page_num].extract_text() for page_num in range(start, stop)]
+    
+    @staticmethod
+    def join_pdf_pages(pages: List[str]) -> Tuple[str, str]:
+        """Join the page texts of a PDF with page markers and detect the language"""
+        text = ""
+        for page_num, page_text in enumerate(pages):
+            if page_text.strip():
+                text += f"\n--- Page {page_num + 1} ---\n{page_text}\n"
+        
+        # Detect language
+        language = DocumentParser._detect_language(text)
+        return text, language
+    
     @staticmethod
     def parse_docx(file_path: str) -> Tuple[str, str]:
         """Extract text from DOCX file"""
@@ -1,14 +1,21 @@
 from sentence_transformers import SentenceTransformer
-from typing import List
+from typing import List, Optional
 import os
+import threading
+
+from app.services.search_cache import QueryEmbeddingCache
 
 class EmbeddingService:
     """Generate embeddings for text chunks using multilingual model"""
     
-    def __init__(self):
+    def __init__(self, query_cache: Optional[QueryEmbeddingCache] = None):
         # Use multilingual model that supports Arabic and English
         self.model_name = "paraphrase-multilingual-MiniLM-L12-v2"
         self.model = None
+        self.query_cache = query_cache
+        # The model and its tokenizer are shared by the ingestion workers and the search route,
+        # fast tokenizers fail or mix truncation settings when used from two threads at once
+        self.model_lock = threading.Lock()
         self._load_model()
     
     def _load_model(self):
@@ -34,7 +41,8 @@ class EmbeddingService:
         
         try:
             # Generate embeddings
-            embeddings = self.model.encode(texts, convert_to_tensor=False)
+            with self.model_lock:
+                embeddings = self.model.encode(texts, convert_to_tensor=False)
             return embeddings.tolist()
         except Exception as e:
             raise Exception(f"Error generating embeddings: {str(e)}")
@@ -43,6 +51,32 @@ class EmbeddingService:
         """Generate embedding for a single text"""
         return self.generate_embeddings([text])[0]
     
+    @property
+    def max_tokens(self) -> int:
+        """Longest text in tokens the model embeds without truncation, special tokens excluded"""
+        return getattr(self.model, 'max_seq_length', 512) - 2
+    
+    def count_tokens(self, texts: List[str]) -> List[int]:
+        """Number of model tokens of each text, special tokens excluded"""
+        if not self.model:
+            raise Exception("Embedding model not loaded")
+        with self.model_lock:
+            encoded = self.model.tokenizer(texts, add_special_tokens=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+    
+    def embed_query(self, query: str) -> List[float]:
+        """
+        Generate the embedding of a search query, repeated queries come from the query cache
+        Encoding blocks and takes the model lock, call it from a worker thread in async code
+        """
+        if self.query_cache is None:
+            return self.generate_single_embedding(query)
+        embedding = self.query_cache.get(self.model_name, query)
+        if embedding is None:
+            embedding = self.generate_single_embedding(query)
+            self.query_cache.put(self.model_name, query, embedding)
+        return embedding
+    
     def get_model_info(self) -> dict:
         """Get information about the loaded model"""
         return {
@@ -0,0 +1,231 @@
+import itertools
+import multiprocessing
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.services.document_parser import DocumentParser
+
+class IngestionQueueFull(Exception):
+    """Raised when the queue already holds max_pending unfinished jobs"""
+
+class IngestionJob:
+    """Status and progress of one uploaded document"""
+
+    def __init__(self, filename: str, file_path: str):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.file_path = file_path
+        self.status = "queued"
+        self.pages_total = 0
+        self.pages_parsed = 0
+        self.chunks_total = 0
+        self.chunks_to_embed = 0
+        self.chunks_embedded = 0
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict:
+        """Job status for the API responses"""
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_total": self.pages_total,
+            "pages_parsed": self.pages_parsed,
+            "chunks_total": self.chunks_total,
+            "chunks_to_embed": self.chunks_to_embed,
+            "chunks_embedded": self.chunks_embedded,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class IngestionQueue:
+    """
+    Indexes uploaded documents in the background
+    Jobs run on a bounded thread pool, PDF pages are parsed in parallel processes,
+    and chunks are embedded in micro-batches on the single shared model
+    Pages stream through the chunker into the vector store, a document is never held whole
+    """
+
+    def __init__(self, chunker, embedding_service, vector_store, max_workers: int = 2,
+                 parse_processes: Optional[int] = None, pages_per_task: int = 8,
+                 embed_batch_size: int = 32, max_pending: int = 50, max_finished: int = 200):
+        self.chunker = chunker
+        self.embedding_service = embedding_service
+        self.vector_store = vector_store
+        self.parse_processes = parse_processes or os.cpu_count() or 1
+        self.pages_per_task = pages_per_task
+        self.embed_batch_size = embed_batch_size
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="docminer-ingest")
+        self._page_pool: Optional[ProcessPoolExecutor] = None
+        self._page_pool_lock = threading.Lock()
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        # One job at a time per file: filename -> [lock, number of jobs holding or waiting for it]
+        # The embedding service runs one micro-batch at a time on the model
+        self._file_locks: Dict[str, list] = {}
+
+    def submit(self, filename: str, file_path: str) -> IngestionJob:
+        """Queue a saved upload, the job owns file_path and deletes it when done"""
+        with self._jobs_lock:
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+            if pending >= self.max_pending:
+                raise IngestionQueueFull(f"Ingestion queue is full ({pending} documents pending)")
+            job = IngestionJob(filename, file_path)
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._process, job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """Get a job by ID, None if it is unknown or was pruned"""
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> List[IngestionJob]:
+        """All known jobs, newest first"""
+        with self._jobs_lock:
+            return list(reversed(self._jobs.values()))
+
+    def get_stats(self) -> Dict:
+        """Number of jobs per status"""
+        counts = {}
+        for job in self.list_jobs():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def _prune(self):
+        # Forget the oldest finished jobs beyond max_finished
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _process(self, job: IngestionJob):
+        """Runs on a worker thread: parse, chunk, embed and store one document"""
+        job.started_at = datetime.now()
+        try:
+            job.status = "waiting"
+            with self._file_lock(job.filename):
+                job.status = "indexing"
+                pages, language, paged = self._parse(job)
+                chunks = self._count_chunks(job, self.chunker.iter_chunks(pages, job.filename, language, paged))
+                job.result = self.vector_store.index_document(
+                    job.filename, chunks, lambda texts: self._embed(job, texts)
+                )
+            job.status = "completed"
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.now()
+            if os.path.exists(job.file_path):
+                os.unlink(job.file_path)
+
+    @contextmanager
+    def _file_lock(self, filename: str):
+        """Hold the lock of filename, it is forgotten when no job uses it"""
+        with self._jobs_lock:
+            entry = self._file_locks.setdefault(filename, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._jobs_lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._file_locks[filename]
+
+    def _parse(self, job: IngestionJob) -> Tuple[Iterator[str], str, bool]:
+        """Page stream, language and whether the pages are real pages of the document"""
+        if os.path.splitext(job.file_path)[1].lower() != ".pdf":
+            text, language = DocumentParser.parse_document(job.file_path)
+            return iter([text]), language, False
+
+        pages = self._iter_pdf_pages(job)
+        # The language is detected on the first pages, they are put back in front of the stream
+        head = []
+        for page in pages:
+            head.append(page)
+            if sum(len(text) for text in head) >= 1000:
+                break
+        language = DocumentParser._detect_language(" ".join(head))
+        return itertools.chain(head, pages), language, True
+
+    def _iter_pdf_pages(self, job: IngestionJob) -> Iterator[str]:
+        """Pages in order, each range is yielded as soon as it and the ranges before it are parsed"""
+        futures = []
+        try:
+            job.pages_total = DocumentParser.count_pdf_pages(job.file_path)
+            if job.pages_total <= self.pages_per_task:
+                ranges = [DocumentParser.extract_pdf_pages(job.file_path)]
+            else:
+                # Page ranges are parsed in parallel processes, PyPDF2 holds the GIL
+                futures = [
+                    self._get_page_pool().submit(
+                        DocumentParser.extract_pdf_pages, job.file_path, start, start + self.pages_per_task
+                    )
+                    for start in range(0, job.pages_total, self.pages_per_task)
+                ]
+                ranges = (future.result() for future in futures)
+            for pages in ranges:
+                for page in pages:
+                    job.pages_parsed += 1
+                    yield page
+        except Exception as e:
+            raise Exception(f"Error parsing PDF: {str(e)}")
+        finally:
+            # Ranges not consumed yet when indexing stopped early
+            for future in futures:
+                future.cancel()
+
+    def _count_chunks(self, job: IngestionJob, chunks: Iterator[Dict]) -> Iterator[Dict]:
+        for chunk in chunks:
+            job.chunks_total += 1
+            yield chunk
+
+    def _get_page_pool(self) -> ProcessPoolExecutor:
+        with self._page_pool_lock:
+            if self._page_pool is None:
+                # Spawned workers only import the parser, not the embedding model of this process
+                self._page_pool = ProcessPoolExecutor(
+                    max_workers=self.parse_processes,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._page_pool
+
+    def _embed(self, job: IngestionJob, texts: List[str]) -> List[List[float]]:
+        # Called per write batch with the chunks that are not stored yet
+        job.chunks_to_embed += len(texts)
+        embeddings = []
+        for start in range(0, len(texts), self.embed_batch_size):
+            embeddings.extend(
+                self.embedding_service.generate_embeddings(texts[start:start + self.embed_batch_size])
+            )
+            job.chunks_embedded += min(self.embed_batch_size, len(texts) - start)
+        return embeddings
+
+    def shutdown(self):
+        """Stop accepting work and wait for the running jobs"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        if self._page_pool is not None:
+            self._page_pool.shutdown(wait=True)
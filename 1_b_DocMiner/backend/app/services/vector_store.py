@@ -1,16 +1,42 @@
 import chromadb
 from chromadb.config import Settings
+import hashlib
 import os
-from typing import List, Dict, Optional
-import uuid
+from typing import Callable, Iterable, Iterator, List, Dict, Optional
 from datetime import datetime
 
+from app.services.search_cache import SearchResultCache
+
+def chunk_id(filename: str, text: str, occurrence: int = 0) -> str:
+    """Deterministic ID of a chunk, the same text of the same file always gets the same ID"""
+    key = f"{filename}\0{occurrence}\0{text}".encode("utf-8")
+    return hashlib.sha256(key).hexdigest()[:32]
+
+def iter_chunk_ids(chunks: Iterable[Dict]) -> Iterator[Dict]:
+    """Yield the chunks with chunk["id"] set from the filename and text, repeated texts are numbered by occurrence"""
+    seen = {}
+    for chunk in chunks:
+        filename = chunk["metadata"]["filename"]
+        first_id = chunk_id(filename, chunk["text"])
+        occurrence = seen.get(first_id, 0)
+        seen[first_id] = occurrence + 1
+        chunk["id"] = first_id if occurrence == 0 else chunk_id(filename, chunk["text"], occurrence)
+        yield chunk
+
+def assign_chunk_ids(chunks: List[Dict]) -> List[str]:
+    """Set chunk["id"] of every chunk, see iter_chunk_ids"""
+    return [chunk["id"] for chunk in iter_chunk_ids(chunks)]
+
 class VectorStore:
     """ChromaDB vector store for document embeddings"""
     
-    def __init__(self, persist_directory: str = "data/chroma_db"):
+    def __init__(self, persist_directory: str = "data/chroma_db", embedding_model: Optional[str] = None,
+                 batch_size: int = 256, result_cache: Optional[SearchResultCache] = None):
         """Initialize ChromaDB client"""
         self.persist_directory = persist_directory
+        self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.result_cache = result_cache
         
         # Create directory if it doesn't exist
         os.makedirs(persist_directory, exist_ok=True)
@@ -21,41 +47,166 @@ class VectorStore:
             settings=Settings(anonymized_telemetry=False)
         )
         
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="documents",
-            metadata={"description": "Document chunks with embeddings"}
-        )
+        # Get or create collection, get_or_create_collection would overwrite the stored metadata
+        metadata = {"description": "Document chunks with embeddings"}
+        if embedding_model:
+            metadata["embedding_model"] = embedding_model
+        try:
+            self.collection = self.client.get_collection(name="documents")
+        except ValueError:
+            self.collection = self.client.create_collection(
+                name="documents",
+                metadata=metadata
+            )
+        
+        # The model is only recorded on a collection that has no vectors yet
+        stored_metadata = self.collection.metadata or {}
+        if embedding_model and stored_metadata.get("embedding_model") != embedding_model:
+            if self.collection.count():
+                print(f"Warning: collection vectors were not created with {embedding_model}, "
+                      f"re-upload the documents to re-embed them")
+            else:
+                self.collection.modify(metadata={**stored_metadata, "embedding_model": embedding_model})
+    
+    def _collection_changed(self):
+        # Cached search results may include or miss the written chunks
+        if self.result_cache is not None:
+            self.result_cache.invalidate()
+    
+    def _max_batch_size(self) -> int:
+        # Chroma rejects writes larger than the limit of its backend
+        limit = getattr(self.client, "max_batch_size", None)
+        return min(self.batch_size, limit) if limit else self.batch_size
     
     def add_documents(self, chunks: List[Dict]) -> int:
-        """Add document chunks to the vector store"""
+        """
+        Upsert document chunks in batches of batch_size
+        Chunks keep their precomputed "embedding", and get a content-hash ID if they have no "id"
+        """
         if not chunks:
             return 0
         
-        # Prepare data for ChromaDB
-        texts = [chunk["text"] for chunk in chunks]
-        metadatas = [chunk["metadata"] for chunk in chunks]
-        ids = [str(uuid.uuid4()) for _ in chunks]
+        if any("id" not in chunk for chunk in chunks):
+            assign_chunk_ids(chunks)
+        with_embeddings = all("embedding" in chunk for chunk in chunks)
         
         try:
-            # Add to collection
-            self.collection.add(
-                documents=texts,
-                metadatas=metadatas,
-                ids=ids
-            )
+            batch_size = self._max_batch_size()
+            for start in range(0, len(chunks), batch_size):
+                batch = chunks[start:start + batch_size]
+                self.collection.upsert(
+                    ids=[chunk["id"] for chunk in batch],
+                    documents=[chunk["text"] for chunk in batch],
+                    metadatas=[chunk["metadata"] for chunk in batch],
+                    # Without embeddings Chroma embeds the texts with its own default model
+                    embeddings=[chunk["embedding"] for chunk in batch] if with_embeddings else None
+                )
             return len(chunks)
         except Exception as e:
             raise Exception(f"Error adding documents to vector store: {str(e)}")
+        finally:
+            self._collection_changed()
+    
+    def index_document(self, filename: str, chunks: Iterable[Dict],
+                       embed: Callable[[List[str]], List[List[float]]]) -> Dict:
+        """
+        Bring the stored chunks of a file in line with chunks
+        Only chunks whose content-hash ID is not stored yet are embedded and written,
+        and stored chunks that are no longer in the file are deleted
+        chunks may be a generator, they are embedded and written in batches as they arrive
+        If chunks or embed fail, the chunks written so far are deleted and the stored version is kept
+        """
+        try:
+            stored = self.collection.get(where={"filename": filename}, include=["metadatas"])
+        except Exception as e:
+            raise Exception(f"Error reading stored chunks: {str(e)}")
+        stored_index = {
+            id_: metadata.get("chunk_index") for id_, metadata in zip(stored["ids"], stored["metadatas"])
+        }
+        
+        batch_size = self._max_batch_size()
+        seen_ids = set()
+        new_chunks, added_ids = [], []
+        # Unchanged chunks that moved within the file only get their position updated, once the file is indexed
+        moved = []
+        try:
+            for chunk in iter_chunk_ids(chunks):
+                seen_ids.add(chunk["id"])
+                if chunk["id"] not in stored_index:
+                    new_chunks.append(chunk)
+                    if len(new_chunks) >= batch_size:
+                        added_ids.extend(new_chunk["id"] for new_chunk in new_chunks)
+                        self._add_embedded(new_chunks, embed)
+                        new_chunks = []
+                elif stored_index[chunk["id"]] != chunk["metadata"]["chunk_index"]:
+                    moved.append({"id": chunk["id"], "metadata": chunk["metadata"]})
+            if not seen_ids:
+                # Keep the stored chunks, the file did not produce any text
+                raise ValueError("No chunks created from document")
+            if new_chunks:
+                added_ids.extend(new_chunk["id"] for new_chunk in new_chunks)
+                self._add_embedded(new_chunks, embed)
+        except Exception:
+            # New IDs are never stored IDs, deleting them restores the stored version
+            if added_ids:
+                self.delete_documents_by_ids(added_ids)
+            raise
+        added = len(added_ids)
+        for start in range(0, len(moved), batch_size):
+            self._update_metadata(moved[start:start + batch_size])
+        
+        stale_ids = list(set(stored_index).difference(seen_ids))
+        if stale_ids:
+            self.delete_documents_by_ids(stale_ids)
+        
+        return {
+            "added": added,
+            "unchanged": len(seen_ids) - added,
+            "removed": len(stale_ids)
+        }
+    
+    def _add_embedded(self, chunks: List[Dict], embed: Callable[[List[str]], List[List[float]]]) -> int:
+        embeddings = embed([chunk["text"] for chunk in chunks])
+        for chunk, embedding in zip(chunks, embeddings):
+            chunk["embedding"] = embedding
+        return self.add_documents(chunks)
     
-    def search_documents(self, query: str, n_results: int = 10, filter_metadata: Optional[Dict] = None) -> List[Dict]:
-        """Search for similar documents"""
+    def _update_metadata(self, chunks: List[Dict]):
         try:
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=filter_metadata
+            self.collection.update(
+                ids=[chunk["id"] for chunk in chunks],
+                metadatas=[chunk["metadata"] for chunk in chunks]
             )
+        finally:
+            self._collection_changed()
+    
+    def search_documents(self, query: str, n_results: int = 10, filter_metadata: Optional[Dict] = None,
+                         query_embedding: Optional[List[float]] = None) -> List[Dict]:
+        """
+        Search for similar documents, query_embedding should come from the model the chunks were embedded with
+        Searches by embedding are served from the result cache until the collection changes
+        """
+        cache_key = None
+        if query_embedding is not None and self.result_cache is not None:
+            cache_key = self.result_cache.make_key(query_embedding, n_results, filter_metadata)
+            generation = self.result_cache.generation
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            if query_embedding is not None:
+                results = self.collection.query(
+                    query_embeddings=[query_embedding],
+                    n_results=n_results,
+                    where=filter_metadata
+                )
+            else:
+                results = self.collection.query(
+                    query_texts=[query],
+                    n_results=n_results,
+                    where=filter_metadata
+                )
             
             # Format results
             documents = []
@@ -67,6 +218,8 @@ class VectorStore:
                         "distance": results['distances'][0][i] if 'distances' in results else None
                     })
             
+            if cache_key is not None:
+                self.result_cache.put(cache_key, documents, generation)
             return documents
         except Exception as e:
             raise Exception(f"Error searching documents: {str(e)}")
@@ -99,20 +252,37 @@ class VectorStore:
             
             if results['ids']:
                 # Delete the documents
-                self.collection.delete(ids=results['ids'])
+                try:
+                    self.collection.delete(ids=results['ids'])
+                finally:
+                    self._collection_changed()
                 return len(results['ids'])
             
             return 0
         except Exception as e:
             raise Exception(f"Error deleting documents: {str(e)}")
     
+    def delete_documents_by_ids(self, ids: List[str]) -> int:
+        """Delete chunks by ID, in batches of batch_size"""
+        try:
+            batch_size = self._max_batch_size()
+            for start in range(0, len(ids), batch_size):
+                self.collection.delete(ids=ids[start:start + batch_size])
+            return len(ids)
+        except Exception as e:
+            raise Exception(f"Error deleting documents: {str(e)}")
+        finally:
+            if ids:
+                self._collection_changed()
+    
     def get_collection_stats(self) -> Dict:
         """Get statistics about the collection"""
         try:
             count = self.collection.count()
             return {
                 "total_documents": count,
-                "collection_name": self.collection.name
+                "collection_name": self.collection.name,
+                "embedding_model": (self.collection.metadata or {}).get("embedding_model")
             }
         except Exception as e:
             raise Exception(f"Error getting collection stats: {str(e)}")
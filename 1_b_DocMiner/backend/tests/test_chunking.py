@@ -0,0 +1,51 @@
+from app.services.chunking import TextChunker
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+def sentences(count, start=0):
+    # Sentences of three words: "s0a s0b s0c."
+    return [f"s{i}a s{i}b s{i}c." for i in range(start, start + count)]
+
+def word_chunker(max_tokens=10, overlap_tokens=4):
+    return TextChunker(token_counter=count_words, max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+def test_chunks_respect_max_tokens():
+    text = " ".join(sentences(20)) + " " + " ".join(f"w{i}" for i in range(25))
+    chunks = word_chunker().chunk_text(text, "a.txt", "en")
+
+    assert all(len(chunk["text"].split()) <= 10 for chunk in chunks)
+    # No word is lost, the long sentence is split at word boundaries
+    words = set(" ".join(chunk["text"] for chunk in chunks).split())
+    assert words == set(text.split())
+
+def test_overlap_is_carried_over():
+    chunks = word_chunker().chunk_text(" ".join(sentences(9)), "a.txt", "en")
+
+    assert [chunk["text"] for chunk in chunks] == [
+        " ".join(sentences(3)),
+        " ".join(sentences(3, start=2)),
+        " ".join(sentences(3, start=4)),
+        " ".join(sentences(3, start=6))
+    ]
+    assert [chunk["metadata"]["chunk_index"] for chunk in chunks] == [0, 1, 2, 3]
+
+def test_page_number_of_first_segment():
+    pages = [" ".join(sentences(2)), "", " ".join(sentences(2, start=2)), " ".join(sentences(2, start=4))]
+    chunks = list(word_chunker(overlap_tokens=0).iter_chunks(pages, "a.pdf", "en", paged=True))
+
+    # The second chunk starts with the second sentence of page 3 and runs into page 4
+    assert [chunk["metadata"]["page_number"] for chunk in chunks] == [1, 3]
+    assert chunks[1]["text"] == " ".join(sentences(3, start=3))
+
+def test_page_number_only_for_paged_input():
+    chunks = TextChunker().chunk_text("One sentence.", "a.txt", "en")
+    assert "page_number" not in chunks[0]["metadata"]
+
+def test_blank_input_has_no_chunks():
+    assert TextChunker().chunk_text("   \n\n ", "a.txt", "en") == []
+    assert list(word_chunker().iter_chunks(["", " \n ", "\n\n"], "a.pdf", "en", paged=True)) == []
+
+def test_character_sizes_without_token_counter():
+    chunks = TextChunker(max_chars=40, overlap=0).chunk_text(" ".join(sentences(10)), "a.txt", "en")
+    assert all(len(chunk["text"]) <= 40 for chunk in chunks)
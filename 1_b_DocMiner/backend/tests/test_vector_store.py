@@ -0,0 +1,52 @@
+import chromadb
+import pytest
+from chromadb.config import Settings
+
+from app.services.vector_store import VectorStore
+
+SETTINGS = Settings(anonymized_telemetry=False)
+
+def test_new_collection_records_embedding_model(tmp_path):
+    store = VectorStore(persist_directory=str(tmp_path), embedding_model="multilingual")
+    assert store.collection.metadata["embedding_model"] == "multilingual"
+
+def test_empty_collection_gets_embedding_model(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path), settings=SETTINGS)
+    client.create_collection("documents", metadata={"description": "old"})
+
+    store = VectorStore(persist_directory=str(tmp_path), embedding_model="multilingual")
+    assert store.collection.metadata == {"description": "old", "embedding_model": "multilingual"}
+
+def test_existing_vectors_keep_their_embedding_model(tmp_path, capsys):
+    # Vectors of Chroma's default model, the collection has no model name
+    client = chromadb.PersistentClient(path=str(tmp_path), settings=SETTINGS)
+    client.create_collection("documents").add(ids=["a"], embeddings=[[0.1, 0.2, 0.3]], documents=["text"])
+
+    store = VectorStore(persist_directory=str(tmp_path), embedding_model="multilingual")
+    assert "embedding_model" not in (store.collection.metadata or {})
+    assert "were not created with multilingual" in capsys.readouterr().out
+
+    # Opening the store again still warns, the metadata was not overwritten
+    store = VectorStore(persist_directory=str(tmp_path), embedding_model="multilingual")
+    assert "were not created with multilingual" in capsys.readouterr().out
+
+def _chunks(texts, fail_at=None):
+    for index, text in enumerate(texts):
+        if index == fail_at:
+            raise Exception("Error parsing PDF: page 5")
+        yield {"text": text, "metadata": {"filename": "a.pdf", "chunk_index": index}}
+
+def _embed(texts):
+    return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+def test_failed_index_keeps_stored_version(tmp_path):
+    store = VectorStore(persist_directory=str(tmp_path), embedding_model="m", batch_size=2)
+    store.index_document("a.pdf", _chunks(["a", "b", "c"]), _embed)
+    before = store.collection.get(include=["documents", "metadatas"])
+
+    # Two batches of new chunks are written before the stream fails
+    with pytest.raises(Exception, match="page 5"):
+        store.index_document("a.pdf", _chunks(["x", "a", "y", "z", "w", "v"], fail_at=5), _embed)
+
+    assert store.collection.get(include=["documents", "metadatas"]) == before
+    assert store.index_document("a.pdf", _chunks(["x", "a", "y"]), _embed) == {"added": 2, "unchanged": 1, "removed": 2}
@@ -32,6 +32,19 @@ export interface DocumentUploadResponse {
   chunks_created: number;
 }
 
+export interface IngestionJob {
+  job_id: string;
+  filename: string;
+  status: 'queued' | 'waiting' | 'indexing' | 'completed' | 'failed';
+  pages_total: number;
+  pages_parsed: number;
+  chunks_total: number;
+  chunks_to_embed: number;
+  chunks_embedded: number;
+  result?: { added: number; unchanged: number; removed: number } | null;
+  error?: string | null;
+}
+
 export interface DocumentListResponse {
   documents: DocumentChunk[];
   total_count: number;
@@ -55,12 +68,15 @@ export interface SearchResponse {
 export interface StatsResponse {
   total_documents: number;
   collection_name: string;
+  ingestion_jobs?: Record<string, number>;
 }
 
+const JOB_POLL_INTERVAL_MS = 1000;
+
 // Document API functions
 export const documentAPI = {
-  // Upload a document
-  upload: async (file: File): Promise<DocumentUploadResponse> => {
+  // Upload a document and wait until its ingestion job has finished
+  upload: async (file: File, onProgress?: (job: IngestionJob) => void): Promise<DocumentUploadResponse> => {
     const formData = new FormData();
     formData.append('file', file);
     
@@ -70,6 +86,30 @@ export const documentAPI = {
       },
     });
     
+    let job: IngestionJob = response.data.job;
+    while (job.status !== 'completed' && job.status !== 'failed') {
+      onProgress?.(job);
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      job = await documentAPI.getJob(job.job_id);
+    }
+    
+    if (job.status === 'failed') {
+      // Same shape as an HTTP error, so callers read error.response.data.detail
+      throw { response: { data: { detail: job.error || 'Indexing failed' } } };
+    }
+    
+    return {
+      success: true,
+      message: `Document '${job.filename}' indexed`,
+      document_id: job.filename,
+      // Chunks of the document now in the index, unchanged chunks of a re-upload are kept, not re-created
+      chunks_created: job.result ? job.result.added + job.result.unchanged : 0,
+    };
+  },
+
+  // Get the status and progress of an ingestion job
+  getJob: async (jobId: string): Promise<IngestionJob> => {
+    const response = await api.get(`/api/documents/jobs/${jobId}`);
     return response.data;
   },
 
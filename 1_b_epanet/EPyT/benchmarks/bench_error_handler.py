@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+   Microbenchmark of the error checking of the epanet methods.
+
+   How to run:
+
+   python -m benchmarks.bench_error_handler
+
+   Compares the calls per second of a hydraulic step loop with:
+     - per-access wrapping: a new closure for every attribute access (previous error_handler)
+     - class-level wrapping: methods wrapped once when the class is created
+     - raise_errors=True: unwrapped methods, errors raised by the toolkit calls
+"""
+import time
+
+from epyt import epanet
+
+
+def _per_access_wrapping(cls):
+    """ Rebuilds the previous error_handler.__getattribute__ on top of an unwrapped class. """
+
+    def __getattribute__(self, function_id):
+        attr = object.__getattribute__(self, function_id)
+        if callable(attr) and not function_id.startswith(("__", "_", "EN", "printv", "MSX", "test", "load")):
+            def _wrapper(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                api = None
+                if hasattr(self, 'msx') and 'MSX' in function_id.upper():
+                    api = self.msx
+                elif hasattr(self, 'api'):
+                    api = self.api
+                if api is not None and api.errcode != 0:
+                    self._logFunctionError(function_id)
+                return result
+
+            return _wrapper
+        return attr
+
+    return type(cls.__name__, (cls,), {'__getattribute__': __getattribute__}, checked=False)
+
+
+def step_loop(d, repeat):
+    """ Runs the hydraulic step loop repeat times and returns the method calls per second. """
+    calls = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        d.openHydraulicAnalysis()
+        d.initializeHydraulicAnalysis()
+        calls += 2
+        tstep = 1
+        while tstep > 0:
+            d.runHydraulicAnalysis()
+            d.getNodePressure(1)
+            d.getLinkFlows(1)
+            tstep = d.nextHydraulicAnalysisStep()
+            calls += 4
+        d.closeHydraulicAnalysis()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def main(inpname='Net1.inp', repeat=200):
+    results = {}
+    for name in ['per-access wrapping', 'class-level wrapping', 'raise_errors=True']:
+        d = epanet(inpname, display_msg=False, raise_errors=name == 'raise_errors=True')
+        if name == 'per-access wrapping':
+            d.__class__ = _per_access_wrapping(type(d)._uncheckedClass())
+        step_loop(d, 5)
+        results[name] = step_loop(d, repeat)
+        d.unload()
+
+    base = results['per-access wrapping']
+    for name, rate in results.items():
+        print(f'{name:<22} {rate:>12,.0f} calls/s  ({rate / base:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+   Benchmark of the ID <-> index lookups on synthetic grid networks.
+
+   How to run:
+
+   python -m benchmarks.bench_index
+   python -m benchmarks.bench_index 1000 10000 100000
+
+   For networks with about 1k, 10k and 100k pipes, compares the time of the
+   lookups done by most scripts (all IDs, the index of every ID, the type of
+   every node and the junction/pump indices) with:
+     - toolkit: one ENget* call per element (previous getters)
+     - cached: the NetworkIndex of getNetworkIndex, already built when the network is loaded
+     - cached, edited: the same after a rename, which rebuilds the index once
+"""
+import os
+import sys
+import tempfile
+
+from benchmarks.bench_setters import grid_network, timed
+from epyt import epanet
+
+
+def toolkit_lookups(d):
+    """ The loops of the previous getters, one toolkit call per element. """
+    api = d.api
+    node_ids = [api.ENgetnodeid(i) for i in range(1, d.getNodeCount() + 1)]
+    link_ids = [api.ENgetlinkid(i) for i in range(1, d.getLinkCount() + 1)]
+    [api.ENgetnodeindex(i) for i in node_ids]
+    [api.ENgetlinkindex(i) for i in link_ids]
+    node_types = [api.ENgetnodetype(i) for i in range(1, len(node_ids) + 1)]
+    link_types = [api.ENgetlinktype(i) for i in range(1, len(link_ids) + 1)]
+    [i for i, x in enumerate(node_types) if x == d.ToolkitConstants.EN_JUNCTION]
+    [i for i, x in enumerate(link_types) if x == d.ToolkitConstants.EN_PUMP]
+
+
+def cached_lookups(d):
+    node_ids, link_ids = d.getNodeNameID(), d.getLinkNameID()
+    d.getNodeIndex(node_ids)
+    d.getLinkIndex(link_ids)
+    d.getNodeTypeIndex()
+    d.getNodeJunctionIndex()
+    d.getLinkPumpIndex()
+
+
+def main(sizes=(1000, 10000, 100000)):
+    tmpdir = tempfile.mkdtemp(prefix='epyt_bench_')
+    for size in sizes:
+        path = os.path.join(tmpdir, f'grid_{size}.inp')
+        grid_network(path, size)
+        d = epanet(path, ph=True, display_msg=False, display_warnings=False)
+
+        results = {
+            'toolkit': timed(toolkit_lookups, d),
+            'cached': timed(cached_lookups, d),
+        }
+        d.setNodeNameID(1, 'renamed')
+        results['cached, edited'] = timed(cached_lookups, d)
+
+        print(f'{d.getLinkCount():,} links, {d.getNodeCount():,} nodes')
+        base = results['toolkit']
+        for name, seconds in results.items():
+            print(f'  {name:<16} {seconds * 1000:>10.1f} ms  ({base / seconds:.1f}x)')
+        d.unload()
+        os.remove(path)
+    os.rmdir(tmpdir)
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or (1000, 10000, 100000))
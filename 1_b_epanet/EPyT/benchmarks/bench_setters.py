@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+   Benchmark of the array setters on synthetic grid networks.
+
+   How to run:
+
+   python -m benchmarks.bench_setters
+   python -m benchmarks.bench_setters 1000 10000 100000
+
+   For networks with about 1k, 10k and 100k pipes, compares the time to set the
+   roughness of every pipe and the base demand of every junction with:
+     - per element: one eval'd ENsetlinkvalue/ENsetnodevalue call per element (previous setters)
+     - setLinkValues/setNodeValues: arrays of indices, or of IDs resolved through the map
+       that is built by the first call and cached until the network is edited
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from epyt import epanet
+
+
+def grid_network(path, links):
+    """ Writes a square grid with about the given number of pipes, fed by one reservoir. """
+    n = max(2, int(np.sqrt(links / 2)))
+    with open(path, 'w') as f:
+        f.write('[JUNCTIONS]\n')
+        for k in range(n * n):
+            f.write(f'J{k} 10 1\n')
+        f.write('[RESERVOIRS]\nR1 100\n[PIPES]\n')
+        f.write('P0 R1 J0 100 300 100\n')
+        pipe = 1
+        for row in range(n):
+            for col in range(n):
+                k = row * n + col
+                if col + 1 < n:
+                    f.write(f'P{pipe} J{k} J{k + 1} 100 200 100\n')
+                    pipe += 1
+                if row + 1 < n:
+                    f.write(f'P{pipe} J{k} J{k + n} 100 200 100\n')
+                    pipe += 1
+        f.write('[COORDINATES]\nR1 -1 0\n')
+        for k in range(n * n):
+            f.write(f'J{k} {k % n} {k // n}\n')
+        f.write('[END]\n')
+
+
+def per_element(d, func, code_pstr, values):
+    """ The loop of the previous setters, one eval'd toolkit call per element. """
+    for i in range(len(values)):
+        strFunc = 'd.api.' + func + '(' + str(i + 1) + ',' + 'd.ToolkitConstants.EN_' + code_pstr + ',' + str(
+            values[i]) + ')'
+        eval(strFunc)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main(sizes=(1000, 10000, 100000)):
+    tmpdir = tempfile.mkdtemp(prefix='epyt_bench_')
+    for size in sizes:
+        path = os.path.join(tmpdir, f'grid_{size}.inp')
+        grid_network(path, size)
+        d = epanet(path, ph=True, display_msg=False, display_warnings=False)
+        tk = d.ToolkitConstants
+        roughness = np.random.uniform(80, 140, d.getLinkCount())
+        demands = np.random.uniform(0, 5, d.getNodeCount())
+        link_ids, node_ids = d.getLinkNameID(), d.getNodeNameID()
+
+        results = {
+            'per element': timed(per_element, d, 'ENsetlinkvalue', 'ROUGHNESS', roughness) +
+                           timed(per_element, d, 'ENsetnodevalue', 'BASEDEMAND', demands),
+            'array, indices': timed(d.setLinkValues, tk.EN_ROUGHNESS, roughness) +
+                              timed(d.setNodeValues, tk.EN_BASEDEMAND, demands),
+            'array, IDs': timed(d.setLinkValues, tk.EN_ROUGHNESS, link_ids, roughness) +
+                          timed(d.setNodeValues, tk.EN_BASEDEMAND, node_ids, demands),
+            'array, IDs again': timed(d.setLinkValues, tk.EN_ROUGHNESS, link_ids, roughness) +
+                                timed(d.setNodeValues, tk.EN_BASEDEMAND, node_ids, demands),
+        }
+        assert np.allclose(d.getLinkRoughnessCoeff(), roughness)
+
+        print(f'{d.getLinkCount():,} links, {d.getNodeCount():,} nodes')
+        base = results['per element']
+        for name, seconds in results.items():
+            print(f'  {name:<16} {seconds * 1000:>10.1f} ms  ({base / seconds:.1f}x)')
+        d.unload()
+        os.remove(path)
+    os.rmdir(tmpdir)
+
+
+if __name__ == '__main__':
+    main([int(size) for size in sys.argv[1:]] or (1000, 10000, 100000))
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+   Memory-mapped reader for EPANET binary output (.bin) files.
+
+   How to run:
+
+   from epyt.binfile import EpanetBinFile
+
+   out = EpanetBinFile('Net1.bin')
+   pressure = out.NodePressure        # (periods, nodes) view, no copy
+   flows = out.LinkFlow[:, [0, 4]]    # only the selected columns are read
+
+   The file layout follows the EPANET 2.2 output file format: a prolog with the
+   network description, an energy usage section, the results of every reporting
+   period and an epilog with the average reaction rates and warning flag.
+"""
+import numpy as np
+
+# Lengths of the fixed size character fields of the prolog
+TITLE_LEN = 80
+FNAME_LEN = 260
+ID_LEN = 32
+
+NODE_FIELDS = ['NodeDemand', 'NodeHead', 'NodePressure', 'NodeQuality']
+LINK_FIELDS = ['LinkFlow', 'LinkVelocity', 'LinkHeadloss', 'LinkQuality',
+               'LinkStatus', 'LinkSetting', 'LinkReactionRate', 'LinkFrictionFactor']
+
+# Names used by epanet.getComputedTimeSeries for the same fields
+COMPUTED_FIELDS = {'NodePressure': 'Pressure', 'NodeDemand': 'Demand', 'NodeHead': 'Head',
+                   'NodeQuality': 'NodeQuality', 'LinkFlow': 'Flow', 'LinkVelocity': 'Velocity',
+                   'LinkHeadloss': 'HeadLoss', 'LinkStatus': 'Status', 'LinkSetting': 'Setting',
+                   'LinkReactionRate': 'ReactionRate', 'LinkFrictionFactor': 'FrictionFactor',
+                   'LinkQuality': 'LinkQuality'}
+
+_COUNTS = ['MagicNumber', 'Version', 'NumberNodes', 'NumberReservoirsTanks', 'NumberLinks',
+           'NumberPumps', 'NumberValves', 'WaterQualityOption', 'IndexNodeSourceTracing',
+           'FlowUnitsOption', 'PressureUnitsOption', 'TimeStatisticsFlag', 'ReportingStartTimeSec',
+           'ReportingTimeStepSec', 'SimulationDurationSec']
+
+
+def _decode(value):
+    return value.split(b'\x00', 1)[0].decode(errors='ignore')
+
+
+class EpanetBinFile:
+    """ Zero-copy reader for an EPANET binary output file.
+
+    The file is mapped with numpy.memmap and every section is described by a
+    structured dtype, so the per-period results are strided views of shape
+    (periods, nodes) or (periods, links) and only the pages that are accessed
+    are read from disk.
+
+    :param binfile: path of the EPANET binary output file
+    :type binfile: str
+    :raises: ValueError if the file is not a complete EPANET output file
+    """
+
+    MAGIC_NUMBER = 516114521
+
+    def __init__(self, binfile):
+        self.binfile = binfile
+        self._mm = np.memmap(binfile, dtype=np.uint8, mode='r')
+        if self._mm.size < 4 * len(_COUNTS) + 28:
+            raise ValueError(f'"{binfile}" is not an EPANET binary output file.')
+
+        counts = np.ndarray((len(_COUNTS),), dtype='<i4', buffer=self._mm, offset=0)
+        if counts[0] != self.MAGIC_NUMBER:
+            raise ValueError(f'"{binfile}" is not an EPANET binary output file.')
+        self.counts = dict(zip(_COUNTS, counts.tolist()))
+        nnodes = self.NumberNodes = self.counts['NumberNodes']
+        nlinks = self.NumberLinks = self.counts['NumberLinks']
+        ntanks = self.NumberReservoirsTanks = self.counts['NumberReservoirsTanks']
+        npumps = self.NumberPumps = self.counts['NumberPumps']
+
+        self.prolog_dtype = np.dtype([
+            ('counts', '<i4', (len(_COUNTS),)),
+            ('title', f'S{TITLE_LEN}', (3,)),
+            ('inpfile', f'S{FNAME_LEN}'),
+            ('rptfile', f'S{FNAME_LEN}'),
+            ('chemical', f'S{ID_LEN}'),
+            ('chemunits', f'S{ID_LEN}'),
+            ('node_id', f'S{ID_LEN}', (nnodes,)),
+            ('link_id', f'S{ID_LEN}', (nlinks,)),
+            ('link_start', '<i4', (nlinks,)),
+            ('link_end', '<i4', (nlinks,)),
+            ('link_type', '<i4', (nlinks,)),
+            ('tank_index', '<i4', (ntanks,)),
+            ('tank_area', '<f4', (ntanks,)),
+            ('elevation', '<f4', (nnodes,)),
+            ('length', '<f4', (nlinks,)),
+            ('diameter', '<f4', (nlinks,)),
+        ])
+        self.energy_dtype = np.dtype([
+            ('pumps', [('link_index', '<i4'), ('utilization', '<f4'), ('efficiency', '<f4'),
+                       ('kw_per_volume', '<f4'), ('average_kw', '<f4'), ('peak_kw', '<f4'),
+                       ('cost_per_day', '<f4')], (npumps,)),
+            ('demand_charge', '<f4'),
+        ])
+        self.period_dtype = np.dtype(
+            [(name, '<f4', (nnodes,)) for name in NODE_FIELDS] +
+            [(name, '<f4', (nlinks,)) for name in LINK_FIELDS])
+        self.epilog_dtype = np.dtype([
+            ('bulk_rate', '<f4'), ('wall_rate', '<f4'), ('tank_rate', '<f4'), ('source_rate', '<f4'),
+            ('periods', '<i4'), ('warning', '<i4'), ('magic', '<i4'),
+        ])
+
+        energy_offset = self.prolog_dtype.itemsize
+        results_offset = energy_offset + self.energy_dtype.itemsize
+        epilog_offset = self._mm.size - self.epilog_dtype.itemsize
+        if epilog_offset < results_offset:
+            raise ValueError(f'"{binfile}" is truncated.')
+
+        self.prolog = np.ndarray((), dtype=self.prolog_dtype, buffer=self._mm, offset=0)
+        self.energy = np.ndarray((), dtype=self.energy_dtype, buffer=self._mm, offset=energy_offset)
+        self.epilog = np.ndarray((), dtype=self.epilog_dtype, buffer=self._mm, offset=epilog_offset)
+        if self.epilog['magic'] != self.MAGIC_NUMBER:
+            raise ValueError(f'"{binfile}" is incomplete, the simulation did not finish.')
+
+        self.NumberReportingPeriods = int(self.epilog['periods'])
+        if results_offset + self.NumberReportingPeriods * self.period_dtype.itemsize != epilog_offset:
+            raise ValueError(f'"{binfile}" has an unexpected size.')
+        self.WarningFlag = int(self.epilog['warning'])
+        self.results = np.ndarray((self.NumberReportingPeriods,), dtype=self.period_dtype,
+                                  buffer=self._mm, offset=results_offset)
+
+    def __getattr__(self, name):
+        # Per-period results, e.g. out.NodePressure -> (periods, nodes) view
+        if name in NODE_FIELDS or name in LINK_FIELDS:
+            return self.results[name]
+        raise AttributeError(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return self.NumberReportingPeriods
+
+    def close(self):
+        """ Releases the memory map. Views returned earlier keep the mapping alive. """
+        self._mm = None
+        self.prolog = self.energy = self.epilog = self.results = None
+
+    @property
+    def Time(self):
+        """ Reporting times in seconds. """
+        start = self.counts['ReportingStartTimeSec']
+        step = self.counts['ReportingTimeStepSec']
+        return start + step * np.arange(self.NumberReportingPeriods, dtype=np.int64)
+
+    @property
+    def NodeNameID(self):
+        return [_decode(i) for i in self.prolog['node_id']]
+
+    @property
+    def LinkNameID(self):
+        return [_decode(i) for i in self.prolog['link_id']]
+
+    def field(self, name, indices=None):
+        """ Returns the (periods, elements) view of a result field.
+
+        :param name: field name, e.g. 'NodePressure' or 'LinkFlow'
+        :type name: str
+        :param indices: element indices (starting from 1), defaults to all elements
+        :type indices: list or np.ndarray, optional
+        :return: strided view, or a copy of the selected columns if indices are given
+        :rtype: np.ndarray
+        """
+        values = self.results[name]
+        if indices is None:
+            return values
+        return values[:, np.asarray(indices, dtype=np.intp) - 1]
+
+    def getPrologInfo(self):
+        """ Returns the network description stored in the prolog as a dict. """
+        prolog = self.prolog
+        info = dict(self.counts)
+        info.update({
+            'ProblemTitle1': _decode(prolog['title'][0]),
+            'ProblemTitle2': _decode(prolog['title'][1]),
+            'ProblemTitle3': _decode(prolog['title'][2]),
+            'NameInputFile': _decode(prolog['inpfile']),
+            'NameReportFile': _decode(prolog['rptfile']),
+            'NameChemical': _decode(prolog['chemical']),
+            'ChemicalConcentrationUnits': _decode(prolog['chemunits']),
+            'IDLabelEachNode': self.NodeNameID,
+            'IDLabelEachLink': self.LinkNameID,
+            'IndexStartNodeEachLink': prolog['link_start'],
+            'IndexEndNodeEachLink': prolog['link_end'],
+            'TypeCodeEachLink': prolog['link_type'],
+            'NodeIndexEachReservoirsTank': prolog['tank_index'],
+            'CrossSectionalAreaEachTank': prolog['tank_area'],
+            'ElevationEachNode': prolog['elevation'],
+            'LengthEachLink': prolog['length'],
+            'DiameterEachLink': prolog['diameter'],
+        })
+        return info
+
+    def getEnergyInfo(self):
+        """ Returns the pump energy usage statistics as a dict. """
+        pumps = self.energy['pumps']
+        return {
+            'PumpIndexListLinks': pumps['link_index'],
+            'PumpUtilization': pumps['utilization'],
+            'AverageEfficiency': pumps['efficiency'],
+            'AverageKwattsOrMillionGallons': pumps['kw_per_volume'],
+            'AverageKwatts': pumps['average_kw'],
+            'PeakKwatts': pumps['peak_kw'],
+            'AverageCostPerDay': pumps['cost_per_day'],
+            'DemandCharge': float(self.energy['demand_charge']),
+        }
+
+    def getEpilogInfo(self):
+        """ Returns the average reaction rates, number of periods and warning flag as a dict. """
+        epilog = self.epilog
+        return {
+            'AverageBulkReactionRate': float(epilog['bulk_rate']),
+            'AverageWallReactionRate': float(epilog['wall_rate']),
+            'AverageTankReactionRate': float(epilog['tank_rate']),
+            'AverageSourceInflowRate': float(epilog['source_rate']),
+            'NumberReportingPeriods': int(epilog['periods']),
+            'WarningFlag': int(epilog['warning']),
+        }
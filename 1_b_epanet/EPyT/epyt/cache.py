@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+   Cache of solved hydraulic snapshots keyed by a fingerprint of the model state.
+
+   How to run:
+
+   from epyt.cache import SnapshotCache
+   from epyt.session import SimulationSession
+
+   cache = SnapshotCache(max_bytes=64 * 2 ** 20, spill_dir='snapshots')
+   with SimulationSession('Net1.inp', cache=cache) as session:
+       session.set_state(demands=demands)
+       snapshot = session.solve()    # solved and stored
+       session.set_state(demands=demands)
+       snapshot = session.solve()    # same state, read from the cache
+
+   The key is a 128-bit BLAKE2 hash of the input file and of the state arrays
+   (demands, pump status and speed, valve settings, tank levels, time), the value the solved
+   node and link arrays. The least recently used entries are dropped when the arrays in memory
+   exceed max_bytes, or written to spill_dir if it is given and read back on the next hit.
+   Only the files the cache wrote itself are read or removed, spill_dir may hold other files.
+"""
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+def fingerprint(*values):
+    """ Returns a hex digest of arrays, numbers and strings.
+
+    Arrays with the same values, dtype and shape give the same digest.
+
+    :param values: arrays, numbers, strings or bytes
+    :return: 32 hexadecimal characters
+    :rtype: str
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for value in values:
+        if isinstance(value, str):
+            value = value.encode()
+        if isinstance(value, bytes):
+            digest.update(b's%d:' % len(value))
+            digest.update(value)
+            continue
+        array = np.ascontiguousarray(value)
+        digest.update(f'{array.dtype.str}{array.shape}:'.encode())
+        digest.update(array.data)
+    return digest.hexdigest()
+
+
+class SnapshotCache:
+    """ LRU cache of dictionaries of arrays with a byte budget and an optional spill directory.
+
+    The cached arrays are read-only, a hit returns them without copying.
+
+    :param max_bytes: size of the arrays kept in memory
+    :type max_bytes: int
+    :param spill_dir: directory where evicted entries are saved, None drops them
+    :type spill_dir: str, optional
+    :param max_spill_bytes: size of the files in spill_dir, the oldest are removed first
+    :type max_spill_bytes: int, optional
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20, spill_dir=None, max_spill_bytes=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Files written to spill_dir, oldest first, with their size
+        self._spilled = OrderedDict()
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __repr__(self):
+        return f'SnapshotCache(entries={len(self)}, nbytes={self.nbytes}, hits={self.hits}, misses={self.misses})'
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries or key in self._spilled
+
+    def get(self, key):
+        """ Returns the arrays stored under key, or None.
+
+        :param key: e.g. a fingerprint of the model state
+        :type key: str
+        :rtype: dict or None
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+        if key in self._spilled:
+            try:
+                with np.load(self._path(key)) as data:
+                    entry = {name: data[name] for name in data.files}
+            except (OSError, ValueError):
+                entry = None
+            self._removeSpilled(key)
+            if entry is not None:
+                self.hits += 1
+                for value in entry.values():
+                    value.setflags(write=False)
+                return self._store(key, entry)
+        self.misses += 1
+        return None
+
+    def put(self, key, arrays):
+        """ Stores a dictionary of arrays under key and returns the stored, read-only copy.
+
+        :param key: e.g. a fingerprint of the model state
+        :type key: str
+        :param arrays: e.g. {'Pressure': ..., 'Flow': ...}
+        :type arrays: dict
+        :rtype: dict
+        """
+        entry = {}
+        for name, value in arrays.items():
+            value = np.array(value)
+            value.setflags(write=False)
+            entry[name] = value
+        if key in self._entries:
+            self.nbytes -= self._size(self._entries.pop(key))
+        if key in self._spilled:
+            self._removeSpilled(key)
+        return self._store(key, entry)
+
+    def clear(self):
+        """ Removes every entry, from memory and the files spilled to spill_dir. """
+        self._entries.clear()
+        self.nbytes = 0
+        for key in list(self._spilled):
+            self._removeSpilled(key)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self.nbytes += self._size(entry)
+        spilled = False
+        while self.nbytes > self.max_bytes and len(self._entries) > 1:
+            old_key, old_entry = self._entries.popitem(last=False)
+            self.nbytes -= self._size(old_entry)
+            if self.spill_dir is not None:
+                path = self._path(old_key)
+                np.savez(path, **old_entry)
+                self._spilled[old_key] = os.path.getsize(path)
+                spilled = True
+        if spilled and self.max_spill_bytes is not None:
+            self._trimSpill()
+        return entry
+
+    def _trimSpill(self):
+        while self._spilled and sum(self._spilled.values()) > self.max_spill_bytes:
+            self._removeSpilled(next(iter(self._spilled)))
+
+    def _removeSpilled(self, key):
+        del self._spilled[key]
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _path(self, key):
+        return os.path.join(self.spill_dir, f'{key}.npz')
+
+    @staticmethod
+    def _size(entry):
+        return sum(value.nbytes for value in entry.values())
@@ -59,20 +59,22 @@
    permissions and limitations under the Licence.
 """
 import json
-import math
 import os
 import platform
 import random
 import re
 import string
-import struct
 import subprocess
 import sys
 import traceback
+import uuid
 import warnings
+import weakref
+from collections import OrderedDict
 from ctypes import cdll, byref, create_string_buffer, c_uint64, c_void_p, c_int, c_double, c_float, c_long, \
-    c_char_p
+    c_char_p, POINTER
 from datetime import datetime, timezone
+from functools import wraps
 
 try:
     from importlib.resources import files  # Python 3.9+
@@ -92,16 +94,64 @@ from matplotlib import cm
 epyt_root = str(files("epyt"))
 
 from epyt import __version__, __msxversion__, __lastupdate__
+from epyt.binfile import EpanetBinFile, COMPUTED_FIELDS, NODE_FIELDS, LINK_FIELDS
 
 red = "\033[91m"
 reset = "\033[0m"
 
 
+def _checkErrors(function, function_id):
+    """ Wraps a public method so that the error code of the toolkit is checked after the call. """
+    use_msx = 'MSX' in function_id.upper()
+
+    @wraps(function)
+    def _wrapper(self, *args, **kwargs):
+        result = function(self, *args, **kwargs)
+        api = getattr(self, 'msx', None) if use_msx else None
+        if api is None:
+            api = getattr(self, 'api', None)
+        if api is not None and api.errcode != 0:
+            self._logFunctionError(function_id)
+        return result
+
+    _wrapper.__unchecked__ = function
+    return _wrapper
+
+
 class error_handler:
+    """ Reports the toolkit errors of the public methods of a subclass.
+
+    The public methods are wrapped once, when the subclass is created. Methods
+    whose name starts with one of _unchecked_prefixes are left as they are.
+    Instances created with raise_errors=True switch to a copy of their class
+    without the wrappers and the toolkit errors are raised instead.
+    """
     _psi_units = {"MDG", "IMGD", "CFS", "GPM"}
     _kpa_units = {"CMH", "CMS", "MLD", "CMD", "LPS", "LPM"}
+    _unchecked_prefixes = ("_", "EN", "printv", "MSX", "test", "load")
     last_error = None
 
+    def __init_subclass__(cls, checked=True, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._unchecked_class = None
+        if not checked:
+            return
+        for function_id, attr in list(vars(cls).items()):
+            if isfunction(attr) and not function_id.startswith(cls._unchecked_prefixes):
+                setattr(cls, function_id, _checkErrors(attr, function_id))
+
+    @classmethod
+    def _uncheckedClass(cls):
+        """ Returns a subclass of cls whose public methods are not wrapped. """
+        if cls.__dict__.get('_unchecked_class') is None:
+            namespace = {}
+            for base in reversed(cls.__mro__):
+                for function_id, attr in vars(base).items():
+                    if hasattr(attr, '__unchecked__'):
+                        namespace[function_id] = attr.__unchecked__
+            cls._unchecked_class = type(cls.__name__, (cls,), namespace, checked=False)
+        return cls._unchecked_class
+
     def _logFunctionError(self, function_name):
         """Log and display a detailed error with traceback."""
         # Print visible error
@@ -131,24 +181,6 @@ class error_handler:
     #         return "KPA AND METERS"
     #     return "UNKNOWN"
 
-    def __getattribute__(self, function_id):
-        attr = super().__getattribute__(function_id)
-
-        if (callable(attr) and not function_id.startswith(("__", "_", "EN", "printv", "MSX", "test", "load"))):
-            def _wrapper(*args, **kwargs):
-                result = attr(*args, **kwargs)
-                api = None
-                if hasattr(self, 'msx') and 'MSX' in function_id.upper():
-                    api = self.msx
-                elif hasattr(self, 'api'):
-                    api = self.api
-                if api is not None and api.errcode != 0:
-                    self._logFunctionError(function_id)
-                return result
-
-            return _wrapper
-        return attr
-
 
 class ToolkitConstants:
     # Limits on the size of character arrays used to store ID names
@@ -397,6 +429,39 @@ class ToolkitConstants:
     MSX_FLOWPACED = 3
 
 
+def temp_id():
+    """ Returns a name for temporary files that is unique across processes.
+
+    random.choices is not safe here, forked workers inherit the same random state.
+    """
+    return f'{os.getpid()}_{uuid.uuid4().hex[:10]}'
+
+
+# Input files shipped with EPyT, name -> path, see _findNetworkFile
+_network_files = {}
+
+
+def _findNetworkFile(filename):
+    """ Returns the path of an .inp/.msx file shipped with EPyT, or filename if there is none.
+
+    The package directory is walked once and the paths are cached.
+    """
+    if not _network_files:
+        for root, dirs, files in os.walk(epyt_root):
+            for name in files:
+                if name.lower().endswith((".inp", ".msx")):
+                    _network_files.setdefault(name, os.path.join(root, name))
+    return _network_files.get(filename, filename)
+
+
+def _remove_tempfiles(files):
+    for file in files:
+        try:
+            os.remove(file)
+        except OSError:
+            pass
+
+
 def safe_delete(file):
     if isinstance(file, list):
         for file_path in file:
@@ -432,7 +497,7 @@ class EpytValues:
         :return: None
 
         """
-        print_values = vars(self)
+        print_values = self.to_dict()
         print('\n')
         for i in print_values:
             print(f'{i}: {print_values[str(i)]}', end='\n')
@@ -493,7 +558,7 @@ class EpytValues:
         if '.xlsx' not in filename:
             filename = filename + '.xlsx'
 
-        dictVals = EpytValues.to_dict(self)
+        dictVals = self.to_dict()
         dictValss = {}
         for i in dictVals:
             if isinstance(dictVals[i], (np.ndarray, np.matrix)):
@@ -615,7 +680,7 @@ class EpytValues:
         :rtype: json object
 
         """
-        dictVals = EpytValues.to_dict(self)
+        dictVals = self.to_dict()
         dictValss = {}
         for i in dictVals:
             if isinstance(dictVals[i], (np.ndarray, np.matrix)):
@@ -631,6 +696,179 @@ class EpytValues:
         return json_object
 
 
+class EpytLazyValues(EpytValues):
+    """ Computed time series backed by an EPANET binary output file.
+
+    Exposes the same attributes as the EpytValues returned by getComputedTimeSeries
+    (Time, Pressure, Demand, Head, NodeQuality, Flow, Velocity, HeadLoss, Status,
+    Setting, ReactionRate, FrictionFactor, LinkQuality, StatusStr), but a field is
+    only decoded from the file when it is accessed. Decoded fields and node/link
+    subsets are kept in an LRU cache of cache_size entries.
+
+    :param binfile: EPANET binary output file
+    :type binfile: str
+    :param status_types: Labels of the link status codes (epanet.TYPEBINSTATUS)
+    :type status_types: list
+    :param cache_size: Maximum number of decoded fields kept in memory, defaults to 16
+    :type cache_size: int, optional
+    :param delete_file: Remove the binary file when the object is closed, defaults to False
+    :type delete_file: bool, optional
+    """
+
+    FIELDS = {name: field for field, name in COMPUTED_FIELDS.items()}
+
+    def __init__(self, binfile, status_types, cache_size=16, delete_file=False):
+        super().__init__()
+        self._out = EpanetBinFile(binfile)
+        self._status_types = np.array(status_types)
+        self._cache = OrderedDict()
+        self._cache_size = max(int(cache_size), 1)
+        self.binfile = binfile
+        self.WarningFlag = self._out.WarningFlag
+        self.NumberReportingPeriods = self._out.NumberReportingPeriods
+        self._finalizer = weakref.finalize(self, safe_delete, binfile) if delete_file else None
+
+    def __getattr__(self, name):
+        if name == 'Time' or name == 'StatusStr' or name in self.FIELDS:
+            return self.select(name)
+        raise AttributeError(name)
+
+    def select(self, name, indices=None):
+        """ Decodes a field, or the columns of some nodes/links, from the output file.
+
+        :param name: Field name, e.g. 'Pressure', 'Flow' or 'StatusStr'
+        :type name: str
+        :param indices: Node or link indices (starting from 1), defaults to all
+        :type indices: int, list or np.ndarray, optional
+        :return: (periods, elements) array
+        :rtype: np.ndarray
+        """
+        if self._out is None:
+            raise ValueError('The binary output file has been closed.')
+        if indices is not None:
+            indices = np.atleast_1d(np.asarray(indices, dtype=np.intp))
+        key = (name, None if indices is None else indices.tobytes())
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+
+        if name == 'Time':
+            values = self._out.Time
+        elif name == 'StatusStr':
+            values = self._status_types[self.select('Status', indices)]
+        elif name in self.FIELDS:
+            values = np.array(self._out.field(self.FIELDS[name], indices), dtype=np.float64)
+            if name == 'Status':
+                values = values.astype(int)
+        else:
+            raise ValueError(f"Unknown field '{name}'")
+
+        self._cache[key] = values
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return values
+
+    def to_dict(self):
+        """ Decodes every field and returns them together with the other values as a dict. """
+        dict_values = {'Time': self.Time}
+        for name in self.FIELDS:
+            dict_values[name] = self.select(name)
+        dict_values['StatusStr'] = self.StatusStr
+        dict_values.update({k: v for k, v in vars(self).items() if not k.startswith('_')})
+        return dict_values
+
+    def close(self):
+        """ Releases the output file and the cached fields, removing the file if it was temporary. """
+        self._cache.clear()
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+        if self._finalizer is not None:
+            self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _TimeSeriesColumns:
+    """ Preallocated (steps, elements) result columns.
+
+    Columns are sized from the expected number of steps and doubled when
+    control-driven intermediate steps exceed that estimate.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = max(int(capacity), 1)
+        self.size = 0
+        self.columns = {}
+
+    def add(self, name, width, dtype=np.float64):
+        shape = (self.capacity,) if width is None else (self.capacity, width)
+        self.columns[name] = np.zeros(shape, dtype=dtype)
+
+    def append_row(self):
+        if self.size == self.capacity:
+            self.capacity *= 2
+            for name, column in self.columns.items():
+                grown = np.zeros((self.capacity,) + column.shape[1:], dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+        self.size += 1
+        return self.size - 1
+
+    def finalize(self):
+        if self.size == self.capacity:
+            return dict(self.columns)
+        return {name: column[:self.size].copy() for name, column in self.columns.items()}
+
+
+class NetworkIndex:
+    """ ID <-> index maps, type codes and indices per type of the nodes and links.
+
+    Read from the toolkit in one pass, see epanet.getNetworkIndex. Indices start from 1.
+    """
+
+    def __init__(self, api):
+        tk = ToolkitConstants
+        node_count = api.ENgetcount(tk.EN_NODECOUNT)
+        link_count = api.ENgetcount(tk.EN_LINKCOUNT)
+        self.node_ids = [api.ENgetnodeid(i) for i in range(1, node_count + 1)]
+        self.link_ids = [api.ENgetlinkid(i) for i in range(1, link_count + 1)]
+        self.node_index = {Id: i for i, Id in enumerate(self.node_ids, 1)}
+        self.link_index = {Id: i for i, Id in enumerate(self.link_ids, 1)}
+        self.node_types = np.array([api.ENgetnodetype(i) for i in range(1, node_count + 1)], dtype=np.int64)
+        self.link_types = np.array([api.ENgetlinktype(i) for i in range(1, link_count + 1)], dtype=np.int64)
+        self.junctions = np.flatnonzero(self.node_types == tk.EN_JUNCTION) + 1
+        self.reservoirs = np.flatnonzero(self.node_types == tk.EN_RESERVOIR) + 1
+        self.tanks = np.flatnonzero(self.node_types == tk.EN_TANK) + 1
+        self.pipes = np.flatnonzero(self.link_types <= tk.EN_PIPE) + 1
+        self.pumps = np.flatnonzero(self.link_types == tk.EN_PUMP) + 1
+        self.valves = np.flatnonzero(self.link_types > tk.EN_PUMP) + 1
+
+    def __repr__(self):
+        return f'NetworkIndex(nodes={len(self.node_ids)}, links={len(self.link_ids)})'
+
+    def node_indices(self, ids):
+        """ Returns the indices of node IDs as an array, raises ValueError for unknown IDs. """
+        return self._indices(self.node_index, ids, 'node')
+
+    def link_indices(self, ids):
+        """ Returns the indices of link IDs as an array, raises ValueError for unknown IDs. """
+        return self._indices(self.link_index, ids, 'link')
+
+    @staticmethod
+    def _indices(index_map, ids, kind):
+        if isinstance(ids, str):
+            ids = [ids]
+        try:
+            return np.fromiter((index_map[Id] for Id in ids), dtype=np.int64, count=len(ids))
+        except KeyError as e:
+            raise ValueError(f'Unknown {kind} ID {e}.') from None
+
+
 def isList(var):
     if isinstance(var, (list, np.ndarray, np.matrix)):
         return True
@@ -644,12 +882,21 @@ class epanet(error_handler):
     Example with custom library
             epanetlib=os.path.join(os.getcwd(), 'epyt','libraries','win','epanet2.dll')
             d = epanet(inpname, msx=True,customlib=epanetlib)
+
+    Example with toolkit errors raised as exceptions (fast mode, the error code
+    is not checked again after every method call)
+            d = epanet(inpname, raise_errors=True)
      """
 
     def __init__(self, *argv, version=2.2, ph=False, loadfile=False, customlib=None, display_msg=True,
-                 display_warnings=True):
+                 display_warnings=True, raise_errors=False):
         # Constants
         self.msx = None
+        self._topology = None
+        self._network_index = None
+        self.raise_errors = raise_errors
+        if raise_errors:
+            self.__class__ = type(self)._uncheckedClass()
         if display_warnings:
             warnings.simplefilter('always')  # 'action', "error", "ignore", "always", "default", "module", "once"
         # Demand model types. DDA #0 Demand driven analysis,
@@ -714,6 +961,7 @@ class epanet(error_handler):
         # Initial attributes
         self.classversion = __version__
         self.api = epanetapi(version, ph=ph, customlib=customlib)
+        self.api.raise_errors = raise_errors
         self.display_msg = display_msg
         if self.display_msg and self.customlib is None:
             print(f'EPANET version {self.getVersion()} '
@@ -729,30 +977,26 @@ class epanet(error_handler):
             self.__exist_inp_file = False
             if len(argv) == 1:
                 if not os.path.exists(self.InputFile):
-                    for root, dirs, files in os.walk(epyt_root):
-                        for name in files:
-                            if name.lower().endswith(".inp"):
-                                if name == self.InputFile:
-                                    self.InputFile = os.path.join(root, self.InputFile)
-                                    break
-                        else:
-                            continue
-                        break
+                    self.InputFile = _findNetworkFile(self.InputFile)
                 self.__exist_inp_file = True
                 self.api.ENopen(self.InputFile)
-                # Save the temporary input file
-                self.TempInpFile = self.InputFile[0:-4] + '_temp.inp'
+                # Save the temporary input file, unique per object so that parallel
+                # processes working on the same network do not overwrite each other
+                tempname = self.InputFile[0:-4] + '_temp_' + temp_id()
+                self.TempInpFile = tempname + '.inp'
                 # Create a new INP file (Working Copy)
                 copyfile(self.InputFile, self.TempInpFile)
                 # self.saveInputFile(self.TempInpFile)
                 # Close input file
                 self.closeNetwork()
                 # Load temporary file
-                rptfile = self.InputFile[0:-4] + '_temp.txt'
-                binfile = self.InputFile[0:-4] + '_temp.bin'
+                rptfile = tempname + '.txt'
+                binfile = tempname + '.bin'
                 self.RptTempfile = rptfile
                 self.BinTempfile = binfile
                 self.api.ENopen(self.TempInpFile, rptfile, binfile)
+                # Remove the working copy at exit if unload is never called
+                weakref.finalize(self, _remove_tempfiles, [self.TempInpFile, rptfile, binfile])
                 # Parameters
                 if not loadfile:
                     self.__getInitParams()
@@ -2222,16 +2466,8 @@ class epanet(error_handler):
         getNodePressure, getNodeHydraulicHead, getNodeActualQuality,
         getNodeMassFlowRate.
         """
-        value = []
-        if len(argv) > 0:
-            indices = argv[0]
-        else:
-            indices = self.getNodeIndex()
-        for i in indices:
-            value.append(
-                self.api.ENgetnodevalue(i, self.ToolkitConstants.EN_QUALITY)
-            )
-        return np.array(value)
+        indices = argv[0] if len(argv) > 0 else None
+        return self.api.ENgetnodevalues(self.ToolkitConstants.EN_QUALITY, indices)
 
     def getCMDCODE(self):
         """ Retrieves the CMC code """
@@ -2273,122 +2509,98 @@ class epanet(error_handler):
 
         See also getComputedQualityTimeSeries, getComputedTimeSeries.
         """
-        value = EpytValues()
-        self.openHydraulicAnalysis()
-        self.api.solve = 1
-        self.initializeHydraulicAnalysis()
-        sensingnodes = 0
         if len(argv) == 0:
             attrs = ['time', 'pressure', 'demand', 'demanddeficit', 'head',
                      'tankvolume', 'flow', 'velocity', 'headloss', 'status',
                      'setting', 'energy', 'efficiency', 'state']
         else:
             attrs = argv[0]
+        sensing_indices = None
+        if 'demandSensingNodes' in attrs:
+            sensingnodes = 0
             for i in attrs:
                 if type(i) is int:
                     sensingnodes = i
+            sensing_indices = attrs[sensingnodes - 1]
+
+        # Hoist every count and index lookup out of the time loop
+        api = self.api
+        tk = self.ToolkitConstants
+        node_count = self.getNodeCount()
+        link_count = self.getLinkCount()
+        tank_index = np.array(self.getNodeTankIndex(), dtype=np.intc)
+        pump_index = np.array(self.getLinkPumpIndex(), dtype=np.intc)
+        hyd_step = self.getTimeHydraulicStep()
+        duration = self.getTimeSimulationDuration()
+        capacity = duration // hyd_step + 1 if hyd_step > 0 else 1
+
+        series = _TimeSeriesColumns(capacity)
+        node_fields = [('pressure', 'Pressure', tk.EN_PRESSURE),
+                       ('demand', 'Demand', tk.EN_DEMAND),
+                       ('demanddeficit', 'DemandDeficit', tk.EN_DEMANDDEFICIT),
+                       ('head', 'Head', tk.EN_HEAD)]
+        link_fields = [('flow', 'Flow', tk.EN_FLOW),
+                       ('velocity', 'Velocity', tk.EN_VELOCITY),
+                       ('headloss', 'HeadLoss', tk.EN_HEADLOSS),
+                       ('setting', 'Setting', tk.EN_SETTING),
+                       ('energy', 'Energy', tk.EN_ENERGY)]
+        node_fields = [(name, code) for key, name, code in node_fields if key in attrs]
+        link_fields = [(name, code) for key, name, code in link_fields if key in attrs]
         if 'time' in attrs:
-            value.Time = []
-        if 'pressure' in attrs:
-            value.Pressure = {}
-        if 'demand' in attrs:
-            value.Demand = {}
-        if 'demanddeficit' in attrs:
-            value.DemandDeficit = {}
-        if 'demandSensingNodes' in attrs:
-            value.DemandSensingNodes = {}
-            value.SensingNodesIndices = attrs[sensingnodes - 1]
-        if 'head' in attrs:
-            value.Head = {}
+            series.add('Time', None, np.int64)
+        for name, _ in node_fields:
+            series.add(name, node_count)
+        for name, _ in link_fields:
+            series.add(name, link_count)
+        if sensing_indices is not None:
+            series.add('DemandSensingNodes', len(sensing_indices))
         if 'tankvolume' in attrs:
-            value.TankVolume = {}
-        if 'flow' in attrs:
-            value.Flow = {}
-        if 'velocity' in attrs:
-            value.Velocity = {}
-        if 'headloss' in attrs:
-            value.HeadLoss = {}
+            series.add('TankVolume', node_count)
         if 'status' in attrs:
-            value.Status = {}
-            value.StatusStr = {}
-        if 'setting' in attrs:
-            value.Setting = {}
-        if 'energy' in attrs:
-            value.Energy = {}
+            series.add('Status', link_count, int)
         if 'efficiency' in attrs:
-            value.Efficiency = {}
+            series.add('Efficiency', link_count)
         if 'state' in attrs:
-            value.State = {}
-            value.StateStr = {}
-        k, tstep = 1, 1
+            series.add('State', pump_index.size, int)
+
+        self.openHydraulicAnalysis()
+        self.api.solve = 1
+        self.initializeHydraulicAnalysis()
+        tstep = 1
         while tstep > 0:
             t = self.runHydraulicAnalysis()
+            k = series.append_row()
+            columns = series.columns
             if 'time' in attrs:
-                value.Time.append(t)
-            if 'pressure' in attrs:
-                value.Pressure[k] = self.getNodePressure()
-            if 'demand' in attrs:
-                value.Demand[k] = self.getNodeActualDemand()
-            if 'demanddeficit' in attrs:
-                value.DemandDeficit[k] = self.getNodeDemandDeficit()
-            if 'demandSensingNodes' in attrs:
-                value.DemandSensingNodes[k] = \
-                    self.getNodeActualDemandSensingNodes(
-                        attrs[sensingnodes - 1]
-                    )
-            if 'head' in attrs:
-                value.Head[k] = self.getNodeHydraulicHead()
-            if 'tankvolume' in attrs:
-                value.TankVolume[k] = np.zeros(
-                    self.getNodeJunctionCount() +
-                    self.getNodeReservoirCount()
-                )
-                value.TankVolume[k] = np.concatenate((
-                    value.TankVolume[k],
-                    self.getNodeTankVolume()))
-            if 'flow' in attrs:
-                value.Flow[k] = self.getLinkFlows()
-            if 'velocity' in attrs:
-                value.Velocity[k] = self.getLinkVelocity()
-            if 'headloss' in attrs:
-                value.HeadLoss[k] = self.getLinkHeadloss()
+                columns['Time'][k] = t
+            for name, code in node_fields:
+                api.ENgetnodevalues(code, out=columns[name][k])
+            for name, code in link_fields:
+                api.ENgetlinkvalues(code, out=columns[name][k])
+            if sensing_indices is not None:
+                api.ENgetnodevalues(tk.EN_DEMAND, sensing_indices, out=columns['DemandSensingNodes'][k])
+            if 'tankvolume' in attrs and tank_index.size:
+                columns['TankVolume'][k, tank_index - 1] = api.ENgetnodevalues(tk.EN_TANKVOLUME, tank_index)
             if 'status' in attrs:
-                value.Status[k] = self.getLinkStatus()
-                value.StatusStr[k] = []
-                for i in value.Status[k]:
-                    value.StatusStr[k].append(self.TYPESTATUS[i])
-                value.StatusStr[k] = np.array(value.StatusStr[k])
-            if 'setting' in attrs:
-                value.Setting[k] = self.getLinkSettings()
-            if 'energy' in attrs:
-                value.Energy[k] = self.getLinkEnergy()
-            if 'efficiency' in attrs:
-                value.Efficiency[k] = np.zeros(self.getLinkPipeCount())
-                value.Efficiency[k] = np.concatenate((
-                    value.Efficiency[k],
-                    self.getLinkPumpEfficiency()))
-                value.Efficiency[k] = np.concatenate((
-                    value.Efficiency[k],
-                    np.zeros(self.getLinkValveCount())))
-            if 'state' in attrs:
-                value.State[k] = self.getLinkPumpState()
-                value.StateStr[k] = []
-                for i in value.State[k]:
-                    value.StateStr[k].append(self.TYPEPUMPSTATE[int(i)])
-                value.StateStr[k] = np.array(value.StateStr[k])
+                columns['Status'][k] = api.ENgetlinkvalues(tk.EN_STATUS)
+            if 'efficiency' in attrs and pump_index.size:
+                columns['Efficiency'][k, pump_index - 1] = api.ENgetlinkvalues(tk.EN_PUMP_EFFIC, pump_index)
+            if 'state' in attrs and pump_index.size:
+                columns['State'][k] = api.ENgetlinkvalues(tk.EN_PUMP_STATE, pump_index)
             tstep = self.nextHydraulicAnalysisStep()
-            k += 1
         self.closeHydraulicAnalysis()
-        value.Time = np.array(value.Time)
 
-        value_final = EpytValues()
-        val_dict = value.__dict__
-        for i in val_dict:
-            if type(val_dict[i]) is dict:
-                exec(f"value_final.{i} = np.array(list(val_dict[i].values()))")
-            else:
-                exec(f"value_final.{i} = val_dict[i]")
-        return value_final
+        value = EpytValues()
+        for name, column in series.finalize().items():
+            setattr(value, name, column)
+        if sensing_indices is not None:
+            value.SensingNodesIndices = sensing_indices
+        # Status strings are decoded once from the stored codes
+        if 'status' in attrs:
+            value.StatusStr = np.array(self.TYPESTATUS)[value.Status]
+        if 'state' in attrs:
+            value.StateStr = np.array(self.TYPEPUMPSTATE)[value.State]
+        return value
 
     def getComputedQualityTimeSeries(self, *argv):
         """ Computes Quality simulation and retrieves all or some time-series.
@@ -2489,13 +2701,32 @@ class epanet(error_handler):
                 exec(f"value_final.{i} = val_dict[i]")
         return value_final
 
-    def getComputedTimeSeries(self):
-        """ Run analysis using .exe file """
+    def getComputedTimeSeries(self, lazy=False, cache_size=16):
+        """ Run analysis using .exe file
+
+        :param lazy: If True, return an EpytLazyValues object that keeps the binary output
+                     file open and decodes fields (or node/link subsets) only when accessed
+        :type lazy: bool, optional
+        :param cache_size: Number of decoded fields kept by the lazy results object
+        :type cache_size: int, optional
+
+        Example:
+
+        >>> res = d.getComputedTimeSeries(lazy=True)
+        >>> res.Pressure                          # decoded on first access
+        >>> res.select('Pressure', [1, 5, 10])    # only three nodes
+        >>> res.close()
+
+        See also getComputedTimeSeries_ENepanet, getComputedHydraulicTimeSeries.
+        """
         self.saveInputFile(self.TempInpFile)
         [fid, binfile, _] = self.runEPANETexe()
         if fid is False:  # temporary.
-            value_final = self.getComputedTimeSeries_ENepanet()
+            value_final = self.getComputedTimeSeries_ENepanet(lazy=lazy, cache_size=cache_size)
             return value_final
+        if lazy:
+            fid.close()
+            return self.__lazyEpanetBin(binfile, cache_size, True)
         value = self.__readEpanetBin(fid, binfile, 0)
         value.WarnFlag = False
         if self.errcode:
@@ -2503,38 +2734,30 @@ class epanet(error_handler):
             value.ErrCode = self.errcode
             self.api.ENgeterror(self.errcode)
 
-        value.StatusStr = {}
-        for i in range(1, len(value.Status) + 1):
-            value.StatusStr[i] = []
-            for j in value.Status[i]:
-                value.StatusStr[i].append(self.TYPEBINSTATUS[int(j)])
-            value.StatusStr[i] = np.array(value.StatusStr[i])
+        value.Status = value.Status.astype(int)
+        value.StatusStr = np.array(self.TYPEBINSTATUS)[value.Status]
 
         # Remove report bin txt , files @#
         for file in Path(".").glob("@#*.txt"):
             file.unlink()
-        value.Time = np.array(value.Time)
-        value_final = EpytValues()
-        val_dict = value.__dict__
-        for i in val_dict:
-            if type(val_dict[i]) is dict:
-                exec(f"value_final.{i} = np.array(list(val_dict[i].values()))")
-            else:
-                exec(f"value_final.{i} = val_dict[i]")
-        value_final.Status = value_final.Status.astype(int)
-        return value_final
+        return value
 
-    def getComputedTimeSeries_ENepanet(self, tempfile=None, binfile=None, rptfile=None):
-        """ Run analysis using ENepanet function """
+    def getComputedTimeSeries_ENepanet(self, tempfile=None, binfile=None, rptfile=None, lazy=False, cache_size=16):
+        """ Run analysis using ENepanet function
+
+        With lazy=True the binary output file is kept and an EpytLazyValues object is
+        returned, see getComputedTimeSeries. A binfile passed by the caller is not
+        removed when the lazy object is closed.
+        """
+        delete_binfile = binfile is None
 
         if tempfile is not None:
             self.saveInputFile(tempfile)
         else:
             self.saveInputFile(self.TempInpFile)
-            uuID = ''.join(random.choices(string.ascii_letters + string.digits, k=10))
 
         if binfile is None:
-            binfile = '@#' + uuID + '.bin'
+            binfile = '@#' + temp_id() + '.bin'
         if rptfile is None:
             rptfile = self.TempInpFile[:-4] + '.txt'
         self.api.ENclose()
@@ -2543,55 +2766,63 @@ class epanet(error_handler):
         else:
             self.api.ENepanet(self.TempInpFile, rptfile, binfile)
 
+        if lazy:
+            value = self.__lazyEpanetBin(binfile, cache_size, delete_binfile)
+            self.loadEPANETFile(self.TempInpFile)
+            return value
         fid = open(binfile, "rb")
         value = self.__readEpanetBin(fid, binfile, 0)
         value.WarnFlag = False
         if self.errcode:
             value.ErrCode = self.errcode
             value.WarnFlag = True
-        value.StatusStr = {}
-        for i in range(1, len(value.Status) + 1):
-            value.StatusStr[i] = []
-            for j in value.Status[i]:
-                value.StatusStr[i].append(self.TYPEBINSTATUS[int(j)])
+        value.Status = value.Status.astype(int)
+        value.StatusStr = np.array(self.TYPEBINSTATUS)[value.Status]
         # Remove report bin txt , files @#
         for file in Path(".").glob("@#*.txt"):
             file.unlink()
-        value.Time = np.array(value.Time)
-        value_final = EpytValues()
-        val_dict = value.__dict__
-        for i in val_dict:
-            if type(val_dict[i]) is dict:
-                exec(f"value_final.{i} = np.array(list(val_dict[i].values()))")
-            else:
-                exec(f"value_final.{i} = val_dict[i]")
-        value_final.Status = value_final.Status.astype(int)
         self.loadEPANETFile(self.TempInpFile)
-        return value_final
+        return value
 
-    def getAdjacencyMatrix(self):
+    def getAdjacencyMatrix(self, flows=None, sparse=False):
         """Compute the adjacency matrix (connectivity graph) considering the flows, at different time steps or the
-        mean flow, Compute the new adjacency matrix based on the mean flow in the network"""
-        Fmean = np.mean(self.getComputedTimeSeries().Flow, 0)
-        Fsign = np.sign(Fmean)
+        mean flow, Compute the new adjacency matrix based on the mean flow in the network
+
+        :param flows: flow of every link, defaults to the mean flow of getComputedTimeSeries
+        :type flows: np.ndarray, optional
+        :param sparse: return a scipy.sparse CSR matrix instead of a dense array (requires scipy)
+        :type sparse: bool
+
+        See also getTopology.
+        """
+        if flows is None:
+            flows = np.mean(self.getComputedTimeSeries().Flow, 0)
         Nidx = self.getLinkNodesIndex()
         fmax = np.max(Nidx)
+        if sparse:
+            return self.getTopology().adjacency(flows)[:fmax, :fmax]
+        Fsign = np.sign(flows)
         A = np.zeros((fmax, fmax))
-        for i, nnid in enumerate(Nidx):
-            if Fsign.item(i) == 1:
-                A[nnid[0] - 1, nnid[1] - 1] = 1
-            else:
-                A[nnid[1] - 1, nnid[0] - 1] = 1
+        positive = Fsign == 1
+        A[np.where(positive, Nidx[:, 0], Nidx[:, 1]) - 1, np.where(positive, Nidx[:, 1], Nidx[:, 0]) - 1] = 1
         return A
 
-    def getConnectivityMatrix(self):
-        """ Retrieve the Connectivity Matrix of the network """
+    def getConnectivityMatrix(self, sparse=False):
+        """ Retrieve the Connectivity Matrix of the network
+
+        :param sparse: return a scipy.sparse CSR matrix instead of a dense array (requires scipy)
+        :type sparse: bool
+
+        See also getTopology.
+        """
+        if sparse:
+            return self.getTopology().connectivity
         conn_ind = self.getNodesConnectingLinksIndex()
         cnt = self.getNodeCount()
         value = np.zeros((cnt, cnt), dtype=int)
-        for i in conn_ind:
-            value[i[0] - 1][i[1] - 1] += 1
-            value[i[1] - 1][i[0] - 1] += 1
+        conn_ind = np.array(conn_ind, dtype=int).reshape(-1, 2) - 1
+        np.add.at(value, (conn_ind[:, 0], conn_ind[:, 1]), 1)
+        np.add.at(value, (conn_ind[:, 1], conn_ind[:, 0]), 1)
         return value
 
     def getControls(self, *argv):
@@ -3128,18 +3359,10 @@ class epanet(error_handler):
         See also getLinkTypeIndex, getLinksInfo, getLinkDiameter,
         getLinkLength, getLinkRoughnessCoeff, getLinkMinorLossCoeff.
         """
-        lTypes = []
-        if len(argv) > 0:
-            index = argv[0]
-            if isinstance(index, list):
-                for i in index:
-                    lTypes.append(self.TYPELINK[self.api.ENgetlinktype(i)])
-            else:
-                lTypes = self.TYPELINK[self.api.ENgetlinktype(index)]
-        else:
-            for i in range(self.getLinkCount()):
-                lTypes.append(self.TYPELINK[self.api.ENgetlinktype(i + 1)])
-        return lTypes
+        types = self.getLinkTypeIndex(*argv)
+        if isinstance(types, list):
+            return [self.TYPELINK[i] for i in types]
+        return self.TYPELINK[types]
 
     def getLinkTypeIndex(self, *argv):
         """ Retrieves the link-type code for all links.
@@ -3156,18 +3379,13 @@ class epanet(error_handler):
         See also getLinkType, getLinksInfo, getLinkDiameter,
         getLinkLength, getLinkRoughnessCoeff, getLinkMinorLossCoeff.
         """
-        lTypes = []
+        types = self.getNetworkIndex().link_types
         if len(argv) > 0:
             index = argv[0]
             if isinstance(index, list):
-                for i in index:
-                    lTypes.append(self.api.ENgetlinktype(i))
-            else:
-                lTypes = self.api.ENgetlinktype(index)
-        else:
-            for i in range(self.getLinkCount()):
-                lTypes.append(self.api.ENgetlinktype(i + 1))
-        return lTypes
+                return [self.__getType(types, i, self.api.ENgetlinktype) for i in index]
+            return self.__getType(types, index, self.api.ENgetlinktype)
+        return types.tolist()
 
     def getLinkDiameter(self, *argv):
         """ Retrieves the value of link diameters.
@@ -3259,18 +3477,13 @@ class epanet(error_handler):
 
         See also getNodeNameID, getLinkPipeNameID, getLinkIndex.
         """
-        values = []
+        ids = self.getNetworkIndex().link_ids
         if len(argv) > 0:
             index = argv[0]
             if isinstance(index, (list, np.ndarray)):
-                for i in index:
-                    values.append(self.api.ENgetlinkid(i))
-            else:
-                values = self.api.ENgetlinkid(index)
-        else:
-            for i in range(self.getLinkCount()):
-                values.append(self.api.ENgetlinkid(i + 1))
-        return values
+                return [self.__getID(ids, i, self.api.ENgetlinkid) for i in index]
+            return self.__getID(ids, index, self.api.ENgetlinkid)
+        return list(ids)
 
     def getLinkInitialStatus(self, *argv):
         """ Retrieves the value of all link initial status.
@@ -3692,25 +3905,17 @@ class epanet(error_handler):
         getLinkLength, getLinkRoughnessCoeff, getLinkMinorLossCoeff.
         """
         value = EpytValues()
-        value.LinkDiameter = []
-        value.LinkLength = []
-        value.LinkRoughnessCoeff = []
-        value.LinkMinorLossCoeff = []
-        value.LinkInitialStatus = []
-        value.LinkInitialSetting = []
-        value.LinkBulkReactionCoeff = []
-        value.LinkWallReactionCoeff = []
+        value.LinkDiameter = self.api.ENgetlinkvalues(self.ToolkitConstants.EN_DIAMETER).tolist()
+        value.LinkLength = self.api.ENgetlinkvalues(self.ToolkitConstants.EN_LENGTH).tolist()
+        value.LinkRoughnessCoeff = self.api.ENgetlinkvalues(self.ToolkitConstants.EN_ROUGHNESS).tolist()
+        value.LinkMinorLossCoeff = self.api.ENgetlinkvalues(self.ToolkitConstants.EN_MINORLOSS).tolist()
+        value.LinkInitialStatus = self.api.ENgetlinkvalues(self.ToolkitConstants.EN_INITSTATUS).tolist()
+        value.LinkInitialSetting = self.api.ENgetlinkvalues(self.ToolkitConstants.EN_INITSETTING).tolist()
+        value.LinkBulkReactionCoeff = self.api.ENgetlinkvalues(self.ToolkitConstants.EN_KBULK).tolist()
+        value.LinkWallReactionCoeff = self.api.ENgetlinkvalues(self.ToolkitConstants.EN_KWALL).tolist()
         value.LinkTypeIndex = []
         value.NodesConnectingLinksIndex = [[0, 0] for _ in range(self.getLinkCount())]
         for i in range(1, self.getLinkCount() + 1):
-            value.LinkDiameter.append(self.api.ENgetlinkvalue(i, self.ToolkitConstants.EN_DIAMETER))
-            value.LinkLength.append(self.api.ENgetlinkvalue(i, self.ToolkitConstants.EN_LENGTH))
-            value.LinkRoughnessCoeff.append(self.api.ENgetlinkvalue(i, self.ToolkitConstants.EN_ROUGHNESS))
-            value.LinkMinorLossCoeff.append(self.api.ENgetlinkvalue(i, self.ToolkitConstants.EN_MINORLOSS))
-            value.LinkInitialStatus.append(self.api.ENgetlinkvalue(i, self.ToolkitConstants.EN_INITSTATUS))
-            value.LinkInitialSetting.append(self.api.ENgetlinkvalue(i, self.ToolkitConstants.EN_INITSETTING))
-            value.LinkBulkReactionCoeff.append(self.api.ENgetlinkvalue(i, self.ToolkitConstants.EN_KBULK))
-            value.LinkWallReactionCoeff.append(self.api.ENgetlinkvalue(i, self.ToolkitConstants.EN_KWALL))
             value.LinkTypeIndex.append(self.api.ENgetlinktype(i))
             xy = self.api.ENgetlinknodes(i)
             value.NodesConnectingLinksIndex[i - 1][0] = xy[0]
@@ -3998,14 +4203,15 @@ class epanet(error_handler):
         values = []
         if len(argv) > 0:
             index = argv[0]
+            # IDs that are not in the network are passed to the toolkit, which reports the error
+            index_map = self.getNetworkIndex().link_index
             if isinstance(index, list):
                 for i in index:
-                    values.append(self.api.ENgetlinkindex(i))
+                    values.append(index_map[i] if i in index_map else self.api.ENgetlinkindex(i))
             else:
-                values = self.api.ENgetlinkindex(index)
+                values = index_map[index] if index in index_map else self.api.ENgetlinkindex(index)
         else:
-            for i in range(self.getLinkCount()):
-                values.append(i + 1)
+            values = list(range(1, self.getLinkCount() + 1))
         return values
 
     def getLinkNodesIndex(self, *argv):
@@ -4036,12 +4242,7 @@ class epanet(error_handler):
 
         See also getLinkIndex, getLinkPumpIndex.
         """
-        tmpLinkTypes = self.getLinkType()
-        value = []
-        for i in range(len(tmpLinkTypes)):
-            if tmpLinkTypes[i] == 'PIPE' or tmpLinkTypes[i] == 'CVPIPE':
-                value.append(i + 1)
-        return value
+        return self.getNetworkIndex().pipes.tolist()
 
     def getLinkPipeNameID(self, *argv):
         """ Retrieves the pipe ID.
@@ -4095,8 +4296,7 @@ class epanet(error_handler):
 
         See also getLinkIndex, getLinkPipeIndex, getLinkValveIndex.
         """
-        tmpLinkTypes = self.getLinkTypeIndex()
-        value = np.array([i for i, x in enumerate(tmpLinkTypes) if x == self.ToolkitConstants.EN_PUMP]) + 1
+        value = self.getNetworkIndex().pumps.copy()
         if value.size == 0:
             return value
         if argv:
@@ -4138,12 +4338,7 @@ class epanet(error_handler):
 
         See also getLinkIndex, getLinkPipeIndex(), getLinkPumpIndex.
         """
-        tmpLinkTypes = self.getLinkType()
-        value = []
-        for i in range(len(tmpLinkTypes)):
-            if tmpLinkTypes[i].endswith('V'):
-                value.append(i + 1)
-        return np.array(value)
+        return self.getNetworkIndex().valves.copy()
 
     def getLinkValveNameID(self, *argv):
         """ Retrieves the valve ID.
@@ -4174,6 +4369,29 @@ class epanet(error_handler):
             else:
                 return self.getLinkNameID(vIndices[argv[0] - 1])
 
+    def getNetworkIndex(self):
+        """ Retrieves the ID <-> index maps and the node/link types of the network.
+
+        The object is read from the toolkit once and cached until nodes or links
+        are added, deleted, renamed or change type, or another network is loaded.
+        getNodeIndex, getNodeNameID, getNodeTypeIndex and the related link and
+        per-type functions use it.
+
+        Example:
+
+        >>> index = d.getNetworkIndex()
+        >>> index.node_index['10']                    # Index of node '10'
+        >>> index.link_indices(['10', '11', '12'])    # Indices of links as an array
+        >>> index.tanks                               # Indices of the tanks
+        >>> index.link_types                          # Type code of every link
+
+        See also getNodeIndex, getLinkIndex, getNodeNameID, getLinkNameID.
+        """
+        version = self.api._network_version
+        if self._network_index is None or self._network_index[0] != version:
+            self._network_index = (version, NetworkIndex(self.api))
+        return self._network_index[1]
+
     def getNetworksDatabase(self):
         """Return all EPANET Input Files from EPyT database."""
         networksdb = []
@@ -4195,14 +4413,8 @@ class epanet(error_handler):
         See also getNodeActualDemand, getNodeHydraulicHead, getNodePressure,
         getNodeActualQuality, getNodeMassFlowRate, getNodeActualQualitySensingNodes.
         """
-        value = []
-        if len(argv) > 0:
-            indices = argv[0]
-        else:
-            indices = self.getNodeIndex()
-        for i in indices:
-            value.append(self.api.ENgetnodevalue(i, self.ToolkitConstants.EN_DEMAND))
-        return np.array(value)
+        indices = argv[0] if len(argv) > 0 else None
+        return self.api.ENgetnodevalues(self.ToolkitConstants.EN_DEMAND, indices)
 
     def getNodeCount(self):
         """ Retrieves the number of nodes.
@@ -4505,14 +4717,15 @@ class epanet(error_handler):
         values = []
         if len(argv) > 0:
             index = argv[0]
+            # IDs that are not in the network are passed to the toolkit, which reports the error
+            index_map = self.getNetworkIndex().node_index
             if isinstance(index, list):
                 for i in index:
-                    values.append(self.api.ENgetnodeindex(i))
+                    values.append(index_map[i] if i in index_map else self.api.ENgetnodeindex(i))
             else:
-                values = self.api.ENgetnodeindex(index)
+                values = index_map[index] if index in index_map else self.api.ENgetnodeindex(index)
         else:
-            for i in range(self.getNodeCount()):
-                values.append(i + 1)
+            values = list(range(1, self.getNodeCount() + 1))
         return values
 
     def getNodeInitialQuality(self, *argv):
@@ -4635,8 +4848,7 @@ class epanet(error_handler):
         See also getNodeNameID, getNodeIndex, getNodeReservoirIndex,
         getNodeType, getNodeTypeIndex, getNodesInfo.
         """
-        tmpNodeTypes = self.getNodeTypeIndex()
-        value = [i for i, x in enumerate(tmpNodeTypes) if x == self.ToolkitConstants.EN_JUNCTION]
+        value = (self.getNetworkIndex().junctions - 1).tolist()
         if (len(value) > 0) and (len(argv) > 0):
             index = argv[0]
             try:
@@ -4782,8 +4994,7 @@ class epanet(error_handler):
         See also getNodeNameID, getNodeIndex, getNodeJunctionIndex,
         getNodeType, getNodeTypeIndex, getNodesInfo.
         """
-        tmpNodeTypes = self.getNodeTypeIndex()
-        value = [i for i, x in enumerate(tmpNodeTypes) if x == self.ToolkitConstants.EN_RESERVOIR]
+        value = (self.getNetworkIndex().reservoirs - 1).tolist()
         if (len(value) > 0) and (len(argv) > 0):
             index = argv[0]
             try:
@@ -4892,18 +5103,13 @@ class epanet(error_handler):
         See also getNodeReservoirNameID, getNodeJunctionNameID,
         getNodeIndex, getNodeType, getNodesInfo.
         """
-        values = []
+        ids = self.getNetworkIndex().node_ids
         if len(argv) > 0:
             index = argv[0]
             if isinstance(index, list):
-                for i in index:
-                    values.append(self.api.ENgetnodeid(i))
-            else:
-                values = self.api.ENgetnodeid(index)
-        else:
-            for i in range(self.getNodeCount()):
-                values.append(self.api.ENgetnodeid(i + 1))
-        return values
+                return [self.__getID(ids, i, self.api.ENgetnodeid) for i in index]
+            return self.__getID(ids, index, self.api.ENgetnodeid)
+        return list(ids)
 
     def getNodeReservoirCount(self):
         """ Retrieves the number of Reservoirs.
@@ -5190,8 +5396,7 @@ class epanet(error_handler):
 
         See also getNodeTankCount, getNodeTankNameID.
         """
-        tmpNodeTypes = self.getNodeTypeIndex()
-        value = [i for i, x in enumerate(tmpNodeTypes) if x == self.ToolkitConstants.EN_TANK]
+        value = (self.getNetworkIndex().tanks - 1).tolist()
         if (len(value) > 0) and (len(argv) > 0):
             index = argv[0]
             try:
@@ -5551,18 +5756,10 @@ class epanet(error_handler):
 
         See also getNodeNameID, getNodeIndex, getNodeTypeIndex, getNodesInfo.
         """
-        nTypes = []
-        if len(argv) > 0:
-            index = argv[0]
-            if isinstance(index, list):
-                for i in index:
-                    nTypes.append(self.TYPENODE[self.api.ENgetnodetype(i)])
-            else:
-                nTypes = self.TYPENODE[self.api.ENgetnodetype(index)]
-        else:
-            for i in range(self.getNodeCount()):
-                nTypes.append(self.TYPENODE[self.api.ENgetnodetype(i + 1)])
-        return nTypes
+        types = self.getNodeTypeIndex(*argv)
+        if isinstance(types, list):
+            return [self.TYPENODE[i] for i in types]
+        return self.TYPENODE[types]
 
     def getNodeTypeIndex(self, *argv):
         """ Retrieves the node-type code for all nodes.
@@ -5574,18 +5771,13 @@ class epanet(error_handler):
 
         See also getNodeNameID, getNodeIndex, getNodeType, getNodesInfo.
         """
-        nTypes = []
+        types = self.getNetworkIndex().node_types
         if len(argv) > 0:
             index = argv[0]
             if isinstance(index, list):
-                for i in index:
-                    nTypes.append(self.api.ENgetnodetype(i))
-            else:
-                nTypes = self.api.ENgetnodetype(index)
-        else:
-            for i in range(self.getNodeCount()):
-                nTypes.append(self.api.ENgetnodetype(i + 1))
-        return nTypes
+                return [self.__getType(types, i, self.api.ENgetnodetype) for i in index]
+            return self.__getType(types, index, self.api.ENgetnodetype)
+        return types.tolist()
 
     def getOptionsAccuracyValue(self):
         """ Retrieves the total normalized flow change for hydraulic convergence.
@@ -6530,6 +6722,32 @@ class epanet(error_handler):
         """
         return self.api.ENgettitle()
 
+    def getTopology(self):
+        """ Retrieves the sparse graph of the network (requires scipy).
+
+        The object is built from getLinkNodesIndex and cached until nodes or
+        links are added, deleted, renamed or reconnected, or another network is
+        loaded.
+
+        Example:
+
+        >>> topo = d.getTopology()
+        >>> n, labels = topo.connected_components()
+        >>> topo.isolated_nodes(closed_links=[d.getLinkIndex('10')])
+        >>> topo.shortest_path(1, 11, weights=d.getLinkLength())
+
+        See also getConnectivityMatrix, getAdjacencyMatrix, getLinkNodesIndex.
+        """
+        from epyt.topology import NetworkTopology
+
+        version = self.api._network_version
+        if self._topology is None or self._topology[0] != version:
+            node_types = np.array(self.getNodeTypeIndex())
+            sources = np.flatnonzero(node_types != self.ToolkitConstants.EN_JUNCTION) + 1
+            topology = NetworkTopology(self.getLinkNodesIndex(), self.getNodeCount(), sources)
+            self._topology = (version, topology)
+        return self._topology[1]
+
     def getUnits(self):
         """ Retrieves the Units of Measurement.
 
@@ -6820,7 +7038,7 @@ class epanet(error_handler):
 
     def runsCompleteSimulation(self, *argv):
         """ Runs a complete hydraulic and water simulation to create
-        binary & report files with name: [NETWORK_temp.txt], [NETWORK_temp.bin]
+        binary & report files with name: [NETWORK_temp_ID.txt], [NETWORK_temp_ID.bin]
         OR you can use argument to runs a complete simulation via self.api.en_epanet
 
         Example:
@@ -7232,7 +7450,7 @@ class epanet(error_handler):
         See also getLinkBulkReactionCoeff, setLinkRoughnessCoeff,
         setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'KBULK', 'LINK', value, *argv)
+        self.__setEval('KBULK', 'LINK', value, *argv)
 
     def setLinkComment(self, value, *argv):
         """ Sets the comment string assigned to the link object.
@@ -7289,7 +7507,7 @@ class epanet(error_handler):
 
         See also setLinkPipeData, setLinkLength, setLinkBulkReactionCoeff, setLinkTypePipe.
         """
-        self.__setEval('ENsetlinkvalue', 'DIAMETER', 'LINK', value, *argv)
+        self.__setEval('DIAMETER', 'LINK', value, *argv)
 
     def setLinkInitialSetting(self, value, *argv):
         """ Sets the values of initial settings, roughness for pipes or initial speed for pumps or initial setting for valves.
@@ -7312,7 +7530,7 @@ class epanet(error_handler):
         See also getLinkInitialSetting, setLinkInitialStatus, setLinkRoughnessCoeff,
         setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'INITSETTING', 'LINK', value, *argv)
+        self.__setEval('INITSETTING', 'LINK', value, *argv)
 
     def setLinkInitialStatus(self, value, *argv):
         """ Sets the values of initial status.
@@ -7337,7 +7555,7 @@ class epanet(error_handler):
         See also getLinkInitialStatus, setLinkInitialSetting, setLinkDiameter,
         setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'INITSTATUS', 'LINK', value, *argv)
+        self.__setEval('INITSTATUS', 'LINK', value, *argv)
 
     def setLinkLength(self, value, *argv):
         """ Sets the values of lengths.
@@ -7360,7 +7578,7 @@ class epanet(error_handler):
         See also getLinkLength, setLinkDiameter, setLinkMinorLossCoeff,
         setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'LENGTH', 'LINK', value, *argv)
+        self.__setEval('LENGTH', 'LINK', value, *argv)
 
     def setLinkMinorLossCoeff(self, value, *argv):
         """ Sets the values of minor loss coefficient.
@@ -7383,7 +7601,7 @@ class epanet(error_handler):
         See also getLinkMinorLossCoeff, setLinkDiameter, setLinkRoughnessCoeff,
         setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'MINORLOSS', 'LINK', value, *argv)
+        self.__setEval('MINORLOSS', 'LINK', value, *argv)
 
     def setLinkNameID(self, value, *argv):
         """ Sets the ID name for links.
@@ -7535,7 +7753,7 @@ class epanet(error_handler):
         See also getLinkPumpECost, setLinkPumpPower, setLinkPumpHCurve,
         setLinkPumpECurve, setLinkPumpEPat.
         """
-        self.__setEvalLinkNode('ENsetlinkvalue', 'PUMP_ECOST', 'PUMP', value, *argv)
+        self.__setEvalLinkNode('PUMP_ECOST', 'PUMP', value, *argv)
 
     def setLinkPumpECurve(self, value, *argv):
         """ Sets the pump efficiency v. flow curve index.
@@ -7572,7 +7790,7 @@ class epanet(error_handler):
 
         See also getLinkPumpECurve, setLinkPumpPower, setLinkPumpHCurve, setLinkPumpECost, setLinkPumpEPat.
         """
-        self.__setEvalLinkNode('ENsetlinkvalue', 'PUMP_ECURVE', 'PUMP', value, *argv)
+        self.__setEvalLinkNode('PUMP_ECURVE', 'PUMP', value, *argv)
 
     def setLinkPumpEPat(self, value, *argv):
         """ Sets the pump energy price time pattern index.
@@ -7609,7 +7827,7 @@ class epanet(error_handler):
 
         See also getLinkPumpEPat, setLinkPumpPower, setLinkPumpHCurve, setLinkPumpECurve, setLinkPumpECost.
         """
-        self.__setEvalLinkNode('ENsetlinkvalue', 'PUMP_EPAT', 'PUMP', value, *argv)
+        self.__setEvalLinkNode('PUMP_EPAT', 'PUMP', value, *argv)
 
     def setLinkPumpHCurve(self, value, *argv):
         """ Sets the pump head v. flow curve index.
@@ -7646,7 +7864,7 @@ class epanet(error_handler):
 
         See also getLinkPumpHCurve, setLinkPumpPower, setLinkPumpECurve, setLinkPumpECost, setLinkPumpEPat.
         """
-        self.__setEvalLinkNode('ENsetlinkvalue', 'PUMP_HCURVE', 'PUMP', value, *argv)
+        self.__setEvalLinkNode('PUMP_HCURVE', 'PUMP', value, *argv)
 
     def setLinkPumpHeadCurveIndex(self, value, *argv):
         """ Sets the curves index for pumps index
@@ -7714,7 +7932,7 @@ class epanet(error_handler):
         See also getLinkPumpPatternIndex, setLinkPumpPower, setLinkPumpHCurve,
         setLinkPumpECurve, setLinkPumpECost.
         """
-        self.__setEvalLinkNode('ENsetlinkvalue', 'LINKPATTERN', 'PUMP', value, *argv)
+        self.__setEvalLinkNode('LINKPATTERN', 'PUMP', value, *argv)
 
     def setLinkPumpPower(self, value, *argv):
         """ Sets the power for pumps.
@@ -7751,7 +7969,7 @@ class epanet(error_handler):
 
         See also getLinkPumpPower, setLinkPumpHCurve, setLinkPumpECurve, setLinkPumpECost, setLinkPumpEPat.
         """
-        self.__setEvalLinkNode('ENsetlinkvalue', 'PUMP_POWER', 'PUMP', value, *argv)
+        self.__setEvalLinkNode('PUMP_POWER', 'PUMP', value, *argv)
 
     def setLinkRoughnessCoeff(self, value, *argv):
         """ Sets the values of roughness coefficient.
@@ -7773,7 +7991,7 @@ class epanet(error_handler):
 
         See also getLinkRoughnessCoeff, setLinkDiameter, setLinkMinorLossCoeff, setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'ROUGHNESS', 'LINK', value, *argv)
+        self.__setEval('ROUGHNESS', 'LINK', value, *argv)
 
     def setLinkSettings(self, value, *argv):
         """Sets the values of current settings, roughness for pipes or initial speed for pumps or initial setting for valves.
@@ -7796,7 +8014,7 @@ class epanet(error_handler):
         See also getLinkSettings, setLinkStatus, setLinkRoughnessCoeff,
                  setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'SETTING', 'LINK', value, *argv)
+        self.__setEval('SETTING', 'LINK', value, *argv)
 
     def setLinkStatus(self, value, *argv):
         """ Sets the values of current status for links.
@@ -7821,7 +8039,7 @@ class epanet(error_handler):
         See also getLinkStatus, setLinkInitialStatus, setLinkDiameter,
         setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'STATUS', 'LINK', value, *argv)
+        self.__setEval('STATUS', 'LINK', value, *argv)
 
     def setLinkTypePipe(self, Id, *argv):
         """ Sets the link type pipe for a specified link.
@@ -8103,6 +8321,30 @@ class epanet(error_handler):
         index = self.__checkLinkIfString(Id)
         return self.api.ENsetlinktype(index, self.ToolkitConstants.EN_TCV, condition)
 
+    def setLinkValues(self, paramcode, value, *argv):
+        """ Sets a property of all links, or of the links given by index or ID, from an array.
+
+        The number of values is checked once, NaN values are skipped, IDs are
+        resolved through a dictionary cached until the network is edited and the
+        values are written with a single call to ENsetlinkvalues.
+
+        Example 1:
+
+        >>> roughness = d.getLinkRoughnessCoeff()
+        >>> d.setLinkValues(d.ToolkitConstants.EN_ROUGHNESS, roughness * 0.9)            # Sets the roughness of all links
+
+        Example 2:
+
+        >>> d.setLinkValues(d.ToolkitConstants.EN_INITSTATUS, ['10', '9'], [1, 0])       # Sets the initial status of links '10' and '9'
+
+        Example 3:
+
+        >>> d.setLinkValues(d.ToolkitConstants.EN_DIAMETER, np.arange(1, 6), 12)          # Sets the diameter of the first 5 links
+
+        See also setNodeValues, setLinkRoughnessCoeff, setLinkStatus, getLinkIndex.
+        """
+        self.__setValues('link', paramcode, value, *argv)
+
     def setLinkVertices(self, linkID, x, y, *argv):
         """ Assigns a set of internal vertex points to a link.
 
@@ -8141,7 +8383,7 @@ class epanet(error_handler):
 
         See also getLinkWallReactionCoeff, setLinkBulkReactionCoeff, setLinkPipeData, addLink, deleteLink.
         """
-        self.__setEval('ENsetlinkvalue', 'KWALL', 'LINK', value, *argv)
+        self.__setEval('KWALL', 'LINK', value, *argv)
 
     def setNodeBaseDemands(self, value, *argv):
         """ Sets the values of demand for nodes.
@@ -8350,7 +8592,7 @@ class epanet(error_handler):
         See also getNodeElevations, setNodeCoordinates, setNodeBaseDemands,
         setNodeJunctionData, addNodeJunction, deleteNode.
         """
-        self.__setEval('ENsetnodevalue', 'ELEVATION', 'NODE', value, *argv)
+        self.__setEval('ELEVATION', 'NODE', value, *argv)
 
     def setNodeEmitterCoeff(self, value, *argv):
         """ Sets the values of emitter coefficient for nodes.
@@ -8372,7 +8614,7 @@ class epanet(error_handler):
 
         See also getNodeEmitterCoeff, setNodeBaseDemands, setNodeJunctionData.
         """
-        self.__setEval('ENsetnodevalue', 'EMITTER', 'NODE', value, *argv)
+        self.__setEval('EMITTER', 'NODE', value, *argv)
 
     def setNodeInitialQuality(self, value, *argv):
         """ Sets the values of initial quality for nodes.
@@ -8394,7 +8636,7 @@ class epanet(error_handler):
 
         See also getNodeInitialQuality, getNodeActualQuality, setNodeJunctionData.
         """
-        self.__setEval('ENsetnodevalue', 'INITQUAL', 'NODE', value, *argv)
+        self.__setEval('INITQUAL', 'NODE', value, *argv)
 
     def setNodeJunctionData(self, index, elev, dmnd, dmndpat):
         """ Sets a group of properties for a junction node.
@@ -8527,7 +8769,7 @@ class epanet(error_handler):
 
         See also getNodeSourcePatternIndex, setNodeSourceQuality, setNodeSourceType.
         """
-        self.__setEval('ENsetnodevalue', 'SOURCEPAT', 'NODE', value, *argv)
+        self.__setEval('SOURCEPAT', 'NODE', value, *argv)
 
     def setNodeSourceQuality(self, value, *argv):
         """ Sets the values of quality source strength.
@@ -8550,7 +8792,7 @@ class epanet(error_handler):
 
         See also getNodeSourceQuality, setNodeSourcePatternIndex, setNodeSourceType.
         """
-        self.__setEval('ENsetnodevalue', 'SOURCEQUAL', 'NODE', value, *argv)
+        self.__setEval('SOURCEQUAL', 'NODE', value, *argv)
 
     def setNodeSourceType(self, index, value):
         """ Sets the values of quality source type.
@@ -8610,7 +8852,7 @@ class epanet(error_handler):
         See also getNodeTankBulkReactionCoeff, setNodeTankInitialLevel, setNodeTankMixingModelType,
         setNodeTankCanOverFlow, setNodeTankDiameter, setNodeTankData.
         """
-        self.__setEvalLinkNode('ENsetnodevalue', 'TANK_KBULK', 'TANK', value, *argv)
+        self.__setEvalLinkNode('TANK_KBULK', 'TANK', value, *argv)
 
     def setNodeTankCanOverFlow(self, value, *argv):
         """ Sets the tank can-overflow (= 1) or not (= 0).
@@ -8648,7 +8890,7 @@ class epanet(error_handler):
         See also getNodeTankCanOverFlow, setNodeTankBulkReactionCoeff, setNodeTankMinimumWaterLevel,
         setNodeTankMinimumWaterVolume, setNodeTankDiameter, setNodeTankData.
         """
-        self.__setEvalLinkNode('ENsetnodevalue', 'CANOVERFLOW', 'TANK', value, *argv)
+        self.__setEvalLinkNode('CANOVERFLOW', 'TANK', value, *argv)
 
     def setNodeTankData(self, index, elev, intlvl, minlvl, maxlvl, diam, minvol, volcurve):
         """ Sets a group of properties for a tank.
@@ -8762,7 +9004,7 @@ class epanet(error_handler):
         See also getNodeTankDiameter, setNodeTankInitialLevel, setNodeTankMinimumWaterLevel,
         setNodeTankBulkReactionCoeff, setNodeTankCanOverFlow, setNodeTankData.
         """
-        self.__setEvalLinkNode('ENsetnodevalue', 'TANKDIAM', 'TANK', value, *argv)
+        self.__setEvalLinkNode('TANKDIAM', 'TANK', value, *argv)
 
     def setNodeTankInitialLevel(self, value, *argv):
         """ Sets the values of initial level for tanks.
@@ -8800,7 +9042,7 @@ class epanet(error_handler):
         See also getNodeTankInitialLevel, setNodeTankMinimumWaterLevel, setNodeTankMaximumWaterLevel,
         setNodeTankMinimumWaterVolume, setNodeTankMixingFraction, setNodeTankData.
         """
-        self.__setEvalLinkNode('ENsetnodevalue', 'TANKLEVEL', 'TANK', value, *argv)
+        self.__setEvalLinkNode('TANKLEVEL', 'TANK', value, *argv)
 
     def setNodeTankMaximumWaterLevel(self, value, *argv):
         """ Sets the maximum water level value for tanks.
@@ -8838,7 +9080,7 @@ class epanet(error_handler):
         See also getNodeTankMaximumWaterLevel, setNodeTankInitialLevel, setNodeTankMinimumWaterLevel,
         setNodeTankMinimumWaterVolume, setNodeTankMixingFraction, setNodeTankData.
         """
-        self.__setEvalLinkNode('ENsetnodevalue', 'MAXLEVEL', 'TANK', value, *argv)
+        self.__setEvalLinkNode('MAXLEVEL', 'TANK', value, *argv)
 
     def setNodeTankMinimumWaterLevel(self, value, *argv):
         """ Sets the minimum water level value for tanks.
@@ -8876,7 +9118,7 @@ class epanet(error_handler):
         See also getNodeTankMinimumWaterLevel, setNodeTankInitialLevel, setNodeTankMaximumWaterLevel,
         setNodeTankMinimumWaterVolume, setNodeTankMixingFraction, setNodeTankData.
         """
-        self.__setEvalLinkNode('ENsetnodevalue', 'MINLEVEL', 'TANK', value, *argv)
+        self.__setEvalLinkNode('MINLEVEL', 'TANK', value, *argv)
 
     def setNodeTankMinimumWaterVolume(self, value, *argv):
         """ Sets the minimum water volume value for tanks.
@@ -8914,7 +9156,7 @@ class epanet(error_handler):
         See also getNodeTankMinimumWaterVolume, setNodeTankInitialLevel, setNodeTankMinimumWaterLevel,
         setNodeTankMaximumWaterLevel, setNodeTankMixingFraction, setNodeTankData.
         """
-        self.__setEvalLinkNode('ENsetnodevalue', 'MINVOLUME', 'TANK', value, *argv)
+        self.__setEvalLinkNode('MINVOLUME', 'TANK', value, *argv)
 
     def setNodeTankMixingFraction(self, value, *argv):
         """ Sets the tank mixing fraction of total volume occupied by the inlet/outlet zone in a 2-compartment tank.
@@ -8952,7 +9194,7 @@ class epanet(error_handler):
         See also getNodeTankMixingFraction, setNodeTankMixingModelType, setNodeTankMinimumWaterLevel,
         setNodeTankMinimumWaterVolume, setNodeTankDiameter, setNodeTankData.
         """
-        self.__setEvalLinkNode('ENsetnodevalue', 'MIXFRACTION', 'TANK', value, *argv)
+        self.__setEvalLinkNode('MIXFRACTION', 'TANK', value, *argv)
 
     def setNodeTankMixingModelType(self, value, *argv):
         """ Sets the mixing model type value for tanks.
@@ -9005,9 +9247,34 @@ class epanet(error_handler):
             value = code
         elif len(argv) == 1:
             argv = code
-            self.__setEvalLinkNode('ENsetnodevalue', 'MIXMODEL', 'TANK', value, argv)
+            self.__setEvalLinkNode('MIXMODEL', 'TANK', value, argv)
             return
-        self.__setEvalLinkNode('ENsetnodevalue', 'MIXMODEL', 'TANK', value, *argv)
+        self.__setEvalLinkNode('MIXMODEL', 'TANK', value, *argv)
+
+    def setNodeValues(self, paramcode, value, *argv):
+        """ Sets a property of all nodes, or of the nodes given by index or ID, from an array.
+
+        The number of values is checked once, NaN values are skipped, IDs are
+        resolved through a dictionary cached until the network is edited and the
+        values are written with a single call to ENsetnodevalues.
+
+        Example 1:
+
+        >>> elevations = d.getNodeElevations()
+        >>> d.setNodeValues(d.ToolkitConstants.EN_ELEVATION, elevations + 1)              # Sets the elevation of all nodes
+
+        Example 2:
+
+        >>> d.setNodeValues(d.ToolkitConstants.EN_TANKLEVEL, ['2'], [110])                 # Sets the initial level of tank '2'
+
+        Example 3:
+
+        >>> junctions = d.getNodeJunctionIndex()
+        >>> d.setNodeValues(d.ToolkitConstants.EN_BASEDEMAND, junctions, np.nan)        # NaN values are skipped
+
+        See also setLinkValues, setNodeBaseDemands, setNodeTankInitialLevel, getNodeIndex.
+        """
+        self.__setValues('node', paramcode, value, *argv)
 
     def setNodeTypeJunction(self, Id):
         """ Transforms a node to JUNCTION
@@ -10207,60 +10474,18 @@ class epanet(error_handler):
         >>> hr = 10
         >>> d.plot(node_values = P[hr])
         """
+        from epyt.plotting import NetworkRenderer
+
         plot_links = True
         plot_nodes = True
-        fix_colorbar = False
-        text_links_ID = False
-        text_links_ind = False
-        text_nodes_ID = False
-        text_nodes_ind = False
-        text_nodes_ID_spec = False
-        text_nodes_ind_spec = False
-        text_links_ID_spec = False
-        text_links_ind_spec = False
-        nodes_to_show_ID = []
-        nodes_to_show_ind = []
-        links_to_show_ID = []
-        links_to_show_ind = []
-        links_ind = self.getLinkIndex()
-        links_ID = self.getLinkNameID()
-        valves_ID = []
-        junc_ID = []
-        res_ID = []
-        tank_ID = []
         if point is True:
             plot_links = False
         if line is True:
             plot_nodes = False
-        if linksID is not None:
-            text_links_ID_spec = True
-            links_to_show_ID = linksID
-        if linksID is True:
-            text_links_ID = True
-        if linksindex is not None:
-            links_to_show_ind = linksindex
-            text_links_ind_spec = True
-        if linksindex is True:
-            text_links_ind = True
-        if nodesID is not None:
-            valves_ID = self.getLinkValveNameID()
-            junc_ID = self.getNodeJunctionNameID()
-            res_ID = self.getNodeReservoirNameID()
-            tank_ID = self.getNodeTankNameID()
-            text_nodes_ID_spec = True
-            nodes_to_show_ID = nodesID
-        if nodesID is True:
-            text_nodes_ID = True
-        if nodesindex is not None:
-            nodes_to_show_ind = nodesindex
-            text_nodes_ind_spec = True
-        if nodesindex is True:
-            text_nodes_ind = True
 
         if node_values is not None:
             plot_nodes = False
             legend = False
-            fix_colorbar = True
             if colorbar_label is None:
                 colorbar_label = ' '
             if colors is None:
@@ -10272,7 +10497,6 @@ class epanet(error_handler):
             if node_text is True:
                 plot_nodes = True
         if link_values is not None:
-            fix_colorbar = True
             if colorbar_label is None:
                 colorbar_label = ' '
             legend = False
@@ -10282,23 +10506,9 @@ class epanet(error_handler):
                     min_colorbar = np.min(link_values)
                 if max_colorbar is None:
                     max_colorbar = np.max(link_values)
-                link_values_t = [(i - min_colorbar) / (max_colorbar - min_colorbar) for i in link_values]
-                colors = eval(f"cm.{colorbar}(link_values_t)")
 
-        # get info from EN functions
-        nodenameid = self.getNodeNameID()
-        linknameid = self.getLinkNameID()
-        if len(nodenameid) == 0 or len(linknameid) == 0:
+        if self.getNodeCount() == 0 or self.getLinkCount() == 0:
             raise Exception('Not enough network nodes/links.')
-        nodeconlinkIndex = self.getNodesConnectingLinksIndex()
-        pumpindex = self.getLinkPumpIndex()
-        pipeindex = self.getLinkPipeIndex()
-        valveindex = list(self.getLinkValveIndex())
-        juncind = self.getNodeJunctionIndex()
-        resindex = self.getNodeReservoirIndex()
-        tankindex = self.getNodeTankIndex()
-        nodecoords = self.getNodeCoordinates()
-        linkvertices = self.getLinkVerticesCount()
 
         # Create figure
         plt.rcParams["figure.figsize"] = fig_size
@@ -10306,194 +10516,57 @@ class epanet(error_handler):
         if figure:
             figure = plt.figure()
         plt.axis('off')
+        renderer = NetworkRenderer(self)
 
-        # Plot Links
-        xV = 0
-        yV = 0
+        # Plot Links, all of them in one collection
         if plot_links:
-            lindex = [0]
+            if link_values is not None:
+                renderer.draw_links(link_values, colors=colors, cmap=colorbar, vmin=min_colorbar, vmax=max_colorbar)
+            else:
+                renderer.draw_links()
             if highlightlink is not None:
-                lindex = self.__getLinkIndices(highlightlink)
-                lNodesInd = self.getLinkNodesIndex(lindex)
-            x, y = [0, 0], [0, 0]
-            for i in links_ind:
-                fromNode = nodeconlinkIndex[i - 1][0]
-                toNode = nodeconlinkIndex[i - 1][1]
-                x[0] = nodecoords['x'][fromNode]
-                y[0] = nodecoords['y'][fromNode]
-                x[1] = nodecoords['x'][toNode]
-                y[1] = nodecoords['y'][toNode]
-                if not nodecoords['x_vert'][i]:  # Check if not vertices
-                    if fix_colorbar and link_values is not None:
-                        plt.plot(x, y, '-', linewidth=0.7, zorder=0, color=colors[i - 1])
-                    else:
-                        if i != pipeindex[-1]:
-                            plt.plot(x, y, color='steelblue', linewidth=0.2, zorder=0)
-                        else:
-                            plt.plot(x, y, color='steelblue', linewidth=0.2, zorder=0, label='Pipes')
-
-                    if text_links_ID or (text_links_ID_spec and links_ID[i - 1] in links_to_show_ID):
-                        plt.text(
-                            (x[0] + x[1]) / 2, (y[0] + y[1]) / 2, links_ID[i - 1], {'fontsize': fontsize}
-                        )
-                    elif text_links_ind or (text_links_ind_spec and i in links_to_show_ind):
-                        plt.text(
-                            (x[0] + x[1]) / 2, (y[0] + y[1]) / 2, links_ind[i - 1], {'fontsize': fontsize}
-                        )
-                    if link_text:
-                        plt.text((x[0] + x[1]) / 2, (y[0] + y[1]) / 2, "{:.2f}".format(link_values[i - 1]),
-                                 {'fontsize': fontsize})
-
-                    if i in lindex:
-                        plt.plot(x, y, 'r-', linewidth=highligthlink_linewidth, zorder=0)
-
-                else:
-                    xV_old = x[0]
-                    yV_old = y[0]
-
-                    for j in range(len(nodecoords['x_vert'][i])):
-                        xV = nodecoords['x_vert'][i][j]
-                        yV = nodecoords['y_vert'][i][j]
-                        if i in lindex:
-                            plt.plot([xV_old, xV], [yV_old, yV], 'r-', linewidth=highligthlink_linewidth, zorder=0)
-                        else:
-                            if fix_colorbar and link_values is not None:
-                                plt.plot([xV_old, xV], [yV_old, yV], '-', linewidth=1, zorder=0, color=colors[i])
-                            else:
-                                plt.plot([xV_old, xV], [yV_old, yV], color='steelblue', linewidth=0.2, zorder=0)
-                        xV_old = xV
-                        yV_old = yV
-
-                    if fix_colorbar and link_values is not None:
-                        plt.plot([xV, x[1]], [yV, y[1]], '-', linewidth=1, zorder=0, color=colors[i])
-                    else:
-                        plt.plot([xV, x[1]], [yV, y[1]], color='steelblue', linewidth=0.2, zorder=0)
-                    if text_links_ID or (text_links_ID_spec and links_ID[i - 1] in links_to_show_ID):
-                        plt.text(
-                            nodecoords['x_vert'][i][int(len(nodecoords['x_vert'][i]) / 2)],
-                            nodecoords['y_vert'][i][int(len(nodecoords['x_vert'][i]) / 2)],
-                            links_ID[i], {'fontsize': 'xx-small'}
-                        )
-                    elif text_links_ind or (text_links_ind_spec and i in links_to_show_ind):
-                        plt.text(
-                            nodecoords['x_vert'][i][int(len(nodecoords['x_vert'][i]) / 2)],
-                            nodecoords['y_vert'][i][int(len(nodecoords['x_vert'][i]) / 2)],
-                            links_ind[i], {'fontsize': fontsize}
-                        )
-                    if link_text:
-                        plt.text(
-                            nodecoords['x_vert'][i][int(len(nodecoords['x_vert'][i]) / 2)],
-                            nodecoords['y_vert'][i][int(len(nodecoords['x_vert'][i]) / 2)],
-                            "{:.2f}".format(link_values[i - 1]), {'fontsize': fontsize})
+                renderer.highlight_links(self.__getLinkIndices(highlightlink), highligthlink_linewidth)
+            if linksID is not None:
+                show = renderer.link_ids if linksID is True else linksID
+                renderer.label_links([i for i, Id in enumerate(renderer.link_ids, 1) if Id in show],
+                                     fontsize=fontsize)
+            elif linksindex is not None:
+                show = range(1, len(renderer.link_ids) + 1) if linksindex is True else linksindex
+                renderer.label_links(show, labels=show, fontsize=fontsize)
+            if link_text:
+                renderer.label_values(link_values=link_values, fontsize=fontsize)
             if not line:
-                # Plot Pumps
-                x, y = [0, 0], [0, 0]
-                for i in pumpindex:
-                    fromNode = nodeconlinkIndex[i - 1][0]
-                    toNode = nodeconlinkIndex[i - 1][1]
-                    x[0] = nodecoords['x'][fromNode]
-                    y[0] = nodecoords['y'][fromNode]
-                    x[1] = nodecoords['x'][toNode]
-                    y[1] = nodecoords['y'][toNode]
-                    xx = (x[0] + x[1]) / 2
-                    yy = (y[0] + y[1]) / 2
-                    if i != pumpindex[-1]:
-                        plt.plot(xx, yy, color='fuchsia', marker='v', linestyle='None', markersize=0.8)
-                    else:
-                        plt.plot(xx, yy, color='fuchsia', marker='v', linestyle='None', markersize=0.8, label='Pumps')
-
-                # Plot Valves
-                for i in valveindex:
-                    if not nodecoords['x_vert'][i]:  # Check if not vertices
-                        fromNode = nodeconlinkIndex[i - 1][0]
-                        toNode = nodeconlinkIndex[i - 1][1]
-                        x[0] = nodecoords['x'][fromNode]
-                        y[0] = nodecoords['y'][fromNode]
-                        x[1] = nodecoords['x'][toNode]
-                        y[1] = nodecoords['y'][toNode]
-                        xx = (x[0] + x[1]) / 2
-                        yy = (y[0] + y[1]) / 2
-                    else:
-                        xVert = nodecoords['x_vert'][i]
-                        yVert = nodecoords['y_vert'][i]
-                        xx = xVert[math.floor(xVert.index(xVert[-1]) / 2)]
-                        yy = yVert[math.floor(yVert.index(yVert[-1]) / 2)]
-                    if i != valveindex[-1]:
-                        plt.plot(xx, yy, 'k*', markersize=1.5)
-                    else:
-                        plt.plot(xx, yy, 'k*', markersize=1.5, label='Valves')
-                    if text_nodes_ID or (text_nodes_ID_spec and valves_ID[valveindex.index(i)] in nodes_to_show_ID):
-                        plt.text(xx, yy, valves_ID[valveindex.index(i)], {'fontsize': fontsize})
-                    elif text_nodes_ind or (text_nodes_ind_spec and i in nodes_to_show_ind):
-                        plt.text(xx, yy, i, {'fontsize': fontsize})
-                    if node_text:
-                        plt.text(xx, yy, "{:.2f}".format(node_values[i - 1]), {'fontsize': fontsize})
+                # Plot Pumps and Valves
+                renderer.draw_link_markers()
+                valves = renderer.link_groups['valves'] + 1
+                if nodesID is not None:
+                    show = renderer.link_ids if nodesID is True else nodesID
+                    renderer.label_links([i for i in valves.tolist() if renderer.link_ids[i - 1] in show],
+                                         fontsize=fontsize)
+                elif nodesindex is not None:
+                    show = valves if nodesindex is True else np.intersect1d(valves, nodesindex)
+                    renderer.label_links(show, labels=show, fontsize=fontsize)
 
         if plot_nodes:
-            highlight_nodeIndices = [0]
+            # Plot Tanks, Reservoirs and Junctions
+            renderer.draw_node_markers()
             if highlightnode is not None:
-                highlight_nodeIndices = self.__getNodeIndices(highlightnode)
-
-            # Plot Tanks
-            for i in tankindex:
-                x = nodecoords['x'][i]
-                y = nodecoords['y'][i]
-                if i != tankindex[-1]:
-                    plt.plot(x, y, color='cyan', marker='*', linestyle='None', markersize=3.5, zorder=0)
-                else:
-                    plt.plot(x, y, color='cyan', marker='*', linestyle='None', markersize=3.5, label='Tanks', zorder=0)
-                if text_nodes_ID or (text_nodes_ID_spec and tank_ID[tankindex.index(i)] in nodes_to_show_ID):
-                    plt.text(x, y, tank_ID[tankindex.index(i)], {'fontsize': fontsize})
-                elif text_nodes_ind or (text_nodes_ind_spec and i in nodes_to_show_ind):
-                    plt.text(x, y, i, {'fontsize': fontsize})
-                if node_text:
-                    plt.text(x, y, "{:.2f}".format(node_values[i - 1]), {'fontsize': fontsize})
-                if i in highlight_nodeIndices:
-                    plt.plot(nodecoords['x'][i], nodecoords['y'][i], '.r', markersize=highligthnode_linewidth)
-
-            # Plot Reservoirs
-            for i in resindex:
-                x = nodecoords['x'][i]
-                y = nodecoords['y'][i]
-                if i != resindex[-1]:
-                    plt.plot(x, y, color='lime', marker='s', linestyle='None', markersize=1.5, zorder=0)
-                else:
-                    plt.plot(x, y, color='lime', marker='s', linestyle='None', markersize=1.5, label='Reservoirs',
-                             zorder=0)
-                if text_nodes_ID or (text_nodes_ID_spec and res_ID[resindex.index(i)] in nodes_to_show_ID):
-                    plt.text(x, y, res_ID[resindex.index(i)], {'fontsize': fontsize})
-                elif text_nodes_ind or (text_nodes_ind_spec and i in nodes_to_show_ind):
-                    plt.text(x, y, i, {'fontsize': fontsize})
-                if node_text:
-                    plt.text(x, y, "{:.2f}".format(node_values[i - 1]), {'fontsize': fontsize})
-                if i in highlight_nodeIndices:
-                    plt.plot(nodecoords['x'][i], nodecoords['y'][i], '.r', markersize=highligthnode_linewidth)
-
-            # Plot Junctions
-            for i in juncind:
-                x = nodecoords['x'][i]
-                y = nodecoords['y'][i]
-                if i != juncind[-1]:
-                    plt.plot(x, y, 'bo', markersize=0.7, zorder=0)
-                else:
-                    plt.plot(x, y, 'bo', markersize=0.7, label='Junctions', zorder=0)
-                if text_nodes_ID or (text_nodes_ID_spec and junc_ID[juncind.index(i)] in nodes_to_show_ID):
-                    plt.text(x, y, junc_ID[juncind.index(i)], {'fontsize': fontsize})
-                elif text_nodes_ind or (text_nodes_ind_spec and i in nodes_to_show_ind):
-                    plt.text(x, y, i, {'fontsize': fontsize})
-                if node_text:
-                    plt.text(x, y, "{:.2f}".format(node_values[i - 1]), {'fontsize': fontsize})
-
-                if i in highlight_nodeIndices:
-                    plt.plot(nodecoords['x'][i], nodecoords['y'][i], '.r', markersize=highligthnode_linewidth)
+                renderer.highlight_nodes(self.__getNodeIndices(highlightnode), highligthnode_linewidth)
+            if nodesID is not None:
+                show = renderer.node_ids if nodesID is True else nodesID
+                renderer.label_nodes([i for i, Id in enumerate(renderer.node_ids, 1) if Id in show],
+                                     fontsize=fontsize)
+            elif nodesindex is not None:
+                show = range(1, len(renderer.node_ids) + 1) if nodesindex is True else nodesindex
+                renderer.label_nodes(show, labels=show, fontsize=fontsize)
+            if node_text:
+                renderer.label_values(node_values=node_values, fontsize=fontsize)
 
         if node_values is not None:
             # Plot node values
-            x = list(nodecoords['x'].values())
-            y = list(nodecoords['y'].values())
-            plt.scatter(x, y, c=node_values, cmap=colorbar, s=3.5, zorder=2)
+            renderer.draw_node_values(node_values, cmap=colorbar, vmin=min_colorbar, vmax=max_colorbar)
 
-        if fix_colorbar and link_values is not None or node_values is not None:
+        if link_values is not None or node_values is not None:
             scal = cm.ScalarMappable(norm=mpl.colors.Normalize(min_colorbar, max_colorbar), cmap=colorbar)
             bar = plt.colorbar(scal, ax=plt.gca(), orientation='horizontal', shrink=0.7, pad=0.05)
             bar.ax.tick_params(labelsize=fontsize)
@@ -10513,6 +10586,66 @@ class epanet(error_handler):
 
         return figure
 
+    def plot_animation(self, link_values=None, node_values=None, link_widths=None, titles=None, interval=200,
+                       fontsize=5, fig_size=[3, 2], dpi=300, colorbar='turbo', min_colorbar=None, max_colorbar=None,
+                       colorbar_label=' ', link_text=False, node_text=False):
+        """ Animates link and/or node values over time, e.g. the flows of getComputedTimeSeries.
+
+        The network is drawn once, every frame only changes the colors (and widths) of
+        the drawn links and nodes. The colorbar shows the link values if given, else the
+        node values, and spans all the frames unless min_colorbar/max_colorbar are given.
+
+        Example:
+
+        >>> d = epanet('Net1.inp')
+        >>> res = d.getComputedTimeSeries()
+        >>> titles = [f'Flows at time {t / 3600:.0f} hrs' for t in res.Time]
+        >>> anim = d.plot_animation(link_values=res.Flow, titles=titles, colorbar_label='Flow')
+        >>> anim.save('Net1_flows.gif', writer='pillow')
+
+        See also plot, plot_close.
+        """
+        from epyt.plotting import NetworkRenderer
+
+        values = link_values if link_values is not None else node_values
+        if values is None:
+            raise ValueError('Give link_values and/or node_values to animate.')
+        if min_colorbar is None:
+            min_colorbar = np.min(values)
+        if max_colorbar is None:
+            max_colorbar = np.max(values)
+
+        plt.rcParams["figure.figsize"] = fig_size
+        plt.rcParams['figure.dpi'] = dpi
+        plt.figure()
+        plt.axis('off')
+        renderer = NetworkRenderer(self)
+        if link_values is not None:
+            renderer.draw_links(link_values[0], cmap=colorbar, vmin=min_colorbar, vmax=max_colorbar,
+                                linewidth=None if link_widths is None else link_widths[0])
+        else:
+            renderer.draw_links()
+        if node_values is not None:
+            if link_values is None:
+                renderer.draw_node_values(node_values[0], cmap=colorbar, vmin=min_colorbar, vmax=max_colorbar)
+            else:
+                renderer.draw_node_values(node_values[0], cmap=colorbar, vmin=np.min(node_values),
+                                          vmax=np.max(node_values))
+        if link_text and link_values is not None:
+            renderer.label_values(link_values=link_values[0], fontsize=fontsize)
+        if node_text and node_values is not None:
+            renderer.label_values(node_values=node_values[0], fontsize=fontsize)
+
+        scal = cm.ScalarMappable(norm=mpl.colors.Normalize(min_colorbar, max_colorbar), cmap=colorbar)
+        bar = plt.colorbar(scal, ax=plt.gca(), orientation='horizontal', shrink=0.7, pad=0.05)
+        bar.ax.tick_params(labelsize=fontsize)
+        bar.outline.set_visible(False)
+        bar.set_label(label=colorbar_label, size=fontsize)
+        if titles is not None:
+            plt.title(titles[0], fontsize=fontsize, fontweight="bold")
+
+        return renderer.animate(link_values, node_values, link_widths, titles=titles, interval=interval)
+
     def plot_save(self, name, dpi=300):
         """ Save plot
         """
@@ -10839,7 +10972,7 @@ class epanet(error_handler):
 
     def __createTempfiles(self, BinTempfile):
         inpfile = BinTempfile
-        uuID = ''.join(random.choices(string.ascii_letters + string.digits, k=10))
+        uuID = temp_id()
         rptfile = '@#' + uuID + '.txt'
         binfile = '@#' + uuID + '.bin'
         return [inpfile, rptfile, binfile]
@@ -11037,6 +11170,26 @@ class epanet(error_handler):
         self.NodeTankVolumeUnits = units.NodeTankVolumeUnits
         self.QualityWaterAgeUnits = units.QualityWaterAgeUnits
 
+    @staticmethod
+    def __getID(ids, index, getid):
+        # Cached ID of a valid index, the toolkit reports the error of any other value
+        if isinstance(index, (int, np.integer)) and 0 < index <= len(ids):
+            return ids[index - 1]
+        return getid(index)
+
+    def __getIndices(self, kind, elements):
+        # Node or link indices of an index/ID or of an array of them
+        elements = np.asarray(elements).ravel()
+        if elements.dtype.kind in 'iuf':
+            return elements.astype(np.int64)
+        network_index = self.getNetworkIndex()
+        index_map = network_index.node_index if kind == 'node' else network_index.link_index
+        try:
+            return np.fromiter((index_map[e] if isinstance(e, str) else int(e) for e in elements.tolist()),
+                               dtype=np.int64, count=elements.size)
+        except KeyError as e:
+            raise ValueError(f'Unknown {kind} ID {e}.') from None
+
     def __getLinkIndices(self, *argv):
         if len(argv) > 0:
             if isinstance(argv[0], list):
@@ -11053,18 +11206,13 @@ class epanet(error_handler):
             return self.getLinkIndex()
 
     def __getLinkInfo(self, code_p, *argv):
-        values = []
         if len(argv) > 0:
             index = argv[0]
             if isinstance(index, (list, np.ndarray)):
-                for i in index:
-                    values.append(self.api.ENgetlinkvalue(i, code_p))
+                return self.api.ENgetlinkvalues(code_p, index)
             else:
-                values = self.api.ENgetlinkvalue(index, code_p)
-        else:
-            for i in range(self.getLinkCount()):
-                values.append(self.api.ENgetlinkvalue(i + 1, code_p))
-        return np.array(values)
+                return np.array(self.api.ENgetlinkvalue(index, code_p))
+        return self.api.ENgetlinkvalues(code_p)
 
     def __getNodeIndices(self, *argv):
         if len(argv) > 0:
@@ -11082,18 +11230,13 @@ class epanet(error_handler):
             return self.getNodeIndex()
 
     def __getNodeInfo(self, code_p, *argv):
-        value = []
         if len(argv) > 0:
             index = argv[0]
             if isinstance(index, (list, np.ndarray)):
-                for i in index:
-                    value.append(self.api.ENgetnodevalue(i, code_p))
+                return self.api.ENgetnodevalues(code_p, index)
             else:
                 return self.api.ENgetnodevalue(index, code_p)
-        else:
-            for i in range(self.getNodeCount()):
-                value.append(self.api.ENgetnodevalue(i + 1, code_p))
-        return np.array(value)
+        return self.api.ENgetnodevalues(code_p)
 
     def __getNodeJunctionIndices(self, *argv):
         if len(argv) == 0:
@@ -11115,14 +11258,12 @@ class epanet(error_handler):
 
     def __getPumpLinkInfo(self, code_p, *argv):
         indices = self.getLinkPumpIndex()
-        values = []
         if len(argv) > 0:
             index = argv[0]
             if isinstance(index, (list, np.ndarray)):
                 if not sum(self.__isMember(index, indices)):
                     index = self.getLinkPumpIndex(index)
-                for i in index:
-                    values.append(self.api.ENgetlinkvalue(i, code_p))
+                return self.api.ENgetlinkvalues(code_p, index)
             else:
                 if index not in indices:
                     pIndex = self.getLinkPumpIndex(index)
@@ -11131,21 +11272,16 @@ class epanet(error_handler):
                 else:
                     pIndex = index
                 return self.api.ENgetlinkvalue(pIndex, code_p)
-        else:
-            for i in indices:
-                values.append(self.api.ENgetlinkvalue(i, code_p))
-        return np.array(values)
+        return self.api.ENgetlinkvalues(code_p, indices)
 
     def __getTankNodeInfo(self, code_p, *argv):
         indices = self.getNodeTankIndex()
-        values = []
         if len(argv) > 0:
             index = argv[0]
             if isinstance(index, (list, np.ndarray)):
                 if not sum(self.__isMember(index, indices)):
                     index = self.getNodeTankIndex(index)
-                for i in index:
-                    values.append(self.api.ENgetnodevalue(i, code_p))
+                return self.api.ENgetnodevalues(code_p, index)
             else:
                 if index not in indices:
                     pIndex = self.getNodeTankIndex(index)
@@ -11153,161 +11289,48 @@ class epanet(error_handler):
                         return []
                 else:
                     pIndex = index
-                values = self.api.ENgetnodevalue(pIndex, code_p)
-        else:
-            for i in indices:
-                values.append(self.api.ENgetnodevalue(i, code_p))
-        return np.array(values)
+                return np.array(self.api.ENgetnodevalue(pIndex, code_p))
+        return self.api.ENgetnodevalues(code_p, indices)
+
+    @staticmethod
+    def __getType(types, index, gettype):
+        if isinstance(index, (int, np.integer)) and 0 < index <= len(types):
+            return int(types[index - 1])
+        return gettype(index)
 
     def __isMember(self, A, B):
         return [np.sum(a == B) for a in np.array(A)]
 
-    def __readEpanetBin(self, f, binfile, *argv):
-        value = EpytValues()
-        if f.readable():
-            data = np.fromfile(binfile, dtype=np.uint32)
-            value.NumberReportingPeriods = data[-3]
-            # Beginning of file
-            value.magicnumber = data[0]
-            value.LibEPANET = data[1]
-            value.NumberNodes = data[2]
-            value.NumberReservoirsTanks = data[3]
-            value.NumberLinks = data[4]
-            value.NumberPumps = data[5]
-            value.NumberValves = data[6]
-            value.WaterQualityOption = data[7]
-            value.IndexNodeSourceTracing = data[8]
-            value.FlowUnitsOption = data[9]
-            value.PressureUnitsOption = data[10]
-            value.TimeStatisticsFlag = data[11]
-            value.ReportingStartTimeSec = data[12]
-            value.ReportingTimeStepSec = data[13]
-            value.SimulationDurationSec = data[14]
-            f.seek(50)
-            try:
-                value.ProblemTitle1 = f.read(80).split(b'\x01')[1].replace(b'\x00', b'').decode()
-            except:
-                pass
-            try:
-                value.ProblemTitle2 = f.read(80).replace(b'\x00', b'').decode()
-            except:
-                pass
-            try:
-                value.ProblemTitle3 = f.read(80).replace(b'\x00', b'').decode()
-            except:
-                pass
-            value.NameInputFile = f.read(260).replace(b'\x00', b'').decode()
-            value.NameReportFile = f.read(260).replace(b'\x00', b'').decode()
-            value.NameChemical = f.read(20).replace(b'\x00', b'').decode()
-            value.ChemicalConcentrationUnits = f.read(32).replace(b'\x00', b'').decode()
-            f.read(4)
-            value.IDLabelEachNode = []
-            for i in range(value.NumberNodes):
-                value.IDLabelEachNode.append(f.read(32).replace(b'\x00', b'').decode())
-            value.IDLabelEachLink = []
-            for i in range(value.NumberLinks):
-                value.IDLabelEachLink.append(f.read(32).replace(b'\x00', b'').decode())
-            while True:
-                binval = list(f.read(1))[0]
-                if binval != 0:
-                    break
-            # IndexStartNodeEachLink
-            value.IndexStartNodeEachLink = []
-            for i in range(value.NumberLinks):
-                value.IndexStartNodeEachLink.append(binval)
-                f.read(3)
-                binval = list(f.read(1))[0]
-            # IndexEndNodeEachLink
-            value.IndexEndNodeEachLink = []
-            for i in range(value.NumberLinks):
-                value.IndexEndNodeEachLink.append(binval)
-                f.read(3)
-                binval = list(f.read(1))[0]
-            # TypeCodeEachLink
-            value.TypeCodeEachLink = []
-            for i in range(value.NumberLinks):
-                value.TypeCodeEachLink.append(binval)
-                f.read(3)
-                binval = list(f.read(1))[0]
-            # NodeIndexEachReservoirsTank
-            value.NodeIndexEachReservoirsTank = []
-            for i in range(value.NumberReservoirsTanks):
-                value.NodeIndexEachReservoirsTank.append(binval)
-                if i == value.NumberReservoirsTanks - 1:
-                    break
-                f.read(3)
-                binval = list(f.read(1))[0]
-            f.read(3)
-            value.CrossSectionalAreaEachTank = struct.unpack('f' * value.NumberReservoirsTanks,
-                                                             f.read(4 * value.NumberReservoirsTanks))
-            value.ElevationEachNode = struct.unpack('f' * value.NumberNodes, f.read(4 * value.NumberNodes))
-            value.LengthEachLink = struct.unpack('f' * value.NumberLinks, f.read(4 * value.NumberLinks))
-            value.DiameterEachLink = struct.unpack('f' * value.NumberLinks, f.read(4 * value.NumberLinks))
-
-            value.PumpIndexListLinks = []
-            value.PumpUtilization = []
-            value.AverageEfficiency = []
-            value.AverageKwattsOrMillionGallons = []
-            value.AverageKwatts = []
-            value.PeakKwatts = []
-            value.AverageCostPerDay = []
-            for p in range(value.NumberPumps):
-                value.PumpIndexListLinks.append(struct.unpack('f', f.read(4))[0])
-                value.PumpUtilization.append(struct.unpack('f', f.read(4))[0])
-                value.AverageEfficiency.append(struct.unpack('f', f.read(4))[0])
-                value.AverageKwattsOrMillionGallons.append(struct.unpack('f', f.read(4))[0])
-                value.AverageKwatts.append(struct.unpack('f', f.read(4))[0])
-                value.PeakKwatts.append(struct.unpack('f', f.read(4))[0])
-                value.AverageCostPerDay.append(struct.unpack('f', f.read(4))[0])
-            struct.unpack('f', f.read(4))
-            value.NodeDemand, value.NodeHead, value.NodePressure, value.NodeQuality, value.LinkFlow = {}, {}, {}, {}, {}
-            value.LinkVelocity, value.LinkHeadloss, value.LinkQuality, value.LinkStatus = {}, {}, {}, {}
-            value.LinkSetting, value.LinkReactionRate, value.LinkFrictionFactor = {}, {}, {}
-
-            for i in range(1, value.NumberReportingPeriods + 1):
-                value.NodeDemand[i] = struct.unpack('f' * value.NumberNodes, f.read(4 * value.NumberNodes))
-                value.NodeHead[i] = struct.unpack('f' * value.NumberNodes, f.read(4 * value.NumberNodes))
-                value.NodePressure[i] = struct.unpack('f' * value.NumberNodes, f.read(4 * value.NumberNodes))
-                value.NodeQuality[i] = struct.unpack('f' * value.NumberNodes, f.read(4 * value.NumberNodes))
-                value.LinkFlow[i] = struct.unpack('f' * value.NumberLinks, f.read(4 * value.NumberLinks))
-                value.LinkVelocity[i] = struct.unpack('f' * value.NumberLinks, f.read(4 * value.NumberLinks))
-                value.LinkHeadloss[i] = struct.unpack('f' * value.NumberLinks, f.read(4 * value.NumberLinks))
-                value.LinkQuality[i] = struct.unpack('f' * value.NumberLinks, f.read(4 * value.NumberLinks))
-                value.LinkStatus[i] = struct.unpack('f' * value.NumberLinks, f.read(4 * value.NumberLinks))
-                value.LinkSetting[i] = struct.unpack('f' * value.NumberLinks, f.read(4 * value.NumberLinks))
-                value.LinkReactionRate[i] = struct.unpack('f' * value.NumberLinks,
-                                                          f.read(4 * value.NumberLinks))
-                value.LinkFrictionFactor[i] = struct.unpack('f' * value.NumberLinks,
-                                                            f.read(4 * value.NumberLinks))
-
-            value.AverageBulkReactionRate = struct.unpack('f', f.read(4))
-            value.AverageWallReactionRate = struct.unpack('f', f.read(4))
-            value.AverageTankReactionRate = struct.unpack('f', f.read(4))
-            value.AverageSourceInflowRate = struct.unpack('f', f.read(4))
-            value.NumberReportingPeriods2 = list(f.read(1))[0]
-            f.read(1)
-            f.read(1)
-            f.read(1)
-            value.WarningFlag = list(f.read(1))[0]
-            self.errcode = value.WarningFlag
-            # check here - error
-            value.MagicNumber = struct.unpack('b', f.read(1))
+    def __lazyEpanetBin(self, binfile, cache_size, delete_file):
+        value = EpytLazyValues(binfile, self.TYPEBINSTATUS, cache_size=cache_size, delete_file=delete_file)
+        self.errcode = value.WarningFlag
+        value.WarnFlag = False
+        if self.errcode:
+            value.WarnFlag = True
+            value.ErrCode = self.errcode
+        for file in Path(".").glob("@#*.txt"):
+            file.unlink()
+        return value
 
+    def __readEpanetBin(self, f, binfile, *argv):
+        f.close()
+        out = EpanetBinFile(binfile)
+        self.errcode = out.WarningFlag
         if len(argv) > 0:
-            v = EpytValues()
-            v.Time = [int(i * value.ReportingTimeStepSec) for i in
-                      range(int(value.SimulationDurationSec / value.ReportingTimeStepSec) + 1)]
-            fields_param = ['NodePressure', 'NodeDemand', 'NodeHead', 'NodeQuality',
-                            'LinkFlow', 'LinkVelocity', 'LinkHeadloss', 'LinkStatus', 'LinkSetting',
-                            'LinkReactionRate', 'LinkFrictionFactor', 'LinkQuality']
-            fields_new = ['Pressure', 'Demand', 'Head', 'NodeQuality',
-                          'Flow', 'Velocity', 'HeadLoss', 'Status', 'Setting',
-                          'ReactionRate', 'FrictionFactor', 'LinkQuality']
-            for i in range(len(fields_param)):
-                exec("v." + fields_new[i] + " = value." + fields_param[i])
-            value = v
+            value = EpytValues()
+            value.Time = out.Time
+            for field, name in COMPUTED_FIELDS.items():
+                setattr(value, name, np.array(out.results[field], dtype=np.float64))
+        else:
+            value = EpytValues()
+            for info in (out.getPrologInfo(), out.getEnergyInfo(), out.getEpilogInfo()):
+                for key, val in info.items():
+                    setattr(value, key, np.array(val) if isinstance(val, np.ndarray) else val)
+            for field in NODE_FIELDS + LINK_FIELDS:
+                setattr(value, field, np.array(out.results[field], dtype=np.float64))
         # Close bin file and remove it
-        f.close()
+        out.close()
+        del out
         try:
             os.remove(binfile)
         except:
@@ -11332,88 +11355,29 @@ class epanet(error_handler):
         self.api.ENsetcontrol(controlRuleIndex, controlTypeIndex, linkIndex, controlSettingValue, nodeIndex,
                               controlLevel)
 
-    def __setEval(self, func, code_pstr, Type, value, *argv):
-        if len(argv) == 1:
-            index = value
-            value = argv[0]
-            if isinstance(index, list):
-                j = 0
-                for i in index:
-                    if np.isnan(value[j]):
-                        continue
-                    strFunc = 'self.api.' + func + '(' + str(
-                        i) + ',' + 'self.ToolkitConstants.EN_' + code_pstr + ',' + str(value[j]) + ')'
-                    eval(strFunc)
-                    j += 1
-            else:
-                strFunc = 'self.api.' + func + '(' + str(
-                    index) + ',' + 'self.ToolkitConstants.EN_' + code_pstr + ',' + str(value) + ')'
-                eval(strFunc)
-        else:
-            count = 0
-            if Type == 'LINK':
-                count = self.getLinkCount()
-            elif Type == 'NODE':
-                count = self.getNodeCount()
-            for i in range(count):
-                if np.isnan(value[i]):
-                    continue
-                strFunc = 'self.api.' + func + '(' + str(
-                    i + 1) + ',' + 'self.ToolkitConstants.EN_' + code_pstr + ',' + str(value[i]) + ')'
-                eval(strFunc)
+    def __setEval(self, code_pstr, Type, value, *argv):
+        code = getattr(self.ToolkitConstants, 'EN_' + code_pstr)
+        setvalues = self.setLinkValues if Type == 'LINK' else self.setNodeValues
+        setvalues(code, value, *argv)
 
-    def __setEvalLinkNode(self, func, code_pstr, Type, value, *argv):
+    def __setEvalLinkNode(self, code_pstr, Type, value, *argv):
+        code = getattr(self.ToolkitConstants, 'EN_' + code_pstr)
+        if Type == 'TANK':
+            setvalues, indices = self.setNodeValues, self.getNodeTankIndex()
+        else:
+            setvalues, indices = self.setLinkValues, self.getLinkPumpIndex()
         if len(argv) == 1:
             index = value
             value = argv[0]
-            if isinstance(index, (list, np.ndarray)):
-                j = 0
-                if isinstance(value, list):
-                    for i in index:
-                        strFunc = 'self.api.' + func + '(' + str(
-                            i) + ',' + 'self.ToolkitConstants.EN_' + code_pstr + ',' + str(value[j]) + ')'
-                        eval(strFunc)
-                        j += 1
-                else:
-                    for i in index:
-                        strFunc = 'self.api.' + func + '(' + str(
-                            i) + ',' + 'self.ToolkitConstants.EN_' + code_pstr + ',' + str(value) + ')'
-                        eval(strFunc)
-                        j += 1
-            else:
-                Index = []
-                if Type == 'TANK':
-                    Index = self.getNodeTankIndex()
-                elif Type == 'PUMP':
-                    Index = self.getLinkPumpIndex()
-                if index not in Index:
-                    Index = Index[index - 1]
-                else:
-                    Index = index
-                    if isinstance(value, (list, np.ndarray)):
-                        value = value[0]
-                strFunc = 'self.api.' + func + '(' + str(
-                    Index) + ',' + 'self.ToolkitConstants.EN_' + code_pstr + ',' + str(value) + ')'
-                eval(strFunc)
+            if not isinstance(index, (list, np.ndarray, str)):
+                if index not in indices:
+                    # The position of the tank or pump, starting from 1
+                    index = indices[index - 1]
+                elif isinstance(value, (list, np.ndarray)):
+                    value = value[0]
+            setvalues(code, index, value)
         else:
-            count = 0
-            indices = []
-            if Type == 'TANK':
-                count = self.getNodeTankCount()
-                indices = self.getNodeTankIndex()
-            elif Type == 'PUMP':
-                count = self.getLinkPumpCount()
-                indices = self.getLinkPumpIndex()
-            if isinstance(value, (list, np.ndarray)):
-                for i in range(count):
-                    strFunc = 'self.api.' + func + '(' + str(
-                        indices[i]) + ',' + 'self.ToolkitConstants.EN_' + code_pstr + ',' + str(value[i]) + ')'
-                    eval(strFunc)
-            else:
-                for i in range(count):
-                    strFunc = 'self.api.' + func + '(' + str(
-                        indices[i]) + ',' + 'self.ToolkitConstants.EN_' + code_pstr + ',' + str(value) + ')'
-                    eval(strFunc)
+            setvalues(code, indices, value)
 
     def __setFlowUnits(self, unitcode, *argv):
         self.api.ENsetflowunits(unitcode)
@@ -11432,27 +11396,49 @@ class epanet(error_handler):
         elif len(argv) == 1:
             indices = value
             param = argv[0]
+        if not isList(indices):
+            indices = [indices]
+        indices = self.__getIndices('node', indices)
+        resInd = set(self.getNodeReservoirIndex())
+        setdemand = getattr(self.api, fun)
 
         for c in range(categ):
             if len(argv) == 0 and type(value) is dict:
                 param = value[c]
-            j = 0
-            resInd = self.getNodeReservoirIndex()
-            if not isList(indices):
-                indices = [indices]
             if not isList(param):
                 param = [param]
-            for i in indices:
+            param = np.asarray(param, dtype=np.float64).ravel()
+            if param.size == 1:
+                param = np.broadcast_to(param, indices.shape)
+            for i, p in zip(indices.tolist(), param.tolist()):
                 if i in resInd:
-                    self.api.ENsetnodevalue(i, propertyCode, param[j])
+                    self.api.ENsetnodevalue(i, propertyCode, p)
                 elif categ == 1 or len(indices) == 1:
-                    eval('self.api.' + fun + '(i, categ, param[j])')
+                    setdemand(i, categ, p)
                 else:
                     if c + 1 > self.getNodeDemandCategoriesNumber(i):
-                        self.addNodeJunctionDemand(i, param[j])
+                        self.addNodeJunctionDemand(i, p)
                     else:
-                        eval('self.api.' + fun + '(i, c, param[j])')
-                j += 1
+                        setdemand(i, c, p)
+
+    def __setValues(self, kind, paramcode, value, *argv):
+        if len(argv) == 1:
+            indices = self.__getIndices(kind, value)
+            value = argv[0]
+        else:
+            indices = np.arange(1, (self.getNodeCount() if kind == 'node' else self.getLinkCount()) + 1)
+        values = np.asarray(value, dtype=np.float64).ravel()
+        if values.size == 1:
+            values = np.broadcast_to(values, indices.shape)
+        if values.size != indices.size:
+            raise ValueError(f'Got {values.size} values for {indices.size} {kind}s.')
+        keep = ~np.isnan(values)
+        if not keep.all():
+            indices, values = indices[keep], values[keep]
+        if kind == 'node':
+            self.api.ENsetnodevalues(paramcode, indices, values)
+        else:
+            self.api.ENsetlinkvalues(paramcode, indices, values)
 
     """MSX Functions"""
 
@@ -11468,21 +11454,13 @@ class epanet(error_handler):
         d.loadMSXFile(msxname, customMSXlib=msxlib)"""
 
         if not os.path.exists(msxname):
-            for root, dirs, files in os.walk(epyt_root):
-                for name in files:
-                    if name.lower().endswith(".msx"):
-                        if name == msxname:
-                            msxname = os.path.join(root, msxname)
-                            break
-                else:
-                    continue
-                break
+            msxname = _findNetworkFile(msxname)
 
         self.MSXFile = msxname[:-4]
         self.MSXTempFile = msxname[:-4] + '_temp.msx'
         copyfile(msxname, self.MSXTempFile)
         self.msx = epanetmsxapi(self.MSXTempFile, customMSXlib=customMSXlib, display_msg=self.display_msg,
-                                msxrealfile=self.MSXFile)
+                                msxrealfile=self.MSXFile, raise_errors=self.raise_errors)
 
         # Message to user if he uses ph with msx
         if self.api._ph is not None:
@@ -13478,74 +13456,113 @@ class epanet(error_handler):
 
                 See also getMSXComputedQualityNode, getMSXComputedQualityLink.
             """
-        if not isinstance(species, list):
-            species = [species]
         if self.getMSXSpeciesCount() == 0:
             return -1
+        cube = self.getMSXComputedQualityCube(species, nodes=nodes is not None, links=links is not None)
+
+        value = EpytValues()
+        # One (time steps, species) array per node/link, as views of the cube
+        value.NodeQuality = list(cube.NodeQuality.swapaxes(0, 1)) if nodes is not None else 0
+        value.LinkQuality = list(cube.LinkQuality.swapaxes(0, 1)) if links is not None else 0
+        value.Time = [int(i * cube.TimeStep) for i in range(len(cube.Time))]
+        return value
+
+    def getMSXComputedQualityCube(self, species=None, nodes=True, links=True, callback=None, store=None):
+        """ Returns the node/link quality of the species as (time, element, species) arrays.
+
+        The initial quality is read once and every quality step fills one row of the
+        arrays. Each step can also be streamed to a callback, and with store the arrays
+        are written to .npy files on disk instead of being kept in memory.
+
+        :param species: species IDs, defaults to all species
+        :type species: str or list of str, optional
+        :param nodes: compute the node quality
+        :type nodes: bool
+        :param links: compute the link quality
+        :type links: bool
+        :param callback: called after every step as callback(k, t, node_quality, link_quality),
+                         with (element, species) views of row k (None if not computed)
+        :type callback: callable, optional
+        :param store: path prefix of the files <store>_NodeQuality.npy, <store>_LinkQuality.npy
+                      and <store>_Time.npy, the arrays returned are memory maps of them
+        :type store: str, optional
+        :return: NodeQuality, LinkQuality, Time, SpeciesIndex and TimeStep
+        :rtype: EpytValues
+
+        Example:
+               d = epanet('net2-cl2.inp')
+               d.loadMSXFile('net2-cl2.msx')
+               MSX_comp = d.getMSXComputedQualityCube('CL2')
+               MSX_comp.NodeQuality[:, 0, 0]   CL2 of the first node over time
+
+        See also getMSXComputedQualitySpecie, getMSXComputedQualityNode.
+        """
         if species is None:
-            species_index_name = self.getMSXSpeciesIndex()
+            species_index = self.getMSXSpeciesIndex()
         else:
-            species_index_name = self.getMSXSpeciesIndex(species)
-
-        node_count = self.getNodeCount()
-        link_count = self.getLinkCount()
-        specie_count = len(species_index_name)
-        node_indices = list(range(1, node_count + 1))
-        link_indices = list(range(1, link_count + 1))
-        # Initialized quality and time
+            if not isinstance(species, list):
+                species = [species]
+            species_index = self.getMSXSpeciesIndex(species)
+        msx = self.msx
         msx_time_step = self.getMSXTimeStep()
-        time_steps = int(self.getTimeSimulationDuration() / msx_time_step) + 1
-        quality = 0
-        lquality = 0
-        if nodes is not None:
-            quality = [np.zeros((time_steps, specie_count)) for _ in range(node_count)]
-        if links is not None:
-            lquality = [np.zeros((time_steps, specie_count)) for _ in range(link_count)]
-
-        data = {
-            'NodeQuality': quality,
-            'LinkQuality': lquality,
-        }
-        time_smle = self.getTimeSimulationDuration()
+        simulation_duration = self.getTimeSimulationDuration()
+        time_steps = int(simulation_duration / msx_time_step) + 1
+
+        def allocate(name, shape):
+            if store is None:
+                return np.zeros(shape)
+            return np.lib.format.open_memmap(f'{store}_{name}.npy', mode='w+', dtype=np.float64, shape=shape)
+
+        fields = []
+        node_quality = link_quality = None
+        if nodes:
+            node_indices = list(range(1, self.getNodeCount() + 1))
+            node_quality = allocate('NodeQuality', (time_steps, len(node_indices), len(species_index)))
+            fields.append((0, node_indices, node_quality))
+        if links:
+            link_indices = list(range(1, self.getLinkCount() + 1))
+            link_quality = allocate('LinkQuality', (time_steps, len(link_indices), len(species_index)))
+            fields.append((1, link_indices, link_quality))
+        time = allocate('Time', (time_steps,))
+
+        def step(k, t):
+            if callback is not None:
+                callback(k, t, None if node_quality is None else node_quality[k],
+                         None if link_quality is None else link_quality[k])
 
         # Obtain a hydraulic solution
         self.solveMSXCompleteHydraulics()
-
         # Run a step-wise water quality analysis without saving results to file
         self.initializeMSXQualityAnalysis(0)
 
-        # Retrieve species concentration at node
-        k = 0
-        for j_idx, j in enumerate(species_index_name, start=1):
-            if nodes is not None:
-                for i, nl in enumerate(node_indices, start=1):
-                    data['NodeQuality'][i - 1][k, j_idx - 1] = self.getMSXNodeInitqualValue()[i - 1][j - 1]
-            if links is not None:
-                for i, nl in enumerate(link_indices, start=1):
-                    data['LinkQuality'][i - 1][k, j_idx - 1] = self.getMSXLinkInitqualValue()[i - 1][j - 1]
+        for obj_type, indices, quality in fields:
+            for s, j in enumerate(species_index):
+                msx.MSXgetinitqualvalues(obj_type, j, indices, out=quality[0, :, s])
+        step(0, 0)
 
         k = 1
         t = 0
         tleft = 1
-        # Initialized data time with 0
-        while tleft > 0 and time_smle != t:
-            t, tleft = self.stepMSXQualityAnalysisTimeLeft()
+        while tleft > 0 and simulation_duration != t and k < time_steps:
+            t, tleft = msx.MSXstep()
             if t >= msx_time_step:
-                for g, j in enumerate(species_index_name, start=1):
-                    if nodes is not None:
-                        for i, nl in enumerate(node_indices, start=1):
-                            data['NodeQuality'][i - 1][k, g - 1] = self.getMSXSpeciesConcentration(0, nl, j)
-                    if links is not None:
-                        for i, nl in enumerate(link_indices, start=1):
-                            data['LinkQuality'][i - 1][k, g - 1] = self.getMSXSpeciesConcentration(1, nl, j)
+                time[k] = t
+                for obj_type, indices, quality in fields:
+                    for s, j in enumerate(species_index):
+                        msx.MSXgetqualvalues(obj_type, j, indices, out=quality[k, :, s])
+                step(k, t)
             k += 1
 
+        if store is not None:
+            for array in (node_quality, link_quality, time):
+                if array is not None:
+                    array.flush()
         value = EpytValues()
-        value.NodeQuality, value.LinkQuality = {}, {}
-        value.NodeQuality = data['NodeQuality']
-        value.LinkQuality = data['LinkQuality']
-        value.Time = [int(i * msx_time_step) for i in
-                      range(int(self.getTimeSimulationDuration() / msx_time_step) + 1)]
+        value.NodeQuality = node_quality
+        value.LinkQuality = link_quality
+        value.Time = time
+        value.SpeciesIndex = species_index
+        value.TimeStep = msx_time_step
         return value
 
     def getMSXComputedNodeQualitySpecie(self, node_indices, species_id):
@@ -14301,6 +14318,8 @@ class epanetapi:
     """
 
     EN_MAXID = 32  # toolkit constant
+    # Raise an exception for error codes above 100 instead of only storing them
+    raise_errors = False
 
     def __init__(self, version=2.2, ph=False, loadlib=True, customlib=None):
         """Load the EPANET library.
@@ -14314,6 +14333,9 @@ class epanetapi:
         self.rptfile = None
         self.binfile = None
         self._ph = None
+        self._bulkfunctions = {}
+        # Incremented by every call that can change the nodes and links of the network
+        self._network_version = 0
 
         # Check platform and Load epanet library
         # libname = f"epanet{str(version).replace('.', '_')}"
@@ -14342,6 +14364,98 @@ class epanetapi:
         if float(version) >= 2.2 and ph:
             self._ph = c_uint64()
 
+    def _getbulkfunction(self, name):
+        """ Returns the library's bulk getter (e.g. EN_getnodevalues) or None if it is not exported. """
+        if name not in self._bulkfunctions:
+            if self._ph is not None:
+                name_lib = f"EN_get{name}values"
+            else:
+                name_lib = f"ENget{name}values"
+            self._bulkfunctions[name] = getattr(self._lib, name_lib, None)
+        return self._bulkfunctions[name]
+
+    def _getvalues(self, name, paramcode, indices=None, out=None):
+        """ Fills a float64 array with a node or link property, one library call per
+        property when the bulk entry point exists. """
+        count = self.ENgetcount(0 if name == 'node' else 2)
+        if indices is not None:
+            indices = np.asarray(indices, dtype=np.intc).ravel()
+            n = indices.size
+        else:
+            n = count
+        if out is None:
+            out = np.empty(n, dtype=np.float64)
+
+        bulk = self._getbulkfunction(name)
+        if bulk is not None:
+            values = out if indices is None else np.empty(count, dtype=np.float64)
+            if self._ph is not None:
+                self.errcode = bulk(self._ph, paramcode, values.ctypes.data_as(POINTER(c_double)))
+            else:
+                fvalues = np.empty(count, dtype=np.float32)
+                self.errcode = bulk(paramcode, fvalues.ctypes.data_as(POINTER(c_float)))
+                values[:] = fvalues
+            if indices is not None:
+                np.take(values, indices - 1, out=out)
+            self.ENgeterror()
+            return out
+
+        # Fallback: bind the function and value buffer once and skip the
+        # per-element error lookup.
+        if self._ph is not None:
+            fValue = c_double()
+            getvalue = getattr(self._lib, f"EN_get{name}value")
+        else:
+            fValue = c_float()
+            getvalue = getattr(self._lib, f"ENget{name}value")
+        ref = byref(fValue)
+        ph = self._ph
+        errcode = 0
+        elements = range(1, count + 1) if indices is None else indices.tolist()
+        for k, i in enumerate(elements):
+            if ph is not None:
+                err = getvalue(ph, i, paramcode, ref)
+            else:
+                err = getvalue(i, paramcode, ref)
+            if err:
+                out[k] = np.nan
+                if not (err == 240 and name == 'node'):
+                    errcode = err
+            else:
+                out[k] = fValue.value
+        self.errcode = errcode
+        self.ENgeterror()
+        return out
+
+    def _setvalues(self, name, paramcode, indices, values):
+        """ Sets a node or link property for many elements, the library setter is
+        bound once and the error is checked once at the end. """
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if values.size == 1:
+            values = np.broadcast_to(values, indices.shape)
+        if values.size != indices.size:
+            raise ValueError(f'Got {values.size} values for {indices.size} {name}s.')
+
+        code = c_int(paramcode)
+        ph = self._ph
+        if ph is not None:
+            setvalue = getattr(self._lib, f"EN_set{name}value")
+            cvalue = c_double
+        else:
+            setvalue = getattr(self._lib, f"ENset{name}value")
+            cvalue = c_float
+        errcode = 0
+        for i, value in zip(indices.tolist(), values.tolist()):
+            if ph is not None:
+                err = setvalue(ph, i, code, cvalue(value))
+            else:
+                err = setvalue(i, code, cvalue(value))
+            if err and not errcode:
+                errcode = err
+        self.errcode = errcode
+        self.ENgeterror()
+
     def ENepanet(self, inpfile="", rptfile="", binfile=""):
         """ Runs a complete EPANET simulation
         Parameters:
@@ -14448,6 +14562,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENaddlink(linkid.encode('utf-8'), linktype,
                                                fromnode.encode('utf-8'), tonode.encode('utf-8'), byref(index))
+        self._network_version += 1
         self.ENgeterror()
         return index.value
 
@@ -14471,6 +14586,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENaddnode(nodeid.encode("utf-8"), nodetype, byref(index))
 
+        self._network_version += 1
         self.ENgeterror()
         return index.value
 
@@ -14540,6 +14656,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENclose()
 
+        self._network_version += 1
         self.ENgeterror()
 
     def ENcloseH(self):
@@ -14605,6 +14722,7 @@ class epanetapi:
         if self._ph is not None:
             self.errcode = self._lib.EN_createproject(byref(self._ph))
 
+        self._network_version += 1
         self.ENgeterror()
         return
 
@@ -14679,6 +14797,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENdeletelink(int(indexLink), condition)
 
+        self._network_version += 1
         self.ENgeterror()
 
     def ENdeletenode(self, indexNode, condition):
@@ -14699,6 +14818,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENdeletenode(int(indexNode), condition)
 
+        self._network_version += 1
         self.ENgeterror()
 
     def ENdeletepattern(self, indexPat):
@@ -14732,6 +14852,7 @@ class epanetapi:
         if self._ph is not None:
             self.errcode = self._lib.EN_deleteproject(self._ph)
 
+        self._network_version += 1
         self.ENgeterror()
         return
 
@@ -15208,6 +15329,8 @@ class epanetapi:
                 self.errcode = errcode
             errmssg = create_string_buffer(150)
             self._lib.ENgeterror(self.errcode, byref(errmssg), 150)
+            if self.raise_errors and self.errcode > 100:
+                raise Exception(f'EPANET Error {self.errcode}: {errmssg.value.decode()}')
             return errmssg.value.decode()
 
     def ENgetflowunits(self):
@@ -15366,6 +15489,26 @@ class epanetapi:
         self.ENgeterror()
         return fValue.value
 
+    def ENgetlinkvalues(self, paramcode, indices=None, out=None):
+        """ Retrieves a property value for all links, or for a subset of links, into a float64 array.
+
+        ENgetlinkvalues(paramcode, indices=None, out=None)
+
+        Uses the library's EN_getlinkvalues entry point when available and falls back
+        to a loop over EN_getlinkvalue that reuses a single value buffer.
+
+        Parameters:
+        paramcode   the property to retrieve (see EN_LinkProperty).
+        indices     link indices (starting from 1), defaults to all links.
+        out         preallocated float64 array to fill, optional.
+
+        Returns:
+        values   float64 numpy array with the current values of the property.
+
+        OWA-EPANET Toolkit: http://wateranalytics.org/EPANET/group___links.html
+        """
+        return self._getvalues('link', paramcode, indices, out)
+
     def ENgetnodeid(self, index):
         """ Gets the ID name of a node given its index
 
@@ -15457,6 +15600,27 @@ class epanetapi:
             self.ENgeterror()
             return fValue.value
 
+    def ENgetnodevalues(self, code_p, indices=None, out=None):
+        """ Retrieves a property value for all nodes, or for a subset of nodes, into a float64 array.
+
+        ENgetnodevalues(paramcode, indices=None, out=None)
+
+        Uses the library's EN_getnodevalues entry point when available and falls back
+        to a loop over EN_getnodevalue that reuses a single value buffer. Nodes for
+        which the property does not apply (error 240) are returned as NaN.
+
+        Parameters:
+        paramcode  the property to retrieve (see EN_NodeProperty, self.getToolkitConstants).
+        indices    node indices (starting from 1), defaults to all nodes.
+        out        preallocated float64 array to fill, optional.
+
+        Returns:
+        values  float64 numpy array with the current values of the property.
+
+        OWA-EPANET Toolkit: http://wateranalytics.org/EPANET/group___nodes.html
+        """
+        return self._getvalues('node', code_p, indices, out)
+
     def ENgetnumdemands(self, index):
         """ Retrieves the number of demand categories for a junction node.
         EPANET 20100
@@ -15953,6 +16117,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENinit("", "", unitsType, headLossType)
 
+        self._network_version += 1
         self.ENgeterror()
 
     def ENinitH(self, flag):
@@ -16071,6 +16236,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENopen(self.inpfile, self.rptfile, self.binfile)
 
+        self._network_version += 1
         self.ENgeterror()
         return
 
@@ -16557,6 +16723,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENsetlinkid(int(index), newid.encode("utf-8"))
 
+        self._network_version += 1
         self.ENgeterror()
 
     def ENsetlinknodes(self, index, startnode, endnode):
@@ -16576,6 +16743,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENsetlinknodes(int(index), startnode, endnode)
 
+        self._network_version += 1
         self.ENgeterror()
 
     def ENsetlinktype(self, indexLink, paramcode, actionCode):
@@ -16598,6 +16766,7 @@ class epanetapi:
         else:
             self.errcode = self._lib.ENsetlinktype(byref(indexLink), paramcode, actionCode)
 
+        self._network_version += 1
         self.ENgeterror()
         return indexLink.value
 
@@ -16624,6 +16793,23 @@ class epanetapi:
         self.ENgeterror()
         return
 
+    def ENsetlinkvalues(self, paramcode, indices, values):
+        """ Sets a property value for many links.
+
+        ENsetlinkvalues(paramcode, indices, values)
+
+        The shapes are checked once and EN_setlinkvalue is called in a loop without
+        the per-call error lookup. The first error code is kept.
+
+        Parameters:
+        paramcode     the property to set (see EN_LinkProperty).
+        indices       link indices (starting from 1).
+        values        one value per index, or a single value for all of them.
+
+        OWA-EPANET Toolkit: http://wateranalytics.org/EPANET/group___links.html
+        """
+        self._setvalues('link', paramcode, indices, values)
+
     def ENsetnodeid(self, index, newid):
         """ Changes the ID name of a node.
 
@@ -16641,6 +16827,7 @@ class epanetapi:
             self.errcode = self._lib.EN_setnodeid(self._ph, int(index), newid.encode('utf-8'))
         else:
             self.errcode = self._lib.ENsetnodeid(int(index), newid.encode('utf-8'))
+        self._network_version += 1
         self.ENgeterror()
 
     def ENsetnodevalue(self, index, paramcode, value):
@@ -16666,6 +16853,23 @@ class epanetapi:
         self.ENgeterror()
         return
 
+    def ENsetnodevalues(self, paramcode, indices, values):
+        """ Sets a property value for many nodes.
+
+        ENsetnodevalues(paramcode, indices, values)
+
+        The shapes are checked once and EN_setnodevalue is called in a loop without
+        the per-call error lookup. The first error code is kept.
+
+        Parameters:
+        paramcode  the property to set (see EN_NodeProperty, self.getToolkitConstants).
+        indices    node indices (starting from 1).
+        values     one value per index, or a single value for all of them.
+
+        OWA-EPANET Toolkit: http://wateranalytics.org/EPANET/group___nodes.html
+        """
+        self._setvalues('node', paramcode, indices, values)
+
     def ENsetoption(self, optioncode, value):
         """ Sets the value for an anlysis option.
 
@@ -17150,8 +17354,9 @@ class epanetmsxapi(error_handler):
     """example msx = epanetmsxapi()"""
 
     def __init__(self, msxfile='', loadlib=True, ignore_msxfile=False, customMSXlib=None, display_msg=True,
-                 msxrealfile=''):
+                 msxrealfile='', raise_errors=False):
         self.display_msg = display_msg
+        self.raise_errors = raise_errors
         self.customMSXlib = customMSXlib
         if customMSXlib is not None:
             self.MSXLibEPANET = customMSXlib
@@ -17220,6 +17425,8 @@ class epanetmsxapi(error_handler):
         """ Function that every other function uses in case of an error """
         errmsg = create_string_buffer(256)
         self.msx_error(err_code, errmsg, 256)
+        if self.raise_errors:
+            raise Exception(f'MSX Error {err_code}: {errmsg.value.decode()}')
         print(errmsg.value.decode())
 
     def MSXgetindex(self, obj_type, obj_id):
@@ -17731,6 +17938,50 @@ class epanetmsxapi(error_handler):
             Warning(self.MSXerror(self.errcode))
         return value.value
 
+    def MSXgetqualvalues(self, type, species, indices, out=None):
+        """Retrieves the concentration of a chemical species at several nodes or
+           links at the current simulation time step.
+
+           MSXgetqualvalues(type, species, indices, out=None)
+
+           Parameters:
+               type: MSX_NODE (0) for nodes or MSX_LINK (1) for links
+               species: the sequence number of the species (starting from 1)
+               indices: node or link indices (starting from 1)
+               out: optional float64 array (may be a strided view) to fill in place
+
+           Returns:
+               numpy array with one concentration per index.
+        """
+        return self._getqualvalues(self.msx_lib.MSXgetqual, type, species, indices, out)
+
+    def MSXgetinitqualvalues(self, type, species, indices, out=None):
+        """Retrieves the initial concentration of a chemical species at several
+           nodes or links.
+
+           MSXgetinitqualvalues(type, species, indices, out=None)
+
+           See also MSXgetqualvalues, MSXgetinitqual.
+        """
+        return self._getqualvalues(self.msx_lib.MSXgetinitqual, type, species, indices, out)
+
+    def _getqualvalues(self, function, type, species, indices, out):
+        # Bind the function and the value buffer once and check the error code at the end
+        if out is None:
+            out = np.empty(len(indices))
+        value = c_double()
+        ref = byref(value)
+        errcode = 0
+        for k, index in enumerate(indices):
+            err = function(type, index, species, ref)
+            if err:
+                errcode = err
+            out[k] = value.value
+        self.errcode = errcode
+        if self.errcode:
+            Warning(self.MSXerror(self.errcode))
+        return out
+
     def MSXsetsource(self, node, species, type, level, pat):
         """"Sets the attributes of an external source of particular chemical
             species to specific node of the pipe network
@@ -1,21 +1,17 @@
 """ Create a gif with the flows of Net1.
     Requirements:
-        pip install imageio
         pip install Pillow
 
     This example contains:
         Load a network.
         Run analysis with getComputedTimeSeries.
         Set colorbar values based on the min/max of all the Flow values.
-        Create pngs for every timepoint.
-        Create gif from all the pngs.
+        Animate the flows, the network is drawn once and every frame only changes the link colors.
+        Save the animation as a gif.
         Unload library.
 """
 import matplotlib.pyplot as plt
 from epyt import epanet
-from PIL import Image
-import imageio
-import os
 
 # Close all figures
 plt.close('all')
@@ -37,30 +33,14 @@ print("\nCreating flow gif...")
 minFlow = d.min(flows)
 maxFlow = d.max(flows)
 
-# iterate through flow times
-figToPngNames = []
-for i, values in enumerate(flows):
-    hr = str(int(Time[i - 1]))
-
-    d.plot(link_values=values, min_colorbar=minFlow, max_colorbar=maxFlow, figure=False, link_text=True,
-           title=f'Flows at time {hr} hrs', colorbar_label=f'Flow ({d.units.LinkFlowUnits})')
-
-    PngName = f'{i}.png'
-    figToPngNames.append(PngName)
-    plt.savefig(PngName)
-    plt.close()
+# Animate the flows of all times
+titles = [f'Flows at time {int(hr)} hrs' for hr in Time]
+anim = d.plot_animation(link_values=flows, min_colorbar=minFlow, max_colorbar=maxFlow, link_text=True,
+                        titles=titles, colorbar_label=f'Flow ({d.units.LinkFlowUnits})')
 
 # create gif
-with imageio.get_writer(new_gif_name, mode='I') as writer:
-    for fig in figToPngNames:
-        image = imageio.imread(fig)
-        writer.append_data(image)
-
-# Remove files
-for fig in set(figToPngNames):
-    os.remove(fig)
-
-flow_gif = Image.open(new_gif_name)
+anim.save(new_gif_name, writer='pillow')
+plt.close()
 
 print(f"{new_gif_name} has created.")
 
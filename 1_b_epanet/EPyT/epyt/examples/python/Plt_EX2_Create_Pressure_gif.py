@@ -1,23 +1,19 @@
 """ Create a gif with the pressure of net2-cl2.
 
     Requirements:
-        pip install imageio
         pip install Pillow
 
     This example contains:
         Load a network.
         Run hydraulic analysis with getComputedHydraulicTimeSeries.
         Set colorbar values based on the min/max of all the Pressure values.
-        Create pngs for every timepoint.
-        Create gif from all the pngs.
+        Animate the pressures, the network is drawn once and every frame only changes the node colors.
+        Save the animation as a gif.
         Unload library.
 
 """
 import matplotlib.pyplot as plt
 from epyt import epanet
-from PIL import Image
-import imageio
-import os
 
 # Close all figures
 plt.close('all')
@@ -37,31 +33,14 @@ Time = comp_analysis_vals.Time/3600
 minPressure = d.min(pressures)
 maxPressure = d.max(pressures)
 
-# iterate through flow times
-figToPngNames = []
-for i, values in enumerate(pressures):
-
-    hr = str(int(Time[i - 1]))
-
-    d.plot(node_values=values, figure=False, min_colorbar=minPressure, max_colorbar=maxPressure,
-           title=f'Pressures at time {hr} hrs', colorbar_label=f'Pressure ({d.units.NodePressureUnits})')
-
-    PngName = f'{i}.png'
-    figToPngNames.append(PngName)
-    plt.savefig(PngName)
-    plt.close()
+# Animate the pressures of all times
+titles = [f'Pressures at time {int(hr)} hrs' for hr in Time]
+anim = d.plot_animation(node_values=pressures, min_colorbar=minPressure, max_colorbar=maxPressure,
+                        titles=titles, colorbar_label=f'Pressure ({d.units.NodePressureUnits})')
 
 # create gif
-with imageio.get_writer(new_gif_name, mode='I') as writer:
-    for fig in figToPngNames:
-        image = imageio.imread(fig)
-        writer.append_data(image)
-
-# Remove files
-for fig in set(figToPngNames):
-    os.remove(fig)
-
-pressure_gif = Image.open(new_gif_name)
+anim.save(new_gif_name, writer='pillow')
+plt.close()
 
 print(f"{new_gif_name} has created.")
 
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+   Network renderer built on matplotlib collections.
+
+   How to run:
+
+   from epyt import epanet
+   from epyt.plotting import NetworkRenderer
+
+   d = epanet('Net1.inp')
+   flows = d.getComputedTimeSeries().Flow
+
+   renderer = NetworkRenderer(d)
+   renderer.draw_links(values=flows[0], vmin=flows.min(), vmax=flows.max())
+   renderer.draw_node_markers()
+   anim = renderer.animate(link_values=flows)
+   anim.save('Net1_flows.gif', writer='pillow')
+
+   The link geometry, vertices included, is read once and drawn as a single
+   LineCollection and the nodes as one scatter per node type. Updating a frame
+   only replaces the value arrays of the collections, so animations of large
+   networks reuse the same artists.
+"""
+import matplotlib as mpl
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.animation import FuncAnimation
+from matplotlib.collections import LineCollection
+
+# Style of the node and link markers: (label, color, marker, size in points)
+MARKERS = {'pumps': ('Pumps', 'fuchsia', 'v', 0.8), 'valves': ('Valves', 'k', '*', 1.5),
+           'tanks': ('Tanks', 'cyan', '*', 3.5), 'reservoirs': ('Reservoirs', 'lime', 's', 1.5),
+           'junctions': ('Junctions', 'b', 'o', 0.7)}
+
+
+class NetworkRenderer:
+    """ Draws a network on a matplotlib axes and updates the drawn values in place.
+
+    :param network: loaded epanet object, only read when the renderer is created
+    :type network: epanet
+    :param ax: axes to draw on, defaults to the current axes
+    :type ax: matplotlib.axes.Axes, optional
+    """
+
+    def __init__(self, network, ax=None):
+        self.ax = plt.gca() if ax is None else ax
+        coords = network.getNodeCoordinates()
+        self.node_xy = np.column_stack([np.fromiter(coords['x'].values(), dtype=float),
+                                        np.fromiter(coords['y'].values(), dtype=float)])
+        link_nodes = np.asarray(network.getLinkNodesIndex(), dtype=np.int64).reshape(-1, 2) - 1
+        straight = self.node_xy[link_nodes]
+
+        # One polyline per link, the vertices between its start and end node
+        self.segments = list(straight)
+        self.link_xy = straight.mean(axis=1)
+        for i, x_vert in coords['x_vert'].items():
+            if x_vert:
+                vertices = np.column_stack([x_vert, coords['y_vert'][i]])
+                self.segments[i - 1] = np.vstack([straight[i - 1, :1], vertices, straight[i - 1, 1:]])
+                self.link_xy[i - 1] = vertices[len(vertices) // 2]
+
+        index = network.getNetworkIndex()
+        self.node_groups = {'tanks': index.tanks - 1, 'reservoirs': index.reservoirs - 1,
+                            'junctions': index.junctions - 1}
+        self.link_groups = {'pumps': index.pumps - 1, 'valves': index.valves - 1}
+        self.node_ids = list(index.node_ids)
+        self.link_ids = list(index.link_ids)
+
+        self.links = None
+        self.nodes = None
+        self.markers = {}
+        self.link_value_texts = []
+        self.node_value_texts = []
+        self._fmt = '{:.2f}'
+
+    def draw_links(self, values=None, colors=None, cmap='turbo', vmin=None, vmax=None, linewidth=None,
+                   label='Pipes'):
+        """ Draws all the links as one LineCollection.
+
+        :param values: value of every link, mapped to colors with cmap
+        :type values: np.ndarray, optional
+        :param colors: color of every link, used instead of values
+        :type colors: list, optional
+        :param cmap: colormap name
+        :type cmap: str
+        :param vmin: value of the first color, defaults to the minimum value
+        :type vmin: float, optional
+        :param vmax: value of the last color, defaults to the maximum value
+        :type vmax: float, optional
+        :param linewidth: line width, a single value or one per link
+        :type linewidth: float or np.ndarray, optional
+        :param label: legend label
+        :type label: str, optional
+        :return: the collection, also kept as the links attribute
+        :rtype: matplotlib.collections.LineCollection
+        """
+        plain = values is None and colors is None
+        if linewidth is None:
+            linewidth = 0.2 if plain else 0.7
+        self.links = LineCollection(self.segments, linewidths=linewidth, zorder=0, label=label if plain else None)
+        if colors is not None:
+            self.links.set_color(colors)
+        elif values is not None:
+            values = np.asarray(values, dtype=float).ravel()
+            self.links.set_cmap(cmap)
+            self.links.set_norm(mpl.colors.Normalize(vmin, vmax))
+            self.links.set_array(values)
+        else:
+            self.links.set_color('steelblue')
+        self.ax.add_collection(self.links)
+        self.ax.autoscale_view()
+        return self.links
+
+    def draw_link_markers(self):
+        """ Draws a marker at the middle of every pump and valve. """
+        for group, indices in self.link_groups.items():
+            self._drawMarkers(group, self.link_xy[indices])
+        return self.markers
+
+    def draw_node_markers(self):
+        """ Draws the tanks, reservoirs and junctions, one scatter per node type. """
+        for group, indices in self.node_groups.items():
+            self._drawMarkers(group, self.node_xy[indices], zorder=0)
+        return self.markers
+
+    def draw_node_values(self, values, cmap='turbo', vmin=None, vmax=None, size=3.5):
+        """ Draws all the nodes as one scatter colored by their values.
+
+        :param values: value of every node
+        :type values: np.ndarray
+        :param cmap: colormap name
+        :type cmap: str
+        :param vmin: value of the first color, defaults to the minimum value
+        :type vmin: float, optional
+        :param vmax: value of the last color, defaults to the maximum value
+        :type vmax: float, optional
+        :param size: marker area in points^2
+        :type size: float
+        :return: the collection, also kept as the nodes attribute
+        :rtype: matplotlib.collections.PathCollection
+        """
+        self.nodes = self.ax.scatter(self.node_xy[:, 0], self.node_xy[:, 1], c=np.asarray(values, dtype=float),
+                                     cmap=cmap, norm=mpl.colors.Normalize(vmin, vmax), s=size, zorder=2)
+        return self.nodes
+
+    def highlight_links(self, indices, linewidth=1):
+        """ Draws the given links (indices starting from 1) in red over the network. """
+        segments = [self.segments[i - 1] for i in np.asarray(indices, dtype=np.int64).ravel()]
+        collection = LineCollection(segments, colors='r', linewidths=linewidth, zorder=0)
+        self.ax.add_collection(collection)
+        return collection
+
+    def highlight_nodes(self, indices, markersize=3.5):
+        """ Draws the given nodes (indices starting from 1) as red points. """
+        xy = self.node_xy[np.asarray(indices, dtype=np.int64).ravel() - 1]
+        return self.ax.plot(xy[:, 0], xy[:, 1], '.r', markersize=markersize, linestyle='None')
+
+    def label_links(self, indices, labels=None, fontsize=5):
+        """ Writes a label at the middle of the given links, their IDs by default. """
+        return self._label(self.link_xy, self.link_ids, indices, labels, fontsize)
+
+    def label_nodes(self, indices, labels=None, fontsize=5):
+        """ Writes a label at the given nodes, their IDs by default. """
+        return self._label(self.node_xy, self.node_ids, indices, labels, fontsize)
+
+    def label_values(self, link_values=None, node_values=None, fontsize=5, fmt='{:.2f}'):
+        """ Writes the value of every link and/or node, update changes these texts in place. """
+        if link_values is not None:
+            self.link_value_texts = self._label(self.link_xy, None, None, [fmt.format(v) for v in link_values],
+                                                fontsize)
+        if node_values is not None:
+            self.node_value_texts = self._label(self.node_xy, None, None, [fmt.format(v) for v in node_values],
+                                                fontsize)
+        self._fmt = fmt
+
+    def update(self, link_values=None, node_values=None, link_widths=None):
+        """ Replaces the drawn values, the geometry is not rebuilt.
+
+        :param link_values: value of every link
+        :type link_values: np.ndarray, optional
+        :param node_values: value of every node
+        :type node_values: np.ndarray, optional
+        :param link_widths: line width of every link
+        :type link_widths: np.ndarray, optional
+        :return: the artists that changed
+        :rtype: list
+        """
+        changed = []
+        if link_values is not None or link_widths is not None:
+            if link_values is not None:
+                self.links.set_array(np.asarray(link_values, dtype=float).ravel())
+                changed += self._relabel(self.link_value_texts, link_values)
+            if link_widths is not None:
+                self.links.set_linewidths(link_widths)
+            changed.append(self.links)
+        if node_values is not None:
+            self.nodes.set_array(np.asarray(node_values, dtype=float).ravel())
+            changed.append(self.nodes)
+            changed += self._relabel(self.node_value_texts, node_values)
+        return changed
+
+    def animate(self, link_values=None, node_values=None, link_widths=None, titles=None, interval=200, **kwargs):
+        """ Animates (time, element) arrays of values over the drawn network.
+
+        :param link_values: (time, links) values
+        :type link_values: np.ndarray, optional
+        :param node_values: (time, nodes) values
+        :type node_values: np.ndarray, optional
+        :param link_widths: (time, links) line widths
+        :type link_widths: np.ndarray, optional
+        :param titles: title of every frame
+        :type titles: list of str, optional
+        :param interval: delay between frames in milliseconds
+        :type interval: int
+        :return: animation, e.g. anim.save('flows.gif', writer='pillow')
+        :rtype: matplotlib.animation.FuncAnimation
+        """
+        frames = [np.asarray(a) for a in (link_values, node_values, link_widths) if a is not None]
+        if not frames:
+            raise ValueError('Nothing to animate, give link_values, node_values or link_widths.')
+        count = len(frames[0])
+
+        def frame(k):
+            changed = self.update(None if link_values is None else link_values[k],
+                                  None if node_values is None else node_values[k],
+                                  None if link_widths is None else link_widths[k])
+            if titles is not None:
+                self.ax.set_title(titles[k], fontsize=self.ax.title.get_fontsize(), fontweight='bold')
+                changed.append(self.ax.title)
+            return changed
+
+        return FuncAnimation(self.ax.figure, frame, frames=count, interval=interval, **kwargs)
+
+    def _drawMarkers(self, group, xy, zorder=2):
+        if not len(xy):
+            return
+        label, color, marker, size = MARKERS[group]
+        self.markers[group] = self.ax.scatter(xy[:, 0], xy[:, 1], s=(size + 1) ** 2, c=color, marker=marker,
+                                              linewidths=0, label=label, zorder=zorder)
+
+    def _label(self, xy, ids, indices, labels, fontsize):
+        if indices is None:
+            indices = np.arange(1, len(xy) + 1)
+        indices = np.asarray(indices, dtype=np.int64).ravel()
+        if labels is None:
+            labels = [ids[i - 1] for i in indices]
+        return [self.ax.text(xy[i - 1, 0], xy[i - 1, 1], label, {'fontsize': fontsize})
+                for i, label in zip(indices.tolist(), labels)]
+
+    def _relabel(self, texts, values):
+        for text, value in zip(texts, np.asarray(values).ravel().tolist()):
+            text.set_text(self._fmt.format(value))
+        return texts
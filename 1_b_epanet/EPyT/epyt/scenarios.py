@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+   Parallel what-if scenario runner.
+
+   How to run:
+
+   from epyt.scenarios import ScenarioRunner
+
+   scenarios = [{'setNodeBaseDemands': (d * 1.1,)},
+                {'setLinkStatus': (12, 0)},
+                {'setLinkRoughnessCoeff': (roughness * 0.9,)}]
+
+   with ScenarioRunner('Net1.inp', processes=4) as runner:
+       for result in runner.run(scenarios):
+           pressure = result['Pressure']
+
+   Every worker process loads its own copy of the EPANET library, opens the base
+   network once with a project handle (ph=True) in a private temporary directory
+   and reloads it before each scenario. Results are returned in submission order.
+
+   For Monte-Carlo studies, runner.aggregate(scenarios) returns only the running
+   statistics of the results (see epyt.uncertainty), computed in the workers.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing.util import Finalize
+
+import numpy as np
+
+from epyt.uncertainty import RunningStatistics
+
+# Per-process state of a worker, set by _init_worker
+_worker = None
+
+HYDRAULIC_FIELDS = ['time', 'pressure', 'demand', 'demanddeficit', 'head', 'tankvolume', 'flow',
+                    'velocity', 'headloss', 'status', 'setting', 'energy', 'efficiency']
+
+
+class _Worker:
+    """ Holds the epanet object of a worker process and its private directory. """
+
+    def __init__(self, inpfile, fields, dtype):
+        from epyt import epanet
+        self.tmpdir = tempfile.mkdtemp(prefix='epyt_scenario_')
+        path = os.path.join(self.tmpdir, os.path.basename(inpfile))
+        shutil.copyfile(inpfile, path)
+        self.d = epanet(path, ph=True, display_msg=False, display_warnings=False)
+        self.fields = fields
+        self.dtype = dtype
+        self.dirty = False
+
+    def run(self, scenario):
+        d = self.d
+        if self.dirty:
+            # Start every scenario from the unmodified base network
+            d.api.ENdeleteproject()
+            d.reloadNetwork()
+        self.dirty = True
+        if callable(scenario):
+            scenario(d)
+        else:
+            for method, args in scenario.items():
+                if not isinstance(args, tuple):
+                    args = (args,)
+                getattr(d, method)(*args)
+        values = d.getComputedHydraulicTimeSeries(True, self.fields)
+        result = {}
+        for name, value in values.__dict__.items():
+            if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+                value = value.astype(self.dtype, copy=False)
+            result[name] = value
+        return result
+
+    def aggregate(self, scenarios, quantiles):
+        stats = {}
+        for scenario in scenarios:
+            result = self.run(scenario)
+            # Intermediate steps depend on the scenario, only the hydraulic time steps are kept
+            time = result.pop('Time')
+            rows = time % self.d.getTimeHydraulicStep() == 0
+            for name, value in result.items():
+                if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+                    value = value[rows]
+                    if name not in stats:
+                        stats[name] = RunningStatistics(value.shape, quantiles)
+                    stats[name].update(value)
+        return stats
+
+    def close(self):
+        try:
+            self.d.unload()
+        finally:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+def _init_worker(inpfile, fields, dtype):
+    global _worker
+    _worker = _Worker(inpfile, fields, dtype)
+    Finalize(None, _worker.close, exitpriority=10)
+
+
+def _run_scenario(scenario):
+    return _worker.run(scenario)
+
+
+def _aggregate_scenarios(scenarios, quantiles):
+    return _worker.aggregate(scenarios, quantiles)
+
+
+class ScenarioRunner:
+    """ Runs what-if scenarios of a base network over a pool of processes.
+
+    A scenario is either a dict that maps epanet setter names to their arguments,
+    e.g. {'setLinkStatus': (12, 0)} (a non-tuple value is passed as the only
+    argument), or a picklable function that takes the epanet object and modifies
+    it. Each scenario starts from the unmodified base network.
+
+    :param inpfile: path of the base EPANET input file
+    :type inpfile: str
+    :param processes: number of worker processes, defaults to os.cpu_count()
+    :type processes: int, optional
+    :param fields: hydraulic time series to return, see getComputedHydraulicTimeSeries
+    :type fields: list of str, optional
+    :param max_pending: maximum number of scenarios in flight, defaults to 2 * processes
+    :type max_pending: int, optional
+    :param dtype: dtype of the returned float arrays
+    :type dtype: numpy dtype, optional
+    :param mp_context: multiprocessing context or start method, e.g. 'spawn'
+    :type mp_context: str or multiprocessing context, optional
+    """
+
+    def __init__(self, inpfile, processes=None, fields=None, max_pending=None, dtype=np.float32,
+                 mp_context=None):
+        if not os.path.exists(inpfile):
+            raise FileNotFoundError(f'File "{inpfile}" does not exist.')
+        if fields is None:
+            fields = ['time', 'pressure', 'flow']
+        fields = [f.lower() for f in fields]
+        for f in fields:
+            if f not in HYDRAULIC_FIELDS:
+                raise ValueError(f'Unknown field "{f}", use one of {HYDRAULIC_FIELDS}.')
+        self.inpfile = os.path.abspath(inpfile)
+        self.processes = processes or os.cpu_count() or 1
+        self.fields = fields
+        self.max_pending = max_pending or 2 * self.processes
+        self.dtype = np.dtype(dtype)
+        if isinstance(mp_context, str):
+            mp_context = multiprocessing.get_context(mp_context)
+        self._executor = ProcessPoolExecutor(max_workers=self.processes, mp_context=mp_context,
+                                             initializer=_init_worker,
+                                             initargs=(self.inpfile, self.fields, self.dtype))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """ Shuts down the worker processes and removes their temporary files. """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def run(self, scenarios, return_exceptions=False):
+        """ Runs the scenarios and yields their results in submission order.
+
+        At most max_pending scenarios are submitted ahead of the consumer, so
+        scenarios may be a generator of any length.
+
+        :param scenarios: iterable of scenario dicts or functions
+        :type scenarios: iterable
+        :param return_exceptions: yield the exception of a failed scenario instead of raising it
+        :type return_exceptions: bool
+        :return: dict of numpy arrays per scenario, e.g. {'Time': ..., 'Pressure': ...}
+        :rtype: generator
+        """
+        if self._executor is None:
+            raise RuntimeError('ScenarioRunner is closed.')
+        pending = deque()
+        try:
+            for scenario in scenarios:
+                if len(pending) >= self.max_pending:
+                    yield self._result(pending.popleft(), return_exceptions)
+                pending.append(self._executor.submit(_run_scenario, scenario))
+            while pending:
+                yield self._result(pending.popleft(), return_exceptions)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def map(self, scenarios, return_exceptions=False):
+        """ Runs the scenarios and returns the list of their results. """
+        return list(self.run(scenarios, return_exceptions))
+
+    def aggregate(self, scenarios, quantiles=(0.05, 0.5, 0.95), batch_size=50):
+        """ Runs the scenarios, e.g. Monte-Carlo realizations, and returns only their statistics.
+
+        Each worker reduces a batch of scenarios to running statistics and the parent
+        merges the batches, so the memory does not depend on the number of
+        scenarios. Only the rows at multiples of the hydraulic time step are
+        used, the intermediate steps of each scenario are left out. The fields
+        must include 'time'.
+
+        :param scenarios: iterable of scenario dicts or functions
+        :type scenarios: iterable
+        :param quantiles: quantiles to estimate, between 0 and 1
+        :type quantiles: list of float, optional
+        :param batch_size: number of scenarios run by a worker before its statistics are sent back
+        :type batch_size: int
+        :return: statistics of every float field, e.g. {'Pressure': RunningStatistics}
+        :rtype: dict
+        """
+        if self._executor is None:
+            raise RuntimeError('ScenarioRunner is closed.')
+        if 'time' not in self.fields:
+            raise ValueError('aggregate needs the time field.')
+        quantiles = tuple(quantiles)
+        stats = {}
+        pending = deque()
+
+        def merge(future):
+            for name, partial in future.result().items():
+                if name in stats:
+                    stats[name].merge(partial)
+                else:
+                    stats[name] = partial
+
+        try:
+            scenarios = iter(scenarios)
+            while True:
+                batch = list(islice(scenarios, batch_size))
+                if not batch:
+                    break
+                if len(pending) >= self.max_pending:
+                    merge(pending.popleft())
+                pending.append(self._executor.submit(_aggregate_scenarios, batch, quantiles))
+            while pending:
+                merge(pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
+        return stats
+
+    @staticmethod
+    def _result(future, return_exceptions):
+        if not return_exceptions:
+            return future.result()
+        try:
+            return future.result()
+        except Exception as e:
+            return e
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+   Warm-started hydraulic snapshots for real-time use.
+
+   How to run:
+
+   from epyt.session import SimulationSession
+
+   with SimulationSession('Net1.inp') as session:
+       while True:
+           session.set_state(demand_multipliers=factors, pump_status=status, tank_levels=levels, time=t)
+           snapshot = session.solve()
+           pressure = snapshot.Pressure
+
+   The network is loaded and the hydraulic solver opened once. Every cycle only
+   the values that changed since the previous one are sent to the toolkit and a
+   single hydraulic time step is solved. With a SnapshotCache, a state that was
+   already solved is not solved again.
+"""
+import numpy as np
+
+from epyt.cache import fingerprint
+from epyt.epanet import epanet, EpytValues
+
+SNAPSHOT_FIELDS = {'Pressure': ('node', 'EN_PRESSURE'), 'Head': ('node', 'EN_HEAD'),
+                   'Demand': ('node', 'EN_DEMAND'), 'Flow': ('link', 'EN_FLOW'),
+                   'Velocity': ('link', 'EN_VELOCITY'), 'HeadLoss': ('link', 'EN_HEADLOSS'),
+                   'Status': ('link', 'EN_STATUS'), 'Setting': ('link', 'EN_SETTING')}
+
+
+class SimulationSession:
+    """ Keeps a network loaded and re-solves hydraulic snapshots in place.
+
+    State is passed as arrays ordered like junction_index, pump_index,
+    valve_index and tank_index. NaN entries leave the current value unchanged.
+    The time is the pattern start, the snapshot uses the demand and other
+    pattern factors of that time.
+
+    :param inpfile: EPANET input file, not needed if network is given
+    :type inpfile: str, optional
+    :param network: an already loaded epanet object, it is not unloaded by close
+    :type network: epanet, optional
+    :param fields: results returned by solve, see SNAPSHOT_FIELDS
+    :type fields: list of str, optional
+    :param cache: cache of the solved snapshots, keyed by the input file, the fields and the state.
+        Changes made to the network other than by set_state are not part of the key.
+    :type cache: epyt.cache.SnapshotCache, optional
+    """
+
+    def __init__(self, inpfile=None, network=None, fields=None, cache=None):
+        self._owner = network is None
+        if network is None:
+            network = epanet(inpfile, ph=True, display_msg=False, display_warnings=False)
+        self.network = network
+        self.api = network.api
+        tk = network.ToolkitConstants
+        if fields is None:
+            fields = ['Pressure', 'Head', 'Demand', 'Flow', 'Velocity']
+        for name in fields:
+            if name not in SNAPSHOT_FIELDS:
+                raise ValueError(f'Unknown field "{name}", use one of {list(SNAPSHOT_FIELDS)}.')
+        self.fields = [(name, kind, getattr(tk, code)) for name, (kind, code) in
+                       ((name, SNAPSHOT_FIELDS[name]) for name in fields)]
+
+        index = network.getNetworkIndex()
+        self.junction_index = index.junctions.copy()
+        self.tank_index = index.tanks.copy()
+        self.pump_index = index.pumps.copy()
+        self.valve_index = index.valves.copy()
+        self.junction_id = [index.node_ids[i - 1] for i in self.junction_index.tolist()]
+        self.tank_id = [index.node_ids[i - 1] for i in self.tank_index.tolist()]
+        self.pump_id = [index.link_ids[i - 1] for i in self.pump_index.tolist()]
+        self.valve_id = [index.link_ids[i - 1] for i in self.valve_index.tolist()]
+
+        # (set function, parameter code, indices) of every state array
+        self._state = {
+            'demands': (self.api.ENsetnodevalues, tk.EN_BASEDEMAND, self.junction_index),
+            'pump_status': (self.api.ENsetlinkvalues, tk.EN_INITSTATUS, self.pump_index),
+            'pump_speeds': (self.api.ENsetlinkvalues, tk.EN_INITSETTING, self.pump_index),
+            'valve_settings': (self.api.ENsetlinkvalues, tk.EN_INITSETTING, self.valve_index),
+            'tank_levels': (self.api.ENsetnodevalues, tk.EN_TANKLEVEL, self.tank_index),
+            'time': (self._setTime, tk.EN_PATTERNSTART, np.zeros(1, dtype=np.int64)),
+        }
+        self.initial = {
+            'demands': self.api.ENgetnodevalues(tk.EN_BASEDEMAND, self.junction_index),
+            'pump_status': self.api.ENgetlinkvalues(tk.EN_INITSTATUS, self.pump_index),
+            'pump_speeds': self.api.ENgetlinkvalues(tk.EN_INITSETTING, self.pump_index),
+            'valve_settings': self.api.ENgetlinkvalues(tk.EN_INITSETTING, self.valve_index),
+            'tank_levels': self.api.ENgetnodevalues(tk.EN_TANKLEVEL, self.tank_index),
+            'time': np.array([self.api.ENgettimeparam(tk.EN_PATTERNSTART)], dtype=float),
+        }
+        self.current = {name: value.copy() for name, value in self.initial.items()}
+        self._open = False
+
+        self.cache = cache
+        if cache is not None:
+            with open(network.InputFile, 'rb') as f:
+                self._cache_key = fingerprint(f.read(), *fields)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """ Closes the hydraulic solver and unloads the network if the session loaded it. """
+        if self._open:
+            self.api.ENcloseH()
+            self._open = False
+        if self._owner and self.network is not None:
+            self.network.unload()
+        self.network = None
+
+    def set_state(self, demands=None, demand_multipliers=None, pump_status=None, pump_speeds=None,
+                  valve_settings=None, tank_levels=None, time=None):
+        """ Applies a new state, only the values that changed are sent to the toolkit.
+
+        :param demands: base demand of every junction
+        :type demands: np.ndarray, optional
+        :param demand_multipliers: factors applied to the initial base demands
+        :type demand_multipliers: np.ndarray or float, optional
+        :param pump_status: initial status of every pump, 1 open and 0 closed
+        :type pump_status: np.ndarray, optional
+        :param pump_speeds: initial relative speed of every pump
+        :type pump_speeds: np.ndarray, optional
+        :param valve_settings: initial setting of every valve
+        :type valve_settings: np.ndarray, optional
+        :param tank_levels: initial water level of every tank
+        :type tank_levels: np.ndarray, optional
+        :param time: time of the snapshot in seconds, sets the pattern start
+        :type time: int, optional
+        :return: number of values changed
+        :rtype: int
+        """
+        if demand_multipliers is not None:
+            if demands is not None:
+                raise ValueError('Use either demands or demand_multipliers.')
+            demands = self.initial['demands'] * np.asarray(demand_multipliers, dtype=float)
+        changed = 0
+        for name, values in (('demands', demands), ('pump_status', pump_status), ('pump_speeds', pump_speeds),
+                             ('valve_settings', valve_settings), ('tank_levels', tank_levels), ('time', time)):
+            if values is not None:
+                changed += self._apply(name, values)
+        return changed
+
+    def reset(self):
+        """ Restores the state the network was loaded with. """
+        for name, values in self.initial.items():
+            self._apply(name, values)
+
+    def _apply(self, name, values):
+        setvalues, code, indices = self._state[name]
+        current = self.current[name]
+        values = np.broadcast_to(np.asarray(values, dtype=float), current.shape)
+        changed = np.flatnonzero(~np.isnan(values) & (values != current))
+        if len(changed):
+            setvalues(code, indices[changed], values[changed])
+        current[changed] = values[changed]
+        return len(changed)
+
+    def _setTime(self, code, indices, values):
+        self.api.ENsettimeparam(code, int(values[0]))
+
+    def solve(self):
+        """ Solves the hydraulics of the current state, a single time step at the session time.
+
+        :return: the arrays of the session fields, e.g. Pressure and Flow, read-only if cached
+        :rtype: EpytValues
+        """
+        if self.cache is None:
+            return self._solve()
+        key = fingerprint(self._cache_key, *self.current.values())
+        arrays = self.cache.get(key)
+        if arrays is None:
+            arrays = self.cache.put(key, vars(self._solve()))
+        value = EpytValues()
+        for name, array in arrays.items():
+            setattr(value, name, array[()] if array.ndim == 0 else array)
+        return value
+
+    def _solve(self):
+        api = self.api
+        if not self._open:
+            api.ENopenH()
+            self._open = True
+        api.ENinitH(0)
+        value = EpytValues()
+        value.Time = api.ENrunH()
+        for name, kind, code in self.fields:
+            if kind == 'node':
+                setattr(value, name, api.ENgetnodevalues(code))
+            else:
+                setattr(value, name, api.ENgetlinkvalues(code))
+        return value
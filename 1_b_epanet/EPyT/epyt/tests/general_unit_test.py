@@ -1,5 +1,13 @@
 from math import isclose
 from epyt import epanet
+from epyt.binfile import EpanetBinFile
+from epyt.cache import SnapshotCache, fingerprint
+from epyt.plotting import NetworkRenderer
+from epyt.scenarios import ScenarioRunner
+from epyt.session import SimulationSession
+from epyt.uncertainty import RandomDemands, RunningStatistics
+import os
+import tempfile
 import numpy as np
 import unittest
 
@@ -607,6 +615,41 @@ class GetTest(unittest.TestCase):
                                              err_msg='Wrong connectivity matrix output'
                                              )
 
+    def test_getTopology(self):
+        err_msg = 'Wrong topology output'
+        d = self.epanetClass
+        topo = d.getTopology()
+        self.assertIs(topo, d.getTopology(), err_msg)
+        np.testing.assert_array_equal(d.getConnectivityMatrix(sparse=True).toarray(), d.getConnectivityMatrix(),
+                                      err_msg=err_msg)
+        self.assertEqual(topo.incidence.shape, (11, 13), err_msg)
+        np.testing.assert_array_equal(np.asarray(topo.incidence.sum(axis=0)).ravel(), np.zeros(13), err_msg=err_msg)
+
+        # Closing pipe 10 cuts the reservoir from the rest of the network, the tank still supplies it
+        closed = [d.getLinkIndex('10')]
+        n, labels = topo.connected_components(closed)
+        self.assertEqual(n, 2, err_msg)
+        self.assertEqual(labels[d.getNodeIndex('9') - 1], labels[d.getNodeIndex('10') - 1], err_msg)
+        np.testing.assert_array_equal(topo.isolated_nodes(closed), [], err_msg=err_msg)
+        np.testing.assert_array_equal(topo.isolated_nodes(closed, sources=[d.getNodeIndex('9')]),
+                                      [2, 3, 4, 5, 6, 7, 8, 9, 11], err_msg=err_msg)
+
+        flows = np.mean(d.getComputedTimeSeries().Flow, 0)
+        np.testing.assert_array_equal(d.getAdjacencyMatrix(flows, sparse=True).toarray(),
+                                      d.getAdjacencyMatrix(flows), err_msg=err_msg)
+        np.testing.assert_array_equal(topo.downstream(d.getNodeIndex('10'), flows), range(1, 10), err_msg=err_msg)
+        np.testing.assert_array_equal(topo.upstream(d.getNodeIndex('32'), flows), [1, 2, 3, 5, 6, 8, 9, 10, 11],
+                                      err_msg=err_msg)
+
+        distance, nodes, links = topo.shortest_path(d.getNodeIndex('10'), d.getNodeIndex('2'),
+                                                    weights=d.getLinkLength())
+        self.assertEqual(distance, 16010, err_msg)
+        self.assertEqual(d.getNodeNameID(nodes), ['10', '11', '12', '2'], err_msg)
+        self.assertEqual(d.getLinkNameID(links), ['10', '11', '110'], err_msg)
+
+        d.addNodeJunction('J1')
+        self.assertEqual(d.getTopology().node_count, 12, err_msg)
+
     def test_getControls(self):
         self.assertDictEqual(self.epanetClass.getControls(1).to_dict(),
                              {'Type': 'LOWLEVEL', 'LinkID': '9', 'Setting': 'OPEN',
@@ -900,6 +943,26 @@ class GetTest(unittest.TestCase):
         valve_ids = d.getLinkValveNameID([1, 2, 3])
         self.assertEqual(valve_ids, ['~@RV-1', '~@RV-2', '~@RV-3'], 'Wrong valve IDs')
 
+    def test_getNetworkIndex(self):
+        d = self.epanetClass
+        index = d.getNetworkIndex()
+        self.assertIs(d.getNetworkIndex(), index, 'Network index not cached')
+        self.assertEqual(index.node_index['10'], 1, 'Wrong node index')
+        np.testing.assert_array_equal(index.link_indices(['12', '9']), [3, 13], err_msg='Wrong link indices')
+        np.testing.assert_array_equal(index.tanks, [11], err_msg='Wrong tank indices')
+        np.testing.assert_array_equal(index.pumps, [13], err_msg='Wrong pump indices')
+        self.assertRaises(ValueError, index.node_indices, ['10', 'X'])
+        # Edits of the network rebuild the index
+        d.setNodeNameID(1, 'N10')
+        self.assertEqual(d.getNodeIndex('N10'), 1, 'Wrong node index after rename')
+        self.assertEqual(d.getNodeNameID(1), 'N10', 'Wrong node ID after rename')
+        d.splitPipe('12', '12b', 'J12')
+        self.assertEqual(d.getLinkIndex('12b'), 14, 'Wrong link index after split')
+        self.assertEqual(d.getNodeJunctionNameID()[-1], 'J12', 'Wrong junction IDs after split')
+        d.deleteNode('J12')
+        self.assertNotIn('J12', d.getNodeNameID(), 'Deleted node still indexed')
+        self.assertEqual(d.getNodeTankIndex(), [11], 'Wrong tank index after delete')
+
     def test_getNodeInfo(self):
         n_info = self.epanetClass.getNodesInfo()
         self.assertEqual(list(n_info.NodeElevations),
@@ -1288,6 +1351,35 @@ class GetTest(unittest.TestCase):
         self.assertEqual(self.epanetClass.getTimeNextEvent(), 3600, 'Wrong Time Next Event Output')
         self.assertEqual(self.epanetClass.getTimeNextEventTank(), 0, 'Wrong Time Next Event Tank Output')
 
+    def test_getComputedHydraulicTimeSeriesLayout(self):
+        err_msg = 'Wrong hydraulic time series layout'
+        d = self.epanetClass
+        data = d.getComputedHydraulicTimeSeries()
+        # Net1 tank events add intermediate steps beyond duration / hydraulic step
+        n_steps = len(data.Time)
+        self.assertGreater(n_steps, d.getTimeSimulationDuration() // d.getTimeHydraulicStep() + 1, err_msg)
+        self.assertEqual(data.Pressure.shape, (n_steps, d.getNodeCount()), err_msg)
+        self.assertEqual(data.Flow.shape, (n_steps, d.getLinkCount()), err_msg)
+        pump_index = d.getLinkPumpIndex()
+        np.testing.assert_array_equal(np.delete(data.Efficiency, pump_index - 1, axis=1), 0, err_msg=err_msg)
+        np.testing.assert_array_equal(data.StatusStr, np.array(d.TYPESTATUS)[data.Status], err_msg=err_msg)
+        np.testing.assert_array_equal(data.State.shape, (n_steps, len(pump_index)), err_msg=err_msg)
+
+    def test_getNodeLinkValues(self):
+        err_msg = 'Wrong bulk node/link values output'
+        d = self.epanetClass
+        elevations = d.api.ENgetnodevalues(d.ToolkitConstants.EN_ELEVATION)
+        self.assertEqual(elevations.dtype, np.float64, err_msg)
+        desired = [d.api.ENgetnodevalue(i, d.ToolkitConstants.EN_ELEVATION) for i in range(1, d.getNodeCount() + 1)]
+        np.testing.assert_array_equal(elevations, desired, err_msg=err_msg)
+        np.testing.assert_array_equal(d.api.ENgetnodevalues(d.ToolkitConstants.EN_ELEVATION, [3, 1]),
+                                      [desired[2], desired[0]], err_msg=err_msg)
+        out = np.zeros(d.getLinkCount())
+        lengths = d.api.ENgetlinkvalues(d.ToolkitConstants.EN_LENGTH, out=out)
+        self.assertIs(lengths, out, err_msg)
+        np.testing.assert_array_equal(lengths, d.getLinkLength(), err_msg=err_msg)
+        np.testing.assert_array_equal(d.getLinkLength([2, 4]), lengths[[1, 3]], err_msg=err_msg)
+
 
 class SetTest(unittest.TestCase):
 
@@ -1707,6 +1799,23 @@ class SetTest(unittest.TestCase):
         index = self.epanetClass.setLinkTypeValveTCV(link_id)
         self.assertEqual(self.epanetClass.getLinkType(index), 'TCV', err_msg)
 
+    def test_setLinkValues(self):
+        d = self.epanetClass
+        err_msg = 'Error setting link values'
+        roughness = d.getLinkRoughnessCoeff()
+        d.setLinkValues(d.ToolkitConstants.EN_ROUGHNESS, roughness * 0.5)
+        np.testing.assert_array_almost_equal(d.getLinkRoughnessCoeff(), roughness * 0.5, err_msg=err_msg)
+        # IDs, scalar broadcast and NaN values left unchanged
+        d.setLinkValues(d.ToolkitConstants.EN_ROUGHNESS, ['10', '12'], 120)
+        d.setLinkValues(d.ToolkitConstants.EN_ROUGHNESS, np.array([2, 3]), [np.nan, 90])
+        self.assertEqual(list(d.getLinkRoughnessCoeff([1, 2, 3, 4])), [120, 50, 90, 50], err_msg)
+        d.setLinkStatus(['9'], [0])
+        self.assertEqual(d.getLinkStatus(d.getLinkIndex('9')), 0, err_msg)
+        with self.assertRaises(ValueError):
+            d.setLinkValues(d.ToolkitConstants.EN_ROUGHNESS, [1, 2], [100, 110, 120])
+        with self.assertRaises(ValueError):
+            d.setLinkValues(d.ToolkitConstants.EN_ROUGHNESS, ['unknown'], 100)
+
     def test_setLinkVertices(self):
         link_id = '10'
         x = [22, 24, 28]
@@ -2033,6 +2142,23 @@ class SetTest(unittest.TestCase):
         d.setNodeTankMixingModelType(tank_index, ['MIX2', 'LIFO'])
         self.assertEqual(d.getNodeTankMixingModelType(), ['MIX2', 'LIFO'], err_msg)
 
+    def test_setNodeValues(self):
+        d = self.epanetClass
+        err_msg = 'Error setting node values'
+        d.setNodeValues(d.ToolkitConstants.EN_ELEVATION, np.arange(d.getNodeCount()))
+        self.assertEqual(list(d.getNodeElevations()), list(range(d.getNodeCount())), err_msg)
+        d.setNodeValues(d.ToolkitConstants.EN_TANKLEVEL, '2', 130)
+        self.assertEqual(d.getNodeTankInitialLevel(), 130, err_msg)
+        junctions = d.getNodeJunctionIndex()
+        d.setNodeBaseDemands(junctions, np.full(len(junctions), 200))
+        d.setNodeBaseDemands(['11'], [50])
+        demands = d.getNodeBaseDemands()[1]
+        self.assertEqual(list(demands[:3]), [200, 50, 200], err_msg)
+        # Renaming a node updates the cached IDs
+        d.setNodeNameID(2, 'J11')
+        d.setNodeValues(d.ToolkitConstants.EN_ELEVATION, ['J11'], [42])
+        self.assertEqual(d.getNodeElevations(2), 42, err_msg)
+
     def test_setNodeType(self):
         """ ---setNodeTypeJunction---    """
         index = self.epanetClass.setNodeTypeJunction('2')
@@ -2301,6 +2427,51 @@ class SetTest(unittest.TestCase):
 
 class AnalysisTest(unittest.TestCase):
 
+    @staticmethod
+    def test_NetworkRenderer():
+        import matplotlib.pyplot as plt
+        err_msg = 'Error in NetworkRenderer output'
+        d = epanet('Net1.inp', ph=False)
+        values = d.getComputedTimeSeries()
+        renderer = NetworkRenderer(d, ax=plt.figure().gca())
+        links = renderer.draw_links(values.Flow[0], vmin=values.Flow.min(), vmax=values.Flow.max())
+        nodes = renderer.draw_node_values(values.Pressure[0])
+        assert len(links.get_paths()) == d.getLinkCount(), err_msg
+        paths = links.get_paths()
+        # Frames only change the values, the geometry is kept
+        changed = renderer.update(link_values=values.Flow[5], node_values=values.Pressure[5])
+        assert changed == [links, nodes] and links.get_paths() is paths, err_msg
+        np.testing.assert_array_equal(links.get_array(), values.Flow[5], err_msg=err_msg)
+        anim = d.plot_animation(link_values=values.Flow[:3], titles=[str(t) for t in values.Time[:3]])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            anim.save(os.path.join(tmpdir, 'flows.gif'), writer='pillow', dpi=20)
+        np.testing.assert_array_equal(plt.gca().collections[0].get_array(), values.Flow[2], err_msg=err_msg)
+        plt.close('all')
+        d.unload()
+
+    @staticmethod
+    def test_errorHandler():
+        err_msg = 'Error in toolkit error reporting'
+        d = epanet('Net1.inp', ph=False)
+        assert d.getNodeCount.__name__ == 'getNodeCount', err_msg
+        d.getNodeNameID(1000)
+        assert d.last_error[0] == 'getNodeNameID', err_msg
+        assert '203' in d.last_error[1], err_msg
+        d.unload()
+
+        d = epanet('Net1.inp', ph=False, raise_errors=True)
+        assert isinstance(d, epanet), err_msg
+        np.testing.assert_array_almost_equal(d.getNodeElevations(), [710, 710, 700, 695, 700, 695, 690, 700, 710,
+                                                                     800, 850], err_msg=err_msg)
+        try:
+            d.getNodeNameID(1000)
+            raised = False
+        except Exception as e:
+            raised = '203' in str(e)
+        assert raised, err_msg
+        assert d.last_error is None, err_msg
+        d.unload()
+
     @staticmethod
     def testStepByStepHydraulic():
         d = epanet('Net1.inp', ph=False)
@@ -3759,6 +3930,166 @@ class AnalysisTest(unittest.TestCase):
         actual_25 = comp_vals.NodeQuality[25]
         np.testing.assert_array_almost_equal(actual_25, desired_25, err_msg=err_msg)
 
+    @staticmethod
+    def test_readEpanetBinFile():
+        d = epanet('Net1.inp', ph=False)
+        computed = d.getComputedTimeSeries()
+        d.runsCompleteSimulation('net1_bin_test')
+        node_ids, link_ids = d.getNodeNameID(), d.getLinkNameID()
+        d.unload()
+        err_msg = 'Error in EpanetBinFile output'
+
+        with EpanetBinFile('net1_bin_test.bin') as out:
+            np.testing.assert_equal(out.NodeNameID, node_ids, err_msg=err_msg)
+            np.testing.assert_equal(out.LinkNameID, link_ids, err_msg=err_msg)
+            np.testing.assert_array_equal(out.Time, computed.Time, err_msg=err_msg)
+            pressure = out.NodePressure
+            assert pressure.shape == computed.Pressure.shape, err_msg
+            assert not pressure.flags.owndata, err_msg
+            np.testing.assert_array_equal(pressure, computed.Pressure, err_msg=err_msg)
+            np.testing.assert_array_equal(out.field('LinkFlow', [1, 5]), computed.Flow[:, [0, 4]],
+                                          err_msg=err_msg)
+            assert out.getEpilogInfo()['NumberReportingPeriods'] == len(computed.Time), err_msg
+            del pressure
+        for ext in ('.bin', '.txt'):
+            os.remove('net1_bin_test' + ext)
+
+    @staticmethod
+    def test_getComputedTimeSeriesLazy():
+        d = epanet('Net1.inp', ph=False)
+        computed = d.getComputedTimeSeries()
+        lazy = d.getComputedTimeSeries(lazy=True, cache_size=2)
+        d.unload()
+        err_msg = 'Error in lazy getComputedTimeSeries output'
+
+        binfile = lazy.binfile
+        assert os.path.exists(binfile), err_msg
+        np.testing.assert_array_equal(lazy.Pressure, computed.Pressure, err_msg=err_msg)
+        np.testing.assert_array_equal(lazy.select('Flow', [2, 4]), computed.Flow[:, [1, 3]], err_msg=err_msg)
+        np.testing.assert_array_equal(lazy.StatusStr, computed.StatusStr, err_msg=err_msg)
+        assert len(lazy._cache) == 2, err_msg
+        assert lazy.to_dict().keys() >= computed.to_dict().keys(), err_msg
+        lazy.close()
+        assert not os.path.exists(binfile), err_msg
+
+    @staticmethod
+    def test_SimulationSession():
+        err_msg = 'Error in SimulationSession output'
+        with SimulationSession('Net1.inp') as session:
+            assert session.junction_id[0] == '10' and session.pump_id == ['9'] and session.tank_id == ['2'], err_msg
+            first = session.solve()
+            factors = np.linspace(0.8, 1.2, len(session.junction_index))
+            assert session.set_state(demand_multipliers=factors, pump_status=[0], tank_levels=[130]) == 9, err_msg
+            assert session.set_state(demand_multipliers=factors, pump_status=[0], tank_levels=[np.nan]) == 0, err_msg
+            snapshot = session.solve()
+            assert snapshot.Flow[-1] == 0, err_msg
+            session.reset()
+            np.testing.assert_array_almost_equal(session.solve().Pressure, first.Pressure, err_msg=err_msg, decimal=3)
+            # Net1 demand pattern: 1.0 for the first two hours, then 1.2
+            assert session.set_state(time=7200, pump_speeds=[1]) == 1, err_msg
+            junctions = session.junction_index - 1
+            np.testing.assert_array_almost_equal(session.solve().Demand[junctions], first.Demand[junctions] * 1.2,
+                                                 err_msg=err_msg)
+
+        d = epanet('Net1.inp', ph=True)
+        for k, index in enumerate(d.getNodeJunctionIndex()):
+            d.setNodeBaseDemands(index, d.getNodeBaseDemands(index)[1] * factors[k])
+        d.setLinkInitialStatus(d.getLinkIndex('9'), 0)
+        d.setNodeTankInitialLevel(1, 130)
+        d.openHydraulicAnalysis()
+        d.initializeHydraulicAnalysis()
+        d.runHydraulicAnalysis()
+        np.testing.assert_array_almost_equal(d.getNodePressure(), snapshot.Pressure, err_msg=err_msg, decimal=3)
+        np.testing.assert_array_almost_equal(d.getLinkFlows(), snapshot.Flow, err_msg=err_msg, decimal=3)
+        d.closeHydraulicAnalysis()
+        d.unload()
+
+    @staticmethod
+    def test_SnapshotCache():
+        err_msg = 'Error in SnapshotCache output'
+        with tempfile.TemporaryDirectory() as spill_dir:
+            # Files the cache did not write are left alone
+            np.savez(os.path.join(spill_dir, 'data.npz'), x=np.arange(3))
+            # Room for two snapshots of Net1 in memory, the older ones are spilled
+            cache = SnapshotCache(max_bytes=1000, spill_dir=spill_dir)
+            with SimulationSession('Net1.inp', cache=cache) as session, SimulationSession('Net1.inp') as reference:
+                for factor, time in ((1, 0), (1.2, 0), (0.8, 0), (1.2, 0), (1, 0), (1, 7200)):
+                    session.set_state(demand_multipliers=factor, time=time)
+                    reference.set_state(demand_multipliers=factor, time=time)
+                    snapshot = session.solve()
+                    np.testing.assert_array_almost_equal(snapshot.Pressure, reference.solve().Pressure,
+                                                         err_msg=err_msg)
+            assert (cache.hits, cache.misses, len(cache)) == (2, 4, 2), err_msg
+            assert not snapshot.Pressure.flags.writeable, err_msg
+            assert len(os.listdir(spill_dir)) == 3, err_msg
+            assert fingerprint(np.arange(3.)) == fingerprint([0., 1., 2.]) != fingerprint(np.arange(3)), err_msg
+            cache.max_spill_bytes = 0
+            cache._trimSpill()
+            cache.clear()
+            assert len(cache) == 0 and os.listdir(spill_dir) == ['data.npz'], err_msg
+
+    @staticmethod
+    def test_ScenarioRunner():
+        d = epanet('Net1.inp', ph=True)
+        inpfile = d.InputFile
+        demands = d.getNodeBaseDemands()[1]
+        scenarios = [{'setNodeBaseDemands': (demands * 1.2,)}, {}, {'setLinkStatus': (2, 0)}]
+        expected = []
+        for scenario in scenarios:
+            for method, args in scenario.items():
+                getattr(d, method)(*args)
+            expected.append(d.getComputedHydraulicTimeSeries(True, ['time', 'pressure', 'flow']))
+            d.api.ENdeleteproject()
+            d.reloadNetwork()
+        d.unload()
+        err_msg = 'Error in ScenarioRunner output'
+
+        with ScenarioRunner(inpfile, processes=2, max_pending=1) as runner:
+            results = runner.map(scenarios * 2)
+        assert len(results) == 6, err_msg
+        for i, result in enumerate(results):
+            assert result['Pressure'].dtype == np.float32, err_msg
+            np.testing.assert_array_equal(result['Time'], expected[i % 3].Time, err_msg=err_msg)
+            np.testing.assert_allclose(result['Pressure'], expected[i % 3].Pressure, rtol=1e-5, err_msg=err_msg)
+            np.testing.assert_allclose(result['Flow'], expected[i % 3].Flow, rtol=1e-5, atol=1e-6,
+                                       err_msg=err_msg)
+
+    @staticmethod
+    def test_ScenarioRunnerAggregate():
+        err_msg = 'Error in Monte-Carlo statistics'
+        d = epanet('Net1.inp', ph=True)
+        inpfile = d.InputFile
+        step = d.getTimeHydraulicStep()
+        pressures = []
+        for seed in range(7):
+            RandomDemands(0.05, seed)(d)
+            values = d.getComputedHydraulicTimeSeries(True, ['time', 'pressure'])
+            pressures.append(values.Pressure[values.Time % step == 0])
+            d.api.ENdeleteproject()
+            d.reloadNetwork()
+        d.unload()
+        pressures = np.array(pressures)
+
+        with ScenarioRunner(inpfile, processes=2, fields=['time', 'pressure'], dtype=np.float64) as runner:
+            stats = runner.aggregate((RandomDemands(0.05, seed) for seed in range(7)), quantiles=[0.5], batch_size=3)
+        pressure = stats['Pressure']
+        assert pressure.count == 7 and pressure.shape == pressures.shape[1:], err_msg
+        np.testing.assert_allclose(pressure.mean, pressures.mean(0), rtol=1e-9, err_msg=err_msg)
+        np.testing.assert_allclose(pressure.std, pressures.std(0, ddof=1), rtol=1e-6, atol=1e-9, err_msg=err_msg)
+        np.testing.assert_array_equal(pressure.max, pressures.max(0), err_msg=err_msg)
+        assert np.all((pressure.quantile(0.5) >= pressure.min) & (pressure.quantile(0.5) <= pressure.max)), err_msg
+
+        # Streaming quantiles and merged partial statistics
+        data = np.random.default_rng(1).normal(size=(2000, 4, 3))
+        total = RunningStatistics((4, 3), quantiles=[0.1, 0.9])
+        for part in np.array_split(data, 3):
+            partial = RunningStatistics((4, 3), quantiles=[0.1, 0.9])
+            for values in part:
+                partial.update(values)
+            total.merge(partial)
+        np.testing.assert_allclose(total.variance, data.var(0, ddof=1), rtol=1e-9, err_msg=err_msg)
+        np.testing.assert_allclose(total.quantile(0.9), np.quantile(data, 0.9, axis=0), atol=0.1, err_msg=err_msg)
+
     @staticmethod
     def test_getComputedTimeSeries():
         d = epanet('Net1.inp', ph=False)
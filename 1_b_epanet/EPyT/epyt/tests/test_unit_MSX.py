@@ -1,4 +1,6 @@
 from epyt import epanet, networks
+import numpy as np
+import tempfile
 import unittest
 import os
 
@@ -278,6 +280,30 @@ class MSXtest(unittest.TestCase):
             if tleft <= 0:
                 break
 
+    def test_getMSXComputedQualityCube(self):
+        d = self.epanetClass
+        d.setTimeSimulationDuration(3600)
+        steps = []
+        cube = d.getMSXComputedQualityCube(['NH2CL', 'TOC'], callback=lambda k, t, nq, lq: steps.append(k))
+        err_msg = 'Wrong computed quality cube output'
+        self.assertEqual(cube.NodeQuality.shape, (len(cube.Time), d.getNodeCount(), 2), err_msg)
+        self.assertEqual(cube.LinkQuality.shape, (len(cube.Time), d.getLinkCount(), 2), err_msg)
+        self.assertEqual(steps, list(range(len(cube.Time))), err_msg)
+        initqual = np.array(d.getMSXNodeInitqualValue())[:, np.array(cube.SpeciesIndex) - 1]
+        np.testing.assert_array_equal(cube.NodeQuality[0], initqual, err_msg)
+
+        species = d.getMSXComputedQualitySpecie(['NH2CL', 'TOC'])
+        np.testing.assert_array_equal(np.array(species.NodeQuality), cube.NodeQuality.swapaxes(0, 1), err_msg)
+        np.testing.assert_array_equal(np.array(species.LinkQuality), cube.LinkQuality.swapaxes(0, 1), err_msg)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            store = os.path.join(tmpdir, 'cube')
+            stored = d.getMSXComputedQualityCube(['NH2CL', 'TOC'], links=False, store=store)
+            self.assertIsNone(stored.LinkQuality, err_msg)
+            np.testing.assert_array_equal(np.load(store + '_NodeQuality.npy'), cube.NodeQuality, err_msg)
+            np.testing.assert_array_equal(np.load(store + '_Time.npy'), cube.Time, err_msg)
+            del stored
+
 
 if __name__ == "__main__":
     unittest.main()
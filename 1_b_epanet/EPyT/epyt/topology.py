@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+   Sparse graph view of an EPANET network, requires scipy.
+
+   How to run:
+
+   from epyt import epanet
+
+   d = epanet('Net1.inp')
+   topo = d.getTopology()                       # cached until the network is edited
+   n, labels = topo.connected_components()
+   isolated = topo.isolated_nodes(closed_links=[10])
+   down = topo.downstream(2, flows=d.getComputedTimeSeries().Flow.mean(0))
+   distance, nodes, links = topo.shortest_path(1, 11, weights=d.getLinkLength())
+
+   Node and link indices start from 1, as in the rest of EPyT.
+"""
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+
+
+class NetworkTopology:
+    """ Incidence and adjacency matrices of a network and queries on them.
+
+    :param link_nodes: (links, 2) array of the start and end node index of every link
+    :type link_nodes: np.ndarray or list
+    :param node_count: number of nodes
+    :type node_count: int
+    :param source_nodes: indices of the reservoirs and tanks, used by isolated_nodes
+    :type source_nodes: list, optional
+    """
+
+    def __init__(self, link_nodes, node_count, source_nodes=None):
+        link_nodes = np.asarray(link_nodes, dtype=np.int64).reshape(-1, 2)
+        self.node_count = int(node_count)
+        self.link_count = len(link_nodes)
+        self.from_nodes = link_nodes[:, 0] - 1
+        self.to_nodes = link_nodes[:, 1] - 1
+        if source_nodes is None:
+            source_nodes = []
+        self.source_nodes = np.asarray(source_nodes, dtype=np.int64)
+        self._incidence = None
+        self._connectivity = None
+
+    def __repr__(self):
+        return f'NetworkTopology(nodes={self.node_count}, links={self.link_count})'
+
+    @property
+    def incidence(self):
+        """ (nodes, links) CSR matrix with -1 at the start node and +1 at the end node of each link. """
+        if self._incidence is None:
+            links = np.arange(self.link_count)
+            rows = np.concatenate([self.from_nodes, self.to_nodes])
+            data = np.concatenate([-np.ones(self.link_count, dtype=np.int8), np.ones(self.link_count, dtype=np.int8)])
+            self._incidence = sparse.csr_matrix((data, (rows, np.concatenate([links, links]))),
+                                                shape=(self.node_count, self.link_count))
+        return self._incidence
+
+    @property
+    def connectivity(self):
+        """ Symmetric (nodes, nodes) CSR matrix with the number of links between each pair of nodes. """
+        if self._connectivity is None:
+            rows = np.concatenate([self.from_nodes, self.to_nodes])
+            cols = np.concatenate([self.to_nodes, self.from_nodes])
+            data = np.ones(2 * self.link_count, dtype=int)
+            self._connectivity = sparse.csr_matrix((data, (rows, cols)), shape=(self.node_count, self.node_count))
+        return self._connectivity
+
+    def adjacency(self, flows=None, closed_links=None):
+        """ Returns the (nodes, nodes) adjacency matrix in CSR format.
+
+        Without flows the matrix is symmetric. With flows, each link points from
+        its start to its end node if its flow is positive and the other way round
+        otherwise, as in epanet.getAdjacencyMatrix.
+
+        :param flows: flow of every link, e.g. the mean computed flow
+        :type flows: np.ndarray, optional
+        :param closed_links: indices of links to leave out
+        :type closed_links: list, optional
+        :return: 0/1 adjacency matrix
+        :rtype: scipy.sparse.csr_matrix
+        """
+        keep = self._openLinks(closed_links)
+        start, end = self.from_nodes[keep], self.to_nodes[keep]
+        if flows is None:
+            rows, cols = np.concatenate([start, end]), np.concatenate([end, start])
+        else:
+            positive = np.sign(np.asarray(flows, dtype=float)[keep]) == 1
+            rows = np.where(positive, start, end)
+            cols = np.where(positive, end, start)
+        matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, cols)),
+                                   shape=(self.node_count, self.node_count))
+        # Parallel links add up, the adjacency is 0/1
+        matrix.data[:] = 1
+        return matrix
+
+    def connected_components(self, closed_links=None):
+        """ Labels the connected parts of the network.
+
+        :param closed_links: indices of links to leave out, e.g. closed valves
+        :type closed_links: list, optional
+        :return: number of components and the component label of every node
+        :rtype: tuple (int, np.ndarray)
+        """
+        return csgraph.connected_components(self.adjacency(closed_links=closed_links), directed=False)
+
+    def isolated_nodes(self, closed_links=None, sources=None):
+        """ Returns the nodes that are not connected to any source, e.g. after closing valves.
+
+        :param closed_links: indices of links to leave out
+        :type closed_links: list, optional
+        :param sources: node indices of the sources, defaults to the reservoirs and tanks
+        :type sources: list, optional
+        :return: indices of the isolated nodes
+        :rtype: np.ndarray
+        """
+        sources = self.source_nodes if sources is None else np.asarray(sources, dtype=np.int64).reshape(-1)
+        _, labels = self.connected_components(closed_links)
+        supplied = np.isin(labels, labels[sources - 1])
+        return np.flatnonzero(~supplied) + 1
+
+    def downstream(self, nodes, flows, closed_links=None):
+        """ Returns the nodes reached from the given nodes in the direction of the flow.
+
+        :param nodes: start node index or indices
+        :type nodes: int or list
+        :param flows: flow of every link
+        :type flows: np.ndarray
+        :param closed_links: indices of links to leave out
+        :type closed_links: list, optional
+        :return: indices of the downstream nodes, including the start nodes
+        :rtype: np.ndarray
+        """
+        return self._reachable(self.adjacency(flows, closed_links), nodes)
+
+    def upstream(self, nodes, flows, closed_links=None):
+        """ Returns the nodes from which the flow reaches the given nodes.
+
+        See also downstream.
+        """
+        return self._reachable(self.adjacency(flows, closed_links).T.tocsr(), nodes)
+
+    def shortest_path(self, source, target, weights=None, closed_links=None):
+        """ Returns the shortest path between two nodes.
+
+        :param source: start node index
+        :type source: int
+        :param target: end node index
+        :type target: int
+        :param weights: non-negative weight of every link, e.g. the length or the headloss,
+                        defaults to one per link
+        :type weights: np.ndarray, optional
+        :param closed_links: indices of links to leave out
+        :type closed_links: list, optional
+        :return: distance, node indices and link indices of the path (inf and empty lists if there is no path)
+        :rtype: tuple (float, list, list)
+        """
+        keep = np.flatnonzero(self._openLinks(closed_links))
+        if weights is None:
+            weights = np.ones(self.link_count)
+        weights = np.asarray(weights, dtype=float)[keep]
+        # Keep the lightest of parallel links, both directions
+        rows = np.concatenate([self.from_nodes[keep], self.to_nodes[keep]])
+        cols = np.concatenate([self.to_nodes[keep], self.from_nodes[keep]])
+        weights = np.concatenate([weights, weights])
+        links = np.concatenate([keep, keep])
+        order = np.lexsort((weights, cols, rows))
+        rows, cols, weights, links = rows[order], cols[order], weights[order], links[order]
+        first = np.ones(len(rows), dtype=bool)
+        first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+        rows, cols, weights, links = rows[first], cols[first], weights[first], links[first]
+
+        graph = sparse.csr_matrix((weights, (rows, cols)), shape=(self.node_count, self.node_count))
+        distances, predecessors = csgraph.dijkstra(graph, indices=source - 1, return_predecessors=True)
+        distance = float(distances[target - 1])
+        if np.isinf(distance):
+            return distance, [], []
+        path = [target - 1]
+        while path[-1] != source - 1:
+            path.append(predecessors[path[-1]])
+        path.reverse()
+        edge_link = sparse.csr_matrix((links + 1, (rows, cols)), shape=graph.shape)
+        path_links = [int(edge_link[a, b]) for a, b in zip(path[:-1], path[1:])]
+        return distance, [int(i) + 1 for i in path], path_links
+
+    def _openLinks(self, closed_links):
+        keep = np.ones(self.link_count, dtype=bool)
+        if closed_links is not None:
+            keep[np.asarray(closed_links, dtype=np.int64).reshape(-1) - 1] = False
+        return keep
+
+    def _reachable(self, graph, nodes):
+        # A virtual node linked to every start node gives all the reachable nodes in one traversal
+        starts = np.asarray(nodes, dtype=np.int64).reshape(-1) - 1
+        n = self.node_count
+        extra = sparse.csr_matrix((np.ones(len(starts), dtype=np.int8), (np.full(len(starts), n), starts)),
+                                  shape=(n + 1, n + 1))
+        graph = sparse.bmat([[graph, None], [None, sparse.csr_matrix((1, 1), dtype=np.int8)]]).tocsr() + extra
+        order = csgraph.breadth_first_order(graph, n, directed=True, return_predecessors=False)
+        return np.sort(order[order != n]) + 1
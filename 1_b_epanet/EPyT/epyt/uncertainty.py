@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+   Streaming statistics for Monte-Carlo studies.
+
+   How to run:
+
+   from epyt.scenarios import ScenarioRunner
+   from epyt.uncertainty import RandomDemands
+
+   scenarios = (RandomDemands(0.05, seed=i) for i in range(1000))
+   with ScenarioRunner('Net1.inp', fields=['time', 'pressure']) as runner:
+       stats = runner.aggregate(scenarios, quantiles=(0.05, 0.95))
+   pressure = stats['Pressure']
+   pressure.mean, pressure.std, pressure.min, pressure.max, pressure.quantile(0.95)
+
+   Every statistic is an array with the shape of one realization, e.g. (time, node),
+   and the memory used does not depend on the number of realizations. Partial
+   statistics computed in different processes are merged with merge().
+"""
+import numpy as np
+
+
+class P2Quantile:
+    """ P-square estimate of a quantile of every element of an array stream.
+
+    Five markers per element follow the minimum, the quantile, the maximum and the
+    points halfway between them (Jain and Chlamtac, 1985), so the memory does not
+    grow with the number of updates.
+
+    :param p: quantile to estimate, between 0 and 1
+    :type p: float
+    :param shape: shape of the arrays passed to update
+    :type shape: tuple
+    """
+
+    def __init__(self, p, shape):
+        if not 0 < p < 1:
+            raise ValueError('The quantile must be between 0 and 1.')
+        self.p = p
+        self.shape = tuple(shape)
+        self.count = 0
+        size = int(np.prod(self.shape))
+        self.heights = np.zeros((5, size))
+        self.positions = np.tile(np.arange(1., 6.)[:, None], (1, size))
+        self.increments = np.array([0, p / 2, p, (1 + p) / 2, 1])
+        self.desired = 1 + 4 * self.increments
+
+    def update(self, values):
+        """ Adds one array of values. """
+        x = np.asarray(values, dtype=np.float64).reshape(-1)
+        q, n = self.heights, self.positions
+        if self.count < 5:
+            # The first five values of every element are the initial markers
+            q[self.count] = x
+            self.count += 1
+            if self.count == 5:
+                q.sort(axis=0)
+            return
+        self.count += 1
+        np.minimum(q[0], x, out=q[0])
+        np.maximum(q[4], x, out=q[4])
+        cell = (x >= q[1]).astype(np.int64) + (x >= q[2]) + (x >= q[3])
+        n += np.arange(5)[:, None] > cell
+        self.desired += self.increments
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            up = (d >= 1) & (n[i + 1] - n[i] > 1)
+            down = (d <= -1) & (n[i - 1] - n[i] < -1)
+            cols = np.flatnonzero(up | down)
+            if not cols.size:
+                continue
+            s = np.where(up[cols], 1.0, -1.0)
+            qm, qi, qp = q[i - 1, cols], q[i, cols], q[i + 1, cols]
+            nm, ni, np_ = n[i - 1, cols], n[i, cols], n[i + 1, cols]
+            parabolic = qi + s / (np_ - nm) * ((ni - nm + s) * (qp - qi) / (np_ - ni) +
+                                               (np_ - ni - s) * (qi - qm) / (ni - nm))
+            linear = qi + s * (np.where(s > 0, qp, qm) - qi) / (np.where(s > 0, np_, nm) - ni)
+            q[i, cols] = np.where((qm < parabolic) & (parabolic < qp), parabolic, linear)
+            n[i, cols] += s
+
+    def merge(self, other):
+        """ Adds the values seen by another estimator of the same quantile and shape.
+
+        The markers are averaged with the counts as weights, which is exact for the
+        minimum and maximum and an approximation for the quantile.
+        """
+        if other.count < 5:
+            for values in other.heights[:other.count]:
+                self.update(values)
+            return self
+        if self.count < 5:
+            buffered = self.heights[:self.count].copy()
+            self.heights = other.heights.copy()
+            self.positions = other.positions.copy()
+            self.desired = other.desired.copy()
+            self.count = other.count
+            for values in buffered:
+                self.update(values)
+            return self
+        count = self.count + other.count
+        weight = other.count / count
+        q = self.heights * (1 - weight) + other.heights * weight
+        q[0] = np.minimum(self.heights[0], other.heights[0])
+        q[4] = np.maximum(self.heights[4], other.heights[4])
+        self.heights = q
+        self.count = count
+        self.desired = 1 + (count - 1) * self.increments
+        # Marker positions must stay distinct integers
+        n = np.round(self.desired)
+        for i in (1, 2, 3):
+            n[i] = max(n[i], n[i - 1] + 1)
+        for i in (3, 2, 1):
+            n[i] = min(n[i], n[i + 1] - 1)
+        self.positions[:] = n[:, None]
+        return self
+
+    @property
+    def value(self):
+        """ Current estimate of the quantile, NaN before the first update. """
+        if self.count == 0:
+            return np.full(self.shape, np.nan)
+        if self.count < 5:
+            return np.quantile(self.heights[:self.count], self.p, axis=0).reshape(self.shape)
+        return self.heights[2].reshape(self.shape)
+
+
+class RunningStatistics:
+    """ Count, mean, variance, minimum, maximum and quantiles of a stream of arrays.
+
+    The mean and variance are updated with Welford's algorithm and merged with the
+    formula of Chan et al., the quantiles are P-square estimates.
+
+    :param shape: shape of one realization, e.g. (time steps, nodes)
+    :type shape: tuple
+    :param quantiles: quantiles to estimate, between 0 and 1
+    :type quantiles: list of float, optional
+    """
+
+    def __init__(self, shape, quantiles=(0.05, 0.5, 0.95)):
+        self.shape = tuple(shape)
+        self.count = 0
+        self.mean = np.zeros(self.shape)
+        self.m2 = np.zeros(self.shape)
+        self.min = np.full(self.shape, np.inf)
+        self.max = np.full(self.shape, -np.inf)
+        self.quantiles = {q: P2Quantile(q, self.shape) for q in quantiles}
+
+    def __repr__(self):
+        return f'RunningStatistics(shape={self.shape}, count={self.count}, quantiles={list(self.quantiles)})'
+
+    def update(self, values):
+        """ Adds one realization.
+
+        :param values: array with the shape of the statistics
+        :type values: np.ndarray
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != self.shape:
+            raise ValueError(f'Expected an array of shape {self.shape}, got {values.shape}.')
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+        np.minimum(self.min, values, out=self.min)
+        np.maximum(self.max, values, out=self.max)
+        for estimator in self.quantiles.values():
+            estimator.update(values)
+        return self
+
+    def merge(self, other):
+        """ Adds the realizations of other, e.g. the statistics computed by another process.
+
+        :param other: statistics of the same shape and quantiles
+        :type other: RunningStatistics
+        :return: self
+        """
+        if other.shape != self.shape or set(other.quantiles) != set(self.quantiles):
+            raise ValueError('Only statistics of the same shape and quantiles can be merged.')
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / count)
+        self.count = count
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        for q, estimator in self.quantiles.items():
+            estimator.merge(other.quantiles[q])
+        return self
+
+    @property
+    def variance(self):
+        """ Sample variance (ddof=1), NaN before the second realization. """
+        if self.count < 2:
+            return np.full(self.shape, np.nan)
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        """ Sample standard deviation. """
+        return np.sqrt(self.variance)
+
+    def quantile(self, q):
+        """ Returns the estimate of one of the quantiles given when the statistics were created. """
+        if q not in self.quantiles:
+            raise ValueError(f'Quantile {q} is not tracked, use one of {list(self.quantiles)}.')
+        return self.quantiles[q].value
+
+
+class RandomDemands:
+    """ Scenario that scales every base demand by a uniform random factor in [1 - eta, 1 + eta].
+
+    :param eta: maximum relative change of the base demands, e.g. 0.05
+    :type eta: float
+    :param seed: seed of the random factors, the same seed gives the same demands
+    :type seed: int, optional
+    """
+
+    def __init__(self, eta, seed=None):
+        self.eta = eta
+        self.seed = seed
+
+    def __call__(self, d):
+        rng = np.random.default_rng(self.seed)
+        base_demands = np.asarray(d.getNodeBaseDemands()[1])
+        d.setNodeBaseDemands(base_demands * (1 + rng.uniform(-self.eta, self.eta, base_demands.size)))
@@ -69,5 +69,6 @@ setup(
     python_requires=">=3.8",
     package_data={f'{module_name}': data},
     install_requires=['numpy', 'matplotlib', 'pandas', 'xlsxwriter', 'setuptools'],
+    extras_require={'topology': ['scipy']},
     include_package_data=True
 )
@@ -29,6 +29,8 @@ import matplotlib.pyplot as plt
 import io
 import base64
 from epyt import epanet
+from epyt.cache import SnapshotCache
+from epyt.session import SimulationSession
 from network_visualizer import (
     plot_network_topology, 
     plot_pressure_distribution, 
@@ -51,6 +53,9 @@ simulation_state = {
     'error': None
 }
 
+# Solved snapshots of the simple simulation, a network is solved once per state and hour
+snapshot_cache = SnapshotCache(max_bytes=64 * 2 ** 20)
+
 class WebSimulationManager:
     """Manages simulations for the web interface"""
     
@@ -102,45 +107,40 @@ class WebSimulationManager:
     def _run_simple_simulation(self, network_file, duration_hours):
         """Run simple simulation and return results"""
         try:
-            d = epanet(network_file)
-            
-            # Get network info
-            network_info = {
-                'nodes': d.getNodeCount(),
-                'links': d.getLinkCount(),
-                'junctions': d.getNodeJunctionCount(),
-                'tanks': d.getNodeTankCount()
-            }
-            
-            # Initialize hydraulic analysis
-            d.openHydraulicAnalysis()
-            d.initializeHydraulicAnalysis()
-            
-            # Run simulation
-            time_step = 3600  # 1 hour
-            total_time = duration_hours * 3600
-            current_time = 0
-            results = []
-            
-            while current_time < total_time:
-                d.runHydraulicAnalysis()
+            with SimulationSession(network_file, fields=['Pressure', 'Flow'], cache=snapshot_cache) as session:
+                d = session.network
                 
-                pressures = d.getNodePressure()
-                flows = d.getLinkFlows()
+                # Get network info
+                network_info = {
+                    'nodes': d.getNodeCount(),
+                    'links': d.getLinkCount(),
+                    'junctions': d.getNodeJunctionCount(),
+                    'tanks': d.getNodeTankCount()
+                }
                 
-                results.append({
-                    'time': current_time / 3600,  # Convert to hours
-                    'avg_pressure': np.mean(pressures),
-                    'min_pressure': np.min(pressures),
-                    'max_pressure': np.max(pressures),
-                    'total_flow': np.sum(np.abs(flows))
-                })
+                # Run simulation, one snapshot per hour
+                time_step = 3600  # 1 hour
+                total_time = duration_hours * 3600
+                current_time = 0
+                results = []
                 
-                current_time += time_step
-                simulation_state['progress'] = min(100, (current_time / total_time) * 100)
-            
-            d.closeHydraulicAnalysis()
-            d.unload()
+                while current_time < total_time:
+                    session.set_state(time=current_time)
+                    snapshot = session.solve()
+                    
+                    pressures = snapshot.Pressure
+                    flows = snapshot.Flow
+                    
+                    results.append({
+                        'time': current_time / 3600,  # Convert to hours
+                        'avg_pressure': np.mean(pressures),
+                        'min_pressure': np.min(pressures),
+                        'max_pressure': np.max(pressures),
+                        'total_flow': np.sum(np.abs(flows))
+                    })
+                    
+                    current_time += time_step
+                    simulation_state['progress'] = min(100, (current_time / total_time) * 100)
             
             return {
                 'network_info': network_info,
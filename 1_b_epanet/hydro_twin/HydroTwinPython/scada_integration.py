@@ -83,15 +83,31 @@ class SCADADataSource:
         return self.data_buffer.copy()
 
 class DatabaseLogger:
-    """Database logger for simulation data"""
+    """
+    Database logger for simulation data
+    One persistent connection in WAL mode, sensor readings are buffered
+    and written with one executemany per simulation tick
+    """
     
     def __init__(self, db_file: str = "realtime_simulation.db"):
         self.db_file = db_file
+        self.conn = sqlite3.connect(self.db_file)
+        # WAL lets readers query the database while the simulation writes
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.sensor_buffer = []
+        
+        # Flush metrics
+        self.flushes = 0
+        self.rows_written = 0
+        self.flush_seconds = 0.0
+        self.last_flush_ms = 0.0
+        
         self._init_database()
     
     def _init_database(self):
         """Initialize database tables"""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.conn
         cursor = conn.cursor()
         
         # Create tables
@@ -141,24 +157,49 @@ class DatabaseLogger:
         ''')
         
         conn.commit()
-        conn.close()
     
     def log_sensor_data(self, sensor_id: str, value: float, quality: str):
-        """Log sensor data to database"""
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO sensor_data (timestamp, sensor_id, value, quality)
-            VALUES (?, ?, ?, ?)
-        ''', (datetime.now(), sensor_id, value, quality))
-        
-        conn.commit()
-        conn.close()
+        """Buffer sensor data, written to the database by flush()"""
+        self.sensor_buffer.append((datetime.now(), sensor_id, value, quality))
+    
+    def flush(self) -> int:
+        """Write the buffered sensor data in one transaction"""
+        if not self.sensor_buffer:
+            return 0
+        
+        rows, self.sensor_buffer = self.sensor_buffer, []
+        start = time.perf_counter()
+        with self.conn:
+            self.conn.executemany('''
+                INSERT INTO sensor_data (timestamp, sensor_id, value, quality)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+        elapsed = time.perf_counter() - start
+        
+        self.flushes += 1
+        self.rows_written += len(rows)
+        self.flush_seconds += elapsed
+        self.last_flush_ms = elapsed * 1000
+        return len(rows)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Flush latency and write throughput"""
+        return {
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'mean_flush_ms': round(self.flush_seconds * 1000 / self.flushes, 3) if self.flushes else 0.0,
+            'rows_per_second': round(self.rows_written / self.flush_seconds, 1) if self.flush_seconds else 0.0
+        }
+    
+    def close(self):
+        """Write the buffered sensor data and close the connection"""
+        self.flush()
+        self.conn.close()
     
     def log_simulation_results(self, results: Dict[str, Any]):
         """Log simulation results to database"""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.conn
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -175,12 +216,11 @@ class DatabaseLogger:
         ))
         
         conn.commit()
-        conn.close()
     
     def log_alert(self, sensor_id: str, alert_type: str, message: str, 
                   value: float, threshold: float):
         """Log alert to database"""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.conn
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -190,11 +230,10 @@ class DatabaseLogger:
         ''', (datetime.now(), sensor_id, alert_type, message, value, threshold))
         
         conn.commit()
-        conn.close()
     
     def log_control(self, control_type: str, action: str, target: str, reason: str):
         """Log control action to database"""
-        conn = sqlite3.connect(self.db_file)
+        conn = self.conn
         cursor = conn.cursor()
         
         cursor.execute('''
@@ -203,7 +242,6 @@ class DatabaseLogger:
         ''', (datetime.now(), control_type, action, target, reason))
         
         conn.commit()
-        conn.close()
 
 class SCADAIntegratedSimulator:
     """Real-time simulator with SCADA integration"""
@@ -275,8 +313,11 @@ class SCADAIntegratedSimulator:
                 'value': data['value']
             })
             
-            # Log to database
+            # Buffer for the database
             self.db_logger.log_sensor_data(sensor_id, data['value'], data['quality'])
+        
+        # One write for all readings of this tick
+        self.db_logger.flush()
     
     def _get_sensor_type(self, sensor_id: str) -> str:
         """Determine sensor type from ID"""
@@ -448,6 +489,7 @@ class SCADAIntegratedSimulator:
             self.d.closeHydraulicAnalysis()
             self.d.unload()
             self.scada_source.stop()
+            self.db_logger.close()
             
             elapsed_time = time.time() - start_time
             print(f"\nSimulation completed in {elapsed_time:.2f} seconds")
@@ -462,6 +504,7 @@ class SCADAIntegratedSimulator:
                 'sensors': len(self.sensors)
             },
             'performance_summary': self._calculate_summary_metrics(),
+            'database_ingestion': self.db_logger.get_stats(),
             'database_file': 'realtime_simulation.db'
         }
         
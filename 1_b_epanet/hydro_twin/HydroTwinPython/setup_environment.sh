@@ -42,7 +42,7 @@ if [ -f "requirements.txt" ]; then
     echo "✅ Dependencies installed from requirements.txt"
 else
     echo "⚠️  requirements.txt not found. Installing core dependencies manually..."
-    pip install epyt numpy matplotlib pandas scipy
+    pip install -e ../../EPyT numpy matplotlib pandas scipy
 fi
 
 # Install additional EPANET dependencies if needed
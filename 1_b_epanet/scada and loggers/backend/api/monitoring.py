@@ -7,6 +7,7 @@ from typing import Dict, Any, Optional
 from pydantic import BaseModel
 from services.baseline_engine import baseline_engine
 from services.monitoring_engine import monitoring_engine
+from services.simulation_worker import simulation_worker, SimulationCancelled
 import logging
 
 logger = logging.getLogger(__name__)
@@ -18,20 +19,28 @@ class ThresholdUpdate(BaseModel):
     pressure_deviation: Optional[float] = None
     flow_deviation: Optional[float] = None
     level_deviation: Optional[float] = None
+    z_score: Optional[float] = None
+    ewma_score: Optional[float] = None
 
 class MonitoringStartRequest(BaseModel):
     thresholds: Optional[ThresholdUpdate] = None
 
+def _establish_baseline(network, cancel) -> Dict[str, Any]:
+    return baseline_engine.establish_baseline(network, cancelled=cancel.is_set)
+
 # API endpoints
 @router.post("/baseline/establish")
 async def establish_baseline() -> Dict[str, Any]:
     """
     Establish baseline from original network design conditions
     This is the CRITICAL first step before any monitoring
+    Runs on the simulation worker, concurrent requests share one simulation
     """
     try:
-        result = baseline_engine.establish_baseline()
+        result = await simulation_worker.submit("establish_baseline", _establish_baseline)
         return result
+    except SimulationCancelled as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to establish baseline: {str(e)}")
         raise HTTPException(
@@ -39,6 +48,23 @@ async def establish_baseline() -> Dict[str, Any]:
             detail=f"Failed to establish baseline: {str(e)}"
         )
 
+@router.delete("/baseline/establish")
+async def cancel_establish_baseline() -> Dict[str, Any]:
+    """Cancel a running baseline simulation"""
+    cancelled = simulation_worker.cancel("establish_baseline")
+    return {
+        "success": cancelled,
+        "message": "Baseline simulation cancelled" if cancelled else "No baseline simulation running"
+    }
+
+@router.get("/worker/status")
+async def get_worker_status() -> Dict[str, Any]:
+    """Get the job counters of the simulation worker"""
+    return {
+        "success": True,
+        "worker": simulation_worker.get_status()
+    }
+
 @router.get("/baseline/status")
 async def get_baseline_status() -> Dict[str, Any]:
     """Get baseline establishment status"""
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends, WebSocket
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from services.scada_simulator import scada_simulator
+from services.ingestion import ingestion_pipeline
+from services.stream_hub import stream_hub
 from models.database import get_db
 from models.tables import SCADASimulatorConfig
 
@@ -30,6 +34,10 @@ async def scada_root():
             "stop": "POST /api/scada/stop",
             "status": "GET /api/scada/status",
             "latest": "GET /api/scada/latest",
+            "ingestion": "GET /api/scada/ingestion",
+            "trend": "GET /api/scada/trend/{node_id}/{sensor_type}",
+            "ws": "WebSocket /api/scada/ws",
+            "stream": "GET /api/scada/stream (Server-Sent Events)",
             "config": "POST /api/scada/config"
         },
         "timestamp": datetime.now().isoformat()
@@ -95,6 +103,97 @@ async def get_latest_scada_readings(limit: int = 100):
             detail=f"Failed to get latest readings: {str(e)}"
         )
 
+@router.get("/trend/{node_id}/{sensor_type}", response_model=Dict[str, Any])
+async def get_scada_trend(node_id: str, sensor_type: str, resolution: str = "15m", hours: float = 24):
+    """
+    Get the 1m, 15m or 1h rollups (min/max/mean/count) of one sensor.
+    """
+    try:
+        result = await scada_simulator.get_trend(node_id, sensor_type, resolution, hours)
+        return result
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get trend: {str(e)}"
+        )
+
+@router.get("/ingestion", response_model=Dict[str, Any])
+async def get_ingestion_metrics():
+    """
+    Get the flush latency and throughput of the SCADA ingestion pipeline.
+    """
+    try:
+        return {
+            "metrics": ingestion_pipeline.get_metrics(),
+            "success": True
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get ingestion metrics: {str(e)}"
+        )
+
+@router.websocket("/ws")
+async def scada_websocket(websocket: WebSocket):
+    """
+    Push stream of the SCADA readings: a snapshot on connect, then per-tick deltas and anomalies.
+    """
+    await websocket.accept()
+    queue = stream_hub.subscribe()
+
+    async def send():
+        while True:
+            await websocket.send_text(await queue.get())
+
+    async def receive():
+        # Client messages are ignored, waiting on them notices a disconnect while nothing is sent
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.ensure_future(send()), asyncio.ensure_future(receive())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Also collects the WebSocketDisconnect of a failed send
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stream_hub.unsubscribe(queue)
+
+@router.get("/stream")
+async def scada_event_stream():
+    """
+    The WebSocket push stream as Server-Sent Events, for clients without WebSocket support.
+    """
+    queue = stream_hub.subscribe()
+
+    async def events():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                    yield f"data: {message}\n\n"
+                except asyncio.TimeoutError:
+                    # Keep-alive comment, also lets a disconnected client be noticed
+                    yield ": keep-alive\n\n"
+        finally:
+            stream_hub.unsubscribe(queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache"})
+
+@router.get("/stream/status", response_model=Dict[str, Any])
+async def get_stream_status():
+    """
+    Get the subscribers and traffic of the SCADA push stream.
+    """
+    return {
+        "stream": stream_hub.get_status(),
+        "success": True
+    }
+
 @router.post("/config", response_model=Dict[str, Any])
 async def update_scada_config(config: SCADAConfig, db: Session = Depends(get_db)):
     """
@@ -2,6 +2,7 @@
 Configuration settings for the Water Network Monitoring System
 """
 import os
+from datetime import timedelta
 from pathlib import Path
 
 # Base directory
@@ -29,6 +30,19 @@ LOGS_DIR.mkdir(exist_ok=True)
 DEFAULT_SIMULATION_INTERVAL = 2  # seconds
 DEFAULT_TIME_WINDOW = 5  # seconds tolerance
 
+# Reading store retention settings
+RAW_READING_RETENTION = timedelta(days=1)
+ROLLUP_RETENTION = {
+    "1m": timedelta(days=2),
+    "15m": timedelta(days=60),
+    "1h": timedelta(days=730)
+}
+STORE_MAINTENANCE_INTERVAL = timedelta(minutes=5)
+
+# Push stream settings
+STREAM_QUANTUM = 0.01  # values are sent as integer multiples of this
+STREAM_QUEUE_SIZE = 32  # messages queued per subscriber before it is resynced
+
 # Anomaly detection settings
 DEFAULT_PRESSURE_THRESHOLD = 10.0  # percentage deviation
 DEFAULT_FLOW_THRESHOLD = 15.0  # percentage deviation
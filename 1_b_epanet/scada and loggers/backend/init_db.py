@@ -6,6 +6,7 @@ Creates all tables defined in the models
 
 from models.database import engine, Base
 from models.tables import SCADAReading, SCADASimulatorConfig, MonitoringResult, NetworkComponent
+from services.reading_store import latest_table, rollup_tables
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -12,6 +12,9 @@ from api.monitoring import router as monitoring_router
 from models.database import Base, engine, SessionLocal
 from models.tables import SCADAReading, SCADASimulatorConfig, MonitoringResult, NetworkComponent
 
+from services.ingestion import ingestion_pipeline
+from services.simulation_worker import simulation_worker
+
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
@@ -48,6 +51,12 @@ async def startup_event():
     finally:
         db.close()
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the simulation worker and write the pending SCADA readings"""
+    simulation_worker.shutdown()
+    ingestion_pipeline.shutdown()
+
 @app.get("/")
 async def root():
     """Root endpoint - basic health check"""
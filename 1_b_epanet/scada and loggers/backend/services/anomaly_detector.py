@@ -0,0 +1,216 @@
+"""
+Anomaly Detector Service
+Vectorized baseline deviation, rolling z-score and EWMA detectors
+Every sensor has a fixed position, so each tick is a few NumPy passes over aligned arrays
+"""
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Sensor types in the order of the sensor positions
+SENSOR_TYPES = ("pressure", "flow", "level")
+
+SEVERITIES = np.array(["low", "medium", "high", "critical"])
+
+
+class AnomalyDetector:
+    """
+    Keeps baseline, current values and a ring-buffer history per sensor as aligned arrays
+    Positions follow the baselines: pressures, then flows, then levels, in their dict order
+    """
+
+    def __init__(self, baselines: Dict[str, Dict[str, float]], window: int = 60, ewma_alpha: float = 0.1):
+        self.keys: List[Tuple[str, str]] = [
+            (node_id, sensor_type)
+            for sensor_type in SENSOR_TYPES
+            for node_id in baselines.get(sensor_type, {})
+        ]
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self.sensor_types = np.array([SENSOR_TYPES.index(key[1]) for key in self.keys], dtype=np.int8)
+        self.baseline = np.array([baselines[sensor_type][node_id] for node_id, sensor_type in self.keys],
+                                 dtype=float)
+        size = len(self.keys)
+
+        # Reading of every sensor in the last update, NaN if it did not report
+        self.current = np.full(size, np.nan)
+        self.units = [""] * size
+        self.timestamps: List[Optional[datetime]] = [None] * size
+        self._seen = np.full(size, -np.inf)
+
+        # Rolling window kept as running sums so a tick costs O(sensors) whatever the window
+        self.window = window
+        self._history = np.full((window, size), np.nan)
+        self._slot = np.zeros(size, dtype=np.int64)
+        self._count = np.zeros(size, dtype=np.int64)
+        self._sum = np.zeros(size)
+        self._sumsq = np.zeros(size)
+
+        # Exponentially weighted mean and variance
+        self.ewma_alpha = ewma_alpha
+        self._ewma_mean = np.full(size, np.nan)
+        self._ewma_var = np.zeros(size)
+
+        # Scores of the latest reading of every sensor
+        self.z_score = np.full(size, np.nan)
+        self.ewma_score = np.full(size, np.nan)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def set_baseline(self, baseline: np.ndarray):
+        """Replace the baseline values, e.g. with the profile of the current time of day"""
+        baseline = np.asarray(baseline, dtype=float)
+        if baseline.shape != self.baseline.shape:
+            raise ValueError(f"Expected {len(self)} baseline values, got {baseline.size}")
+        self.baseline = baseline
+
+    def update(self, readings: Dict[str, Dict[str, Any]]) -> np.ndarray:
+        """
+        Align the grouped readings {node_id: {sensor_type: reading}} with the sensor positions
+        Readings newer than the last update are scored against the history, then added to it
+        Returns the mask of the sensors that reported
+        """
+        values = np.full(len(self), np.nan)
+        seen = np.full(len(self), -np.inf)
+        for node_id, sensors in readings.items():
+            for sensor_type, reading in sensors.items():
+                i = self.positions.get((node_id, sensor_type))
+                if i is None:
+                    continue
+                values[i] = reading["value"]
+                timestamp = reading["timestamp"]
+                seen[i] = timestamp.timestamp() if isinstance(timestamp, datetime) else 0.0
+                self.units[i] = reading["unit"]
+                self.timestamps[i] = timestamp
+
+        reported = ~np.isnan(values)
+        self.current = values
+        # A reading enters the history once, analyses between ticks see the same scores
+        new = reported & (seen > self._seen)
+        self._seen[new] = seen[new]
+        if new.any():
+            self.z_score[new] = self._rolling_z_score(values, new)[new]
+            self.ewma_score[new] = self._ewma(values, new)[new]
+            self._push(values, new)
+        return reported
+
+    def _rolling_z_score(self, values: np.ndarray, new: np.ndarray) -> np.ndarray:
+        score = np.full(len(self), np.nan)
+        count = self._count.astype(float)
+        usable = new & (self._count >= 2)
+        mean = np.divide(self._sum, count, out=np.zeros(len(self)), where=count > 0)
+        var = np.divide(self._sumsq - count * mean ** 2, count - 1, out=np.zeros(len(self)), where=count > 1)
+        std = np.sqrt(np.maximum(var, 0))
+        usable &= std > 0
+        score[usable] = (values[usable] - mean[usable]) / std[usable]
+        return score
+
+    def _ewma(self, values: np.ndarray, new: np.ndarray) -> np.ndarray:
+        alpha = self.ewma_alpha
+        score = np.full(len(self), np.nan)
+        started = new & ~np.isnan(self._ewma_mean)
+        std = np.sqrt(self._ewma_var)
+        scored = started & (std > 0)
+        residual = values - self._ewma_mean
+        score[scored] = residual[scored] / std[scored]
+
+        first = new & np.isnan(self._ewma_mean)
+        self._ewma_mean[first] = values[first]
+        self._ewma_var[started] = (1 - alpha) * (self._ewma_var[started] + alpha * residual[started] ** 2)
+        self._ewma_mean[started] += alpha * residual[started]
+        return score
+
+    def _push(self, values: np.ndarray, new: np.ndarray):
+        rows = self._slot[new]
+        columns = np.flatnonzero(new)
+        old = self._history[rows, columns]
+        full = ~np.isnan(old)
+        self._sum[columns[full]] -= old[full]
+        self._sumsq[columns[full]] -= old[full] ** 2
+        self._count[columns[full]] -= 1
+
+        incoming = values[new]
+        self._history[rows, columns] = incoming
+        self._sum[columns] += incoming
+        self._sumsq[columns] += incoming ** 2
+        self._count[columns] += 1
+        self._slot[new] = (rows + 1) % self.window
+
+    def evaluate(self, thresholds: Dict[str, float]) -> Dict[str, Any]:
+        """
+        Deviation from baseline, detector scores and anomaly flags of every sensor, as arrays
+        Only sensors with a reading and a positive baseline are analyzed
+        """
+        analyzed = ~np.isnan(self.current) & (self.baseline > 0)
+        deviation = np.full(len(self), np.nan)
+        deviation[analyzed] = (self.current[analyzed] - self.baseline[analyzed]) / self.baseline[analyzed] * 100
+
+        limit = np.array([thresholds.get(f"{sensor_type}_deviation", 10.0) for sensor_type in SENSOR_TYPES])
+        threshold = limit[self.sensor_types]
+        magnitude = np.abs(deviation)
+        by_deviation = analyzed & (magnitude > threshold)
+
+        z_limit = thresholds.get("z_score", 3.0)
+        ewma_limit = thresholds.get("ewma_score", 3.0)
+        with np.errstate(invalid="ignore"):
+            by_z_score = analyzed & (np.abs(self.z_score) > z_limit)
+            by_ewma = analyzed & (np.abs(self.ewma_score) > ewma_limit)
+
+        severity = np.select([magnitude > threshold * 3, magnitude > threshold * 2, magnitude > threshold],
+                             [3, 2, 1], default=0)
+        # Statistical detections below the deviation threshold are reported as medium
+        severity[(by_z_score | by_ewma) & ~by_deviation] = 1
+
+        return {
+            "analyzed": analyzed,
+            "deviation_pct": deviation,
+            "threshold": threshold,
+            "z_score": self.z_score,
+            "ewma_score": self.ewma_score,
+            "by_deviation": by_deviation,
+            "by_z_score": by_z_score,
+            "by_ewma": by_ewma,
+            "anomalous": by_deviation | by_z_score | by_ewma,
+            "severity": severity,
+        }
+
+    def summary(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Counts and deviation statistics of an evaluation"""
+        analyzed = result["analyzed"]
+        magnitude = np.abs(result["deviation_pct"][analyzed])
+        counts = np.bincount(self.sensor_types[analyzed], minlength=len(SENSOR_TYPES))
+        return {
+            "total_analyzed": int(analyzed.sum()),
+            "pressure_deviations": int(counts[0]),
+            "flow_deviations": int(counts[1]),
+            "level_deviations": int(counts[2]),
+            "max_deviation": float(magnitude.max()) if magnitude.size else 0.0,
+            "avg_deviation": float(magnitude.mean()) if magnitude.size else 0.0,
+            "anomalous_sensors": int(result["anomalous"].sum())
+        }
+
+    def records(self, result: Dict[str, Any], mask: np.ndarray) -> List[Dict[str, Any]]:
+        """Rows of the masked sensors, for the API responses"""
+        rows = []
+        for i in np.flatnonzero(mask).tolist():
+            node_id, sensor_type = self.keys[i]
+            rows.append({
+                "node_id": node_id,
+                "sensor_type": sensor_type,
+                "current_value": float(self.current[i]),
+                "baseline_value": float(self.baseline[i]),
+                "deviation_pct": float(result["deviation_pct"][i]),
+                "z_score": self._optional(result["z_score"][i]),
+                "ewma_score": self._optional(result["ewma_score"][i]),
+                "unit": self.units[i],
+                "timestamp": self.timestamps[i]
+            })
+        return rows
+
+    @staticmethod
+    def _optional(value: float) -> Optional[float]:
+        return None if np.isnan(value) else float(value)
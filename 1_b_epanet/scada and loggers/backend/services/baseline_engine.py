@@ -4,13 +4,27 @@ Establishes baseline network conditions from original EPANET design
 This is the foundation for all monitoring and anomaly detection
 """
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Callable
 from datetime import datetime
+import numpy as np
+from config import DATA_DIR
 from services.network_state import network_state
+from services.baseline_profile import BaselineProfile, network_fingerprint
+from services.simulation_worker import SimulationCancelled
 import epyt
 
 logger = logging.getLogger(__name__)
 
+# Saved baseline profiles, one directory per network file content
+BASELINE_DIR = DATA_DIR / "baselines"
+
+# Conversions from network units to the units of the SCADA readings
+UNIT_FACTORS = {
+    'pressures': 1.42,      # meters to PSI (1 meter = 1.42 PSI)
+    'flows': 15.85,         # L/s to GPM
+    'tank_levels': 3.28     # meters to feet
+}
+
 class BaselineEngine:
     """
     Establishes baseline network conditions from original EPANET design
@@ -21,40 +35,55 @@ class BaselineEngine:
         self.baseline_data = None
         self.baseline_established = False
         self.baseline_timestamp = None
+        self.profile: Optional[BaselineProfile] = None
     
-    def establish_baseline(self) -> Dict[str, Any]:
+    def establish_baseline(self, network=None, cancelled: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
         """
         Establish baseline from original network design conditions
         This is the CRITICAL first step - must be done before any monitoring
+        A profile saved for the same network file is memory-mapped instead of re-simulated
+        network defaults to the shared network, the simulation worker passes its own handle
         """
         if not network_state.is_loaded:
             raise ValueError("No network loaded. Cannot establish baseline.")
         
         try:
-            network = network_state.current_network
+            network = network or network_state.current_network
             logger.info("Establishing baseline from original network design conditions")
             
-            # Run EPANET with ORIGINAL design conditions (from .inp file)
-            baseline_results = self._run_baseline_simulation(network)
-            
-            if not baseline_results:
-                raise Exception("Failed to establish baseline - EPANET simulation failed")
+            fingerprint = network_fingerprint(network_state.network_path)
+            directory = BASELINE_DIR / fingerprint
+            profile = BaselineProfile.load(directory)
+            if profile is None:
+                # Run EPANET with ORIGINAL design conditions (from .inp file)
+                profile = self._run_baseline_simulation(network, fingerprint, cancelled)
+                if profile is None:
+                    raise Exception("Failed to establish baseline - EPANET simulation failed")
+                profile.save(directory)
+                profile = BaselineProfile.load(directory)
+            else:
+                logger.info(f"Loaded saved baseline profile {fingerprint}")
             
             # Store baseline data
-            self.baseline_data = baseline_results
+            self.profile = profile
+            self.baseline_data = self._summarize_profile(profile)
             self.baseline_established = True
             self.baseline_timestamp = datetime.now()
             
-            logger.info(f"Baseline established successfully with {len(baseline_results['pressures'])} pressure points")
+            logger.info(f"Baseline established successfully with {len(profile.ids['pressures'])} pressure points "
+                        f"over {profile.rows} time steps")
             
             return {
                 "success": True,
                 "message": "Baseline established successfully",
-                "baseline_data": baseline_results,
+                "baseline_data": self.baseline_data,
                 "established_at": self.baseline_timestamp.isoformat(),
                 "network_file": network_state.network_path
             }
             
+        except SimulationCancelled:
+            # Reported by the simulation worker as a cancelled job, not as a failed baseline
+            raise
         except Exception as e:
             logger.error(f"Failed to establish baseline: {str(e)}")
             return {
@@ -63,130 +92,78 @@ class BaselineEngine:
                 "error": str(e)
             }
     
-    def _run_baseline_simulation(self, network) -> Optional[Dict[str, Any]]:
+    def _run_baseline_simulation(self, network, fingerprint: str,
+                                 cancelled: Optional[Callable[[], bool]] = None) -> Optional[BaselineProfile]:
         """
-        Run EPANET with ORIGINAL design conditions from .inp file
+        Run one extended-period EPANET simulation with ORIGINAL design conditions from .inp file
         This is the true baseline - not estimated demands
         """
         try:
-            # Use ORIGINAL demands from the .inp file (not estimated)
-            original_demands = network.getNodeBaseDemands()
-            
-            # Run hydraulic analysis with original conditions
-            network.openHydraulicAnalysis()
-            network.initializeHydraulicAnalysis(0)
-            
-            # Run simulation
-            t = network.runHydraulicAnalysis()
-            if t <= 0:
-                logger.warning("Baseline hydraulic analysis failed to converge")
-                network.closeHydraulicAnalysis()
-                return None
-            
-            # Extract baseline results
-            baseline_pressures = network.getNodePressure()
-            baseline_flows = network.getLinkFlows()
-            baseline_tank_levels = network.getNodeTankLevel()
-            baseline_pump_status = network.getLinkPumpState()
-            
-            network.closeHydraulicAnalysis()
-            
-            # Get network component IDs
-            junction_ids = network.getNodeJunctionNameID()
-            pump_ids = network.getLinkPumpNameID()
-            tank_ids = network.getNodeTankNameID()
-            pipe_ids = network.getLinkPipeNameID()
-            
-            return {
-                'pressures': baseline_pressures,
-                'flows': baseline_flows,
-                'tank_levels': baseline_tank_levels,
-                'pump_status': baseline_pump_status,
-                'junction_ids': junction_ids,
-                'pump_ids': pump_ids,
-                'tank_ids': tank_ids,
-                'pipe_ids': pipe_ids,
-                'original_demands': original_demands,
-                'network_info': {
-                    'total_junctions': len(junction_ids),
-                    'total_pumps': len(pump_ids),
-                    'total_tanks': len(tank_ids),
-                    'total_pipes': len(pipe_ids)
-                }
-            }
-            
+            return BaselineProfile.simulate(network, fingerprint, cancelled)
+        except SimulationCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error running baseline simulation: {str(e)}")
-            try:
-                network.closeHydraulicAnalysis()
-            except:
-                pass
             return None
     
-    def get_baseline_pressures(self) -> Dict[str, float]:
+    def _summarize_profile(self, profile: BaselineProfile) -> Dict[str, Any]:
+        """Start-time snapshot, component IDs and time axis of a profile"""
+        start = {kind: values[0].tolist() for kind, values in profile.arrays.items()}
+        return {
+            'pressures': start['pressures'],
+            'flows': start['flows'],
+            'tank_levels': start['tank_levels'],
+            'junction_ids': profile.ids['pressures'],
+            'pump_ids': profile.ids['flows'],
+            'tank_ids': profile.ids['tank_levels'],
+            'network_info': {
+                'total_junctions': len(profile.ids['pressures']),
+                'total_pumps': len(profile.ids['flows']),
+                'total_tanks': len(profile.ids['tank_levels'])
+            },
+            'profile': profile.info()
+        }
+    
+    def get_baseline_arrays(self, at: Optional[datetime] = None) -> Dict[str, Tuple[List[str], np.ndarray]]:
         """
-        Get baseline pressures for all junctions
-        Returns dict of {junction_id: pressure_value}
+        Get baseline (ids, values) of pressures, pump flows and tank levels at a time, now by default
+        Values are in PSI, GPM and feet, interpolated between the hydraulic steps of the profile
         """
-        if not self.baseline_established or not self.baseline_data:
+        if not self.baseline_established or self.profile is None:
             raise ValueError("Baseline not established. Call establish_baseline() first.")
         
-        pressures = {}
-        junction_ids = self.baseline_data['junction_ids']
-        baseline_pressures = self.baseline_data['pressures']
-        
-        for i, junction_id in enumerate(junction_ids):
-            if i < len(baseline_pressures) and baseline_pressures[i] is not None:
-                # Convert from meters to PSI (1 meter = 1.42 PSI)
-                pressure_m = baseline_pressures[i]
-                pressure_psi = pressure_m * 1.42
-                pressures[junction_id] = pressure_psi
-        
-        return pressures
+        values = self.profile.at(at)
+        return {kind: (self.profile.ids[kind], values[kind] * UNIT_FACTORS[kind]) for kind in UNIT_FACTORS}
+    
+    def get_baseline_vector(self, at: Optional[datetime] = None) -> np.ndarray:
+        """Get baseline pressures, pump flows and tank levels at a time as one array, in that order"""
+        arrays = self.get_baseline_arrays(at)
+        return np.concatenate([arrays[kind][1] for kind in UNIT_FACTORS])
+    
+    def _as_dict(self, kind: str, at: Optional[datetime]) -> Dict[str, float]:
+        ids, values = self.get_baseline_arrays(at)[kind]
+        return dict(zip(ids, values.tolist()))
+    
+    def get_baseline_pressures(self, at: Optional[datetime] = None) -> Dict[str, float]:
+        """
+        Get baseline pressures for all junctions at a time of day, now by default
+        Returns dict of {junction_id: pressure_value}
+        """
+        return self._as_dict('pressures', at)
     
-    def get_baseline_flows(self) -> Dict[str, float]:
+    def get_baseline_flows(self, at: Optional[datetime] = None) -> Dict[str, float]:
         """
-        Get baseline flows for all pumps
+        Get baseline flows for all pumps at a time of day, now by default
         Returns dict of {pump_id: flow_value}
         """
-        if not self.baseline_established or not self.baseline_data:
-            raise ValueError("Baseline not established. Call establish_baseline() first.")
-        
-        flows = {}
-        pump_ids = self.baseline_data['pump_ids']
-        baseline_flows = self.baseline_data['flows']
-        
-        for i, pump_id in enumerate(pump_ids):
-            try:
-                pump_index = network_state.current_network.getLinkPumpIndex(pump_id)
-                if pump_index is not None and pump_index < len(baseline_flows):
-                    flow_lps = baseline_flows[pump_index]  # Flow in L/s
-                    flow_gpm = flow_lps * 15.85  # Convert to GPM
-                    flows[pump_id] = flow_gpm
-            except Exception as e:
-                logger.warning(f"Could not get baseline flow for pump {pump_id}: {str(e)}")
-        
-        return flows
+        return self._as_dict('flows', at)
     
-    def get_baseline_tank_levels(self) -> Dict[str, float]:
+    def get_baseline_tank_levels(self, at: Optional[datetime] = None) -> Dict[str, float]:
         """
-        Get baseline tank levels
+        Get baseline tank levels at a time of day, now by default
         Returns dict of {tank_id: level_value}
         """
-        if not self.baseline_established or not self.baseline_data:
-            raise ValueError("Baseline not established. Call establish_baseline() first.")
-        
-        levels = {}
-        tank_ids = self.baseline_data['tank_ids']
-        baseline_levels = self.baseline_data['tank_levels']
-        
-        for i, tank_id in enumerate(tank_ids):
-            if i < len(baseline_levels) and baseline_levels[i] is not None:
-                level_m = baseline_levels[i]
-                level_ft = level_m * 3.28  # Convert to feet
-                levels[tank_id] = level_ft
-        
-        return levels
+        return self._as_dict('tank_levels', at)
     
     def get_baseline_summary(self) -> Dict[str, Any]:
         """
@@ -205,6 +182,7 @@ class BaselineEngine:
                 "baseline_established": True,
                 "established_at": self.baseline_timestamp.isoformat(),
                 "network_file": network_state.network_path,
+                "profile": self.profile.info(),
                 "summary": {
                     "total_junctions": len(pressures),
                     "total_pumps": len(flows),
@@ -241,6 +219,7 @@ class BaselineEngine:
         self.baseline_data = None
         self.baseline_established = False
         self.baseline_timestamp = None
+        self.profile = None
         logger.info("Baseline data cleared")
 
 # Global baseline engine instance
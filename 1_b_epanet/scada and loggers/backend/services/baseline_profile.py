@@ -0,0 +1,161 @@
+"""
+Baseline Profile
+Time-indexed baseline arrays from one extended-period EPANET simulation
+Stored as float32 .npy files and memory-mapped, looked up by time of day and day of week
+"""
+import hashlib
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable
+
+import numpy as np
+
+from services.simulation_worker import SimulationCancelled
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 3600
+WEEK = 7 * DAY
+
+# Arrays of a profile: (time, sensor) values in network units
+KINDS = ("pressures", "flows", "tank_levels")
+
+
+def network_fingerprint(path: str) -> str:
+    """Hash of the network file, a stored profile is reused only for the same file content"""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+class BaselineProfile:
+    """
+    Baseline pressures, pump flows and tank levels at every hydraulic step of one period
+    The period is a week when the simulation covers at least 7 days, so weekdays and
+    weekends get their own values, and a day otherwise
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], ids: Dict[str, List[str]], step: int, period: int,
+                 start_clocktime: int = 0, fingerprint: Optional[str] = None):
+        self.arrays = arrays
+        self.ids = ids
+        self.step = step
+        self.period = period
+        self.start_clocktime = start_clocktime
+        self.fingerprint = fingerprint
+        self.rows = period // step
+
+    @classmethod
+    def simulate(cls, network, fingerprint: Optional[str] = None,
+                 cancelled: Optional[Callable[[], bool]] = None) -> "BaselineProfile":
+        """
+        Run one extended-period simulation and keep the state at every hydraulic step
+        cancelled is checked between steps, SimulationCancelled stops the simulation
+        """
+        step = int(network.getTimeHydraulicStep()) or 3600
+        duration = int(network.getTimeSimulationDuration())
+        period = WEEK if duration >= WEEK else DAY
+        if duration < period:
+            # Single-period and short networks are simulated over a full day of their patterns
+            network.setTimeSimulationDuration(period)
+
+        junctions = np.asarray(network.getNodeJunctionIndex(), dtype=np.int64) - 1
+        tanks = np.asarray(network.getNodeTankIndex(), dtype=np.int64) - 1
+        pumps = np.asarray(network.getLinkPumpIndex(), dtype=np.int64) - 1
+        elevations = np.asarray(network.getNodeElevations(), dtype=float)
+
+        rows = period // step
+        arrays = {
+            "pressures": np.full((rows, len(junctions)), np.nan, dtype=np.float32),
+            "flows": np.full((rows, len(pumps)), np.nan, dtype=np.float32),
+            "tank_levels": np.full((rows, len(tanks)), np.nan, dtype=np.float32),
+        }
+        try:
+            network.openHydraulicAnalysis()
+            network.initializeHydraulicAnalysis(0)
+            while True:
+                if cancelled is not None and cancelled():
+                    raise SimulationCancelled("Baseline simulation cancelled")
+                t = int(network.runHydraulicAnalysis())
+                if t >= period:
+                    break
+                if t % step == 0:
+                    k = t // step
+                    arrays["pressures"][k] = np.asarray(network.getNodePressure())[junctions]
+                    arrays["flows"][k] = np.asarray(network.getLinkFlows())[pumps]
+                    heads = np.asarray(network.getNodeHydraulicHead())
+                    arrays["tank_levels"][k] = heads[tanks] - elevations[tanks]
+                if network.nextHydraulicAnalysisStep() <= 0:
+                    break
+        finally:
+            network.closeHydraulicAnalysis()
+            if duration < period:
+                network.setTimeSimulationDuration(duration)
+
+        # Steps the solver did not reach repeat the last solved state
+        for values in arrays.values():
+            for k in range(1, rows):
+                missing = np.isnan(values[k])
+                values[k, missing] = values[k - 1, missing]
+
+        ids = {
+            "pressures": list(network.getNodeJunctionNameID()),
+            "flows": list(network.getLinkPumpNameID()) if len(pumps) else [],
+            "tank_levels": list(network.getNodeTankNameID()) if len(tanks) else [],
+        }
+        return cls(arrays, ids, step, period, int(network.getTimeStartTime()), fingerprint)
+
+    def save(self, directory: Path):
+        """Write one .npy file per array and the ids and times as JSON"""
+        directory.mkdir(parents=True, exist_ok=True)
+        for kind in KINDS:
+            np.save(directory / f"{kind}.npy", np.ascontiguousarray(self.arrays[kind], dtype=np.float32))
+        meta = {
+            "ids": self.ids,
+            "step": self.step,
+            "period": self.period,
+            "start_clocktime": self.start_clocktime,
+            "fingerprint": self.fingerprint,
+            "created_at": datetime.now().isoformat()
+        }
+        (directory / "meta.json").write_text(json.dumps(meta))
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["BaselineProfile"]:
+        """Memory-map a saved profile, None if there is none"""
+        meta_file = directory / "meta.json"
+        if not meta_file.exists():
+            return None
+        meta = json.loads(meta_file.read_text())
+        arrays = {kind: np.load(directory / f"{kind}.npy", mmap_mode="r") for kind in KINDS}
+        return cls(arrays, meta["ids"], meta["step"], meta["period"], meta["start_clocktime"], meta["fingerprint"])
+
+    def offset(self, when: datetime) -> float:
+        """Seconds into the profile period of a wall-clock time"""
+        seconds = when.hour * 3600 + when.minute * 60 + when.second + when.microsecond / 1e6
+        if self.period == WEEK:
+            # Day 0 of the simulation is a Monday
+            seconds += when.weekday() * DAY
+        return (seconds - self.start_clocktime) % self.period
+
+    def at(self, when: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+        """Baseline arrays at a wall-clock time, linearly interpolated between steps"""
+        position = self.offset(when or datetime.now()) / self.step
+        k = int(position) % self.rows
+        weight = position - int(position)
+        following = (k + 1) % self.rows
+        return {
+            kind: (1 - weight) * values[k].astype(float) + weight * values[following].astype(float)
+            for kind, values in self.arrays.items()
+        }
+
+    def info(self) -> Dict[str, Any]:
+        """Size and time axis of the profile"""
+        return {
+            "period_hours": self.period / 3600,
+            "step_seconds": self.step,
+            "steps": self.rows,
+            "sensors": {kind: len(self.ids[kind]) for kind in KINDS},
+            "fingerprint": self.fingerprint
+        }
@@ -0,0 +1,188 @@
+"""
+SCADA Ingestion Pipeline
+Buffers sensor readings in columns and writes each tick with one bulk insert
+The latest values and rollups of the reading store are updated in the same transaction
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import insert
+
+from models.database import engine
+from models.tables import SCADAReading
+from services.reading_store import reading_store
+
+logger = logging.getLogger(__name__)
+
+
+class ReadingBuffer:
+    """Column buffers of the readings of one tick"""
+
+    COLUMNS = ("node_id", "sensor_type", "value", "unit", "quality")
+
+    def __init__(self):
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self.node_id)
+
+    def clear(self):
+        """Drop all buffered readings"""
+        self.node_id = []
+        self.sensor_type = []
+        self.value = []
+        self.unit = []
+        self.quality = []
+
+    def add(self, node_id: str, sensor_type: str, value: float, unit: str, quality: str = "good"):
+        """Buffer a single reading"""
+        self.node_id.append(node_id)
+        self.sensor_type.append(sensor_type)
+        self.value.append(float(value))
+        self.unit.append(unit)
+        self.quality.append(quality)
+
+    def extend(self, node_ids: Sequence[str], sensor_type: str, values, unit: str, quality: str = "good"):
+        """Buffer the readings of one sensor type, values is an array aligned with node_ids"""
+        values = np.asarray(values, dtype=float).ravel()
+        if len(node_ids) != len(values):
+            raise ValueError(f"Got {len(values)} values for {len(node_ids)} sensors")
+        count = len(values)
+        self.node_id.extend(node_ids)
+        self.sensor_type.extend([sensor_type] * count)
+        self.value.extend(values.tolist())
+        self.unit.extend([unit] * count)
+        self.quality.extend([quality] * count)
+
+    def rows(self, timestamp: datetime):
+        """Readings as insert parameters, all stamped with the tick time"""
+        return [
+            {"node_id": node_id, "sensor_type": sensor_type, "value": value, "unit": unit,
+             "quality": quality, "timestamp": timestamp}
+            for node_id, sensor_type, value, unit, quality in
+            zip(self.node_id, self.sensor_type, self.value, self.unit, self.quality)
+        ]
+
+
+class IngestionPipeline:
+    """
+    Writes buffered SCADA readings with executemany bulk inserts
+    One persistent connection, one transaction per flush, SQLite in WAL mode
+    """
+
+    def __init__(self, bind=engine, table=SCADAReading.__table__):
+        self._engine = bind
+        self._table = table
+        self._connection = None
+        # The connection is only used from this thread, so flushes do not block the event loop
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="scada-ingest")
+        self.buffer = ReadingBuffer()
+        self._flushes = 0
+        self._rows = 0
+        self._errors = 0
+        self._flush_seconds = 0.0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._last_flush_at: Optional[datetime] = None
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = self._engine.connect()
+            if self._engine.dialect.name == "sqlite":
+                # WAL lets the API read while the simulator writes, NORMAL syncs once per checkpoint
+                self._connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+                self._connection.exec_driver_sql("PRAGMA synchronous=NORMAL")
+            reading_store.prepare(self._connection)
+            self._connection.commit()
+        return self._connection
+
+    def flush(self, timestamp: Optional[datetime] = None) -> int:
+        """
+        Insert all buffered readings and update the reading store in one transaction
+        Returns the number of rows written, the batch is dropped if the insert fails
+        """
+        buffer, self.buffer = self.buffer, ReadingBuffer()
+        return self._write(buffer, timestamp)
+
+    async def flush_async(self, timestamp: Optional[datetime] = None) -> int:
+        """Hand the buffered readings to the ingestion thread and await the write"""
+        buffer, self.buffer = self.buffer, ReadingBuffer()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._write, buffer, timestamp)
+
+    def _write(self, buffer: ReadingBuffer, timestamp: Optional[datetime]) -> int:
+        if not len(buffer):
+            return 0
+        timestamp = timestamp or datetime.now()
+        rows = buffer.rows(timestamp)
+
+        start = time.perf_counter()
+        try:
+            connection = self._connect()
+            with connection.begin():
+                connection.execute(insert(self._table), rows)
+                reading_store.write(connection, rows)
+        except Exception as e:
+            self._errors += 1
+            logger.error(f"Failed to write {len(rows)} SCADA readings: {str(e)}")
+            self.close()
+            return 0
+        elapsed = time.perf_counter() - start
+
+        self._flushes += 1
+        self._rows += len(rows)
+        self._flush_seconds += elapsed
+        self._last_flush_ms = elapsed * 1000
+        self._max_flush_ms = max(self._max_flush_ms, self._last_flush_ms)
+        self._last_flush_at = datetime.now()
+        logger.debug(f"Wrote {len(rows)} SCADA readings in {self._last_flush_ms:.1f} ms")
+        self._maintain(connection, timestamp)
+        return len(rows)
+
+    def _maintain(self, connection, timestamp: datetime):
+        # Retention is due once per interval, the flush it follows is already committed
+        try:
+            with connection.begin():
+                reading_store.maintain(connection, timestamp)
+        except Exception as e:
+            logger.error(f"Reading store retention failed: {str(e)}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Flush latency and throughput since startup"""
+        return {
+            "flushes": self._flushes,
+            "rows_written": self._rows,
+            "failed_flushes": self._errors,
+            "buffered_rows": len(self.buffer),
+            "last_flush_ms": round(self._last_flush_ms, 3),
+            "mean_flush_ms": round(self._flush_seconds * 1000 / self._flushes, 3) if self._flushes else 0.0,
+            "max_flush_ms": round(self._max_flush_ms, 3),
+            "rows_per_second": round(self._rows / self._flush_seconds, 1) if self._flush_seconds else 0.0,
+            "last_flush_at": self._last_flush_at.isoformat() if self._last_flush_at else None
+        }
+
+    def close(self):
+        """Close the persistent connection, the next flush opens a new one"""
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    async def close_async(self):
+        """Close the connection on the ingestion thread, after the pending writes"""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.close)
+
+    def shutdown(self):
+        """Wait for the pending writes and close the connection"""
+        self._executor.shutdown(wait=True)
+        self.close()
+
+
+# Global ingestion pipeline
+ingestion_pipeline = IngestionPipeline()
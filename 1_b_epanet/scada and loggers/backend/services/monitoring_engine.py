@@ -4,13 +4,16 @@ Compares current SCADA readings vs baseline to detect drifts and anomalies
 This is the core value-add component of the system
 """
 import logging
+import numpy as np
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from models.database import SessionLocal
-from models.tables import SCADAReading
+from services.reading_store import reading_store
 from services.baseline_engine import baseline_engine
 from services.network_state import network_state
+from services.anomaly_detector import AnomalyDetector, SEVERITIES
+from services.stream_hub import stream_hub
 
 logger = logging.getLogger(__name__)
 
@@ -25,9 +28,15 @@ class MonitoringEngine:
         self.anomaly_thresholds = {
             'pressure_deviation': 10.0,  # 10% deviation from baseline
             'flow_deviation': 15.0,      # 15% deviation from baseline
-            'level_deviation': 20.0      # 20% deviation from baseline
+            'level_deviation': 20.0,     # 20% deviation from baseline
+            'z_score': 4.0,              # standard deviations from the rolling mean
+            'ewma_score': 4.0            # standard deviations from the EWMA
         }
         self.recent_anomalies = []
+        self.history_window = 60         # readings in the rolling z-score window
+        self.ewma_alpha = 0.1
+        self._detector: Optional[AnomalyDetector] = None
+        self._detector_baseline_at = None
     
     def start_monitoring(self) -> Dict[str, Any]:
         """Start the monitoring engine"""
@@ -95,7 +104,7 @@ class MonitoringEngine:
             baseline_levels = baseline_engine.get_baseline_tank_levels()
             
             # Analyze deviations
-            analysis_results = self._analyze_deviations(
+            analysis_results, evaluation = self._analyze_deviations(
                 current_readings,
                 baseline_pressures,
                 baseline_flows,
@@ -103,10 +112,11 @@ class MonitoringEngine:
             )
             
             # Detect anomalies
-            anomalies = self._detect_anomalies(analysis_results)
+            anomalies = self._detect_anomalies(evaluation)
             
             # Store analysis results
             self._store_analysis_results(analysis_results, anomalies)
+            stream_hub.publish_anomalies(anomalies)
             
             return {
                 "success": True,
@@ -130,26 +140,9 @@ class MonitoringEngine:
         """Get latest SCADA readings from database"""
         db = SessionLocal()
         try:
-            # Get readings from last 5 minutes
+            # Latest value of every sensor that reported in the last 5 minutes
             cutoff_time = datetime.now() - timedelta(minutes=5)
-            readings = db.query(SCADAReading).filter(
-                SCADAReading.timestamp >= cutoff_time
-            ).order_by(SCADAReading.timestamp.desc()).all()
-            
-            # Group by node and sensor type
-            grouped_readings = {}
-            for reading in readings:
-                node_id = reading.node_id
-                if node_id not in grouped_readings:
-                    grouped_readings[node_id] = {}
-                grouped_readings[node_id][reading.sensor_type] = {
-                    "value": reading.value,
-                    "unit": reading.unit,
-                    "timestamp": reading.timestamp,
-                    "quality": reading.quality
-                }
-            
-            return grouped_readings
+            return reading_store.get_latest(db.connection(), since=cutoff_time)
             
         except Exception as e:
             logger.error(f"Error getting SCADA readings: {str(e)}")
@@ -157,142 +150,52 @@ class MonitoringEngine:
         finally:
             db.close()
     
+    def _get_detector(self, baseline_pressures: Dict, baseline_flows: Dict, baseline_levels: Dict) -> AnomalyDetector:
+        """Detector aligned with the current baseline, rebuilt when the baseline is established again"""
+        if self._detector is None or self._detector_baseline_at != baseline_engine.baseline_timestamp:
+            self._detector = AnomalyDetector({
+                'pressure': baseline_pressures,
+                'flow': baseline_flows,
+                'level': baseline_levels
+            }, window=self.history_window, ewma_alpha=self.ewma_alpha)
+            self._detector_baseline_at = baseline_engine.baseline_timestamp
+            logger.info(f"Anomaly detector aligned with {len(self._detector)} baseline sensors")
+        return self._detector
+    
     def _analyze_deviations(self, current_readings: Dict, baseline_pressures: Dict, 
-                          baseline_flows: Dict, baseline_levels: Dict) -> Dict[str, Any]:
-        """Analyze deviations between current readings and baseline"""
-        deviations = []
-        analysis_summary = {
-            'total_analyzed': 0,
-            'pressure_deviations': 0,
-            'flow_deviations': 0,
-            'level_deviations': 0,
-            'max_deviation': 0.0,
-            'avg_deviation': 0.0
-        }
-        
-        total_deviation = 0.0
-        deviation_count = 0
-        
-        # Analyze pressure deviations
-        for node_id, readings in current_readings.items():
-            if 'pressure' in readings and node_id in baseline_pressures:
-                current_pressure = readings['pressure']['value']
-                baseline_pressure = baseline_pressures[node_id]
-                
-                if baseline_pressure > 0:  # Avoid division by zero
-                    deviation_pct = ((current_pressure - baseline_pressure) / baseline_pressure) * 100
-                    
-                    deviations.append({
-                        'node_id': node_id,
-                        'sensor_type': 'pressure',
-                        'current_value': current_pressure,
-                        'baseline_value': baseline_pressure,
-                        'deviation_pct': deviation_pct,
-                        'unit': readings['pressure']['unit'],
-                        'timestamp': readings['pressure']['timestamp']
-                    })
-                    
-                    total_deviation += abs(deviation_pct)
-                    deviation_count += 1
-                    analysis_summary['pressure_deviations'] += 1
-        
-        # Analyze flow deviations
-        for node_id, readings in current_readings.items():
-            if 'flow' in readings and node_id in baseline_flows:
-                current_flow = readings['flow']['value']
-                baseline_flow = baseline_flows[node_id]
-                
-                if baseline_flow > 0:  # Avoid division by zero
-                    deviation_pct = ((current_flow - baseline_flow) / baseline_flow) * 100
-                    
-                    deviations.append({
-                        'node_id': node_id,
-                        'sensor_type': 'flow',
-                        'current_value': current_flow,
-                        'baseline_value': baseline_flow,
-                        'deviation_pct': deviation_pct,
-                        'unit': readings['flow']['unit'],
-                        'timestamp': readings['flow']['timestamp']
-                    })
-                    
-                    total_deviation += abs(deviation_pct)
-                    deviation_count += 1
-                    analysis_summary['flow_deviations'] += 1
-        
-        # Analyze level deviations
-        for node_id, readings in current_readings.items():
-            if 'level' in readings and node_id in baseline_levels:
-                current_level = readings['level']['value']
-                baseline_level = baseline_levels[node_id]
-                
-                if baseline_level > 0:  # Avoid division by zero
-                    deviation_pct = ((current_level - baseline_level) / baseline_level) * 100
-                    
-                    deviations.append({
-                        'node_id': node_id,
-                        'sensor_type': 'level',
-                        'current_value': current_level,
-                        'baseline_value': baseline_level,
-                        'deviation_pct': deviation_pct,
-                        'unit': readings['level']['unit'],
-                        'timestamp': readings['level']['timestamp']
-                    })
-                    
-                    total_deviation += abs(deviation_pct)
-                    deviation_count += 1
-                    analysis_summary['level_deviations'] += 1
-        
-        # Calculate summary statistics
-        analysis_summary['total_analyzed'] = len(deviations)
-        analysis_summary['max_deviation'] = max([abs(d['deviation_pct']) for d in deviations]) if deviations else 0.0
-        analysis_summary['avg_deviation'] = total_deviation / deviation_count if deviation_count > 0 else 0.0
+                          baseline_flows: Dict, baseline_levels: Dict) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        Analyze deviations between current readings and baseline
+        Returns the analysis results and the detector evaluation the anomalies are detected from
+        """
+        detector = self._get_detector(baseline_pressures, baseline_flows, baseline_levels)
+        # Baseline of the current time of day from the profile, same sensor order as the detector
+        detector.set_baseline(baseline_engine.get_baseline_vector())
+        detector.update(current_readings)
+        result = detector.evaluate(self.anomaly_thresholds)
         
-        return {
-            'deviations': deviations,
-            'summary': analysis_summary,
+        analysis_results = {
+            'deviations': detector.records(result, result['analyzed']),
+            'summary': detector.summary(result),
             'analysis_timestamp': datetime.now().isoformat()
         }
+        return analysis_results, result
     
-    def _detect_anomalies(self, analysis_results: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Detect anomalies based on deviation thresholds"""
-        anomalies = []
-        deviations = analysis_results['deviations']
+    def _detect_anomalies(self, result: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Detect anomalies of a detector evaluation: deviation thresholds, rolling z-scores and EWMA scores"""
+        anomalous = result['anomalous']
+        anomalies = self._detector.records(result, anomalous)
         
-        for deviation in deviations:
-            sensor_type = deviation['sensor_type']
-            deviation_pct = abs(deviation['deviation_pct'])
-            
-            # Check against thresholds
-            threshold = self.anomaly_thresholds.get(f'{sensor_type}_deviation', 10.0)
-            
-            if deviation_pct > threshold:
-                anomaly = {
-                    'node_id': deviation['node_id'],
-                    'sensor_type': sensor_type,
-                    'deviation_pct': deviation['deviation_pct'],
-                    'threshold': threshold,
-                    'severity': self._calculate_severity(deviation_pct, threshold),
-                    'current_value': deviation['current_value'],
-                    'baseline_value': deviation['baseline_value'],
-                    'unit': deviation['unit'],
-                    'timestamp': deviation['timestamp'],
-                    'detected_at': datetime.now().isoformat()
-                }
-                anomalies.append(anomaly)
+        detected_at = datetime.now().isoformat()
+        detectors = np.column_stack([result['by_deviation'], result['by_z_score'], result['by_ewma']])[anomalous]
+        for anomaly, i, flags in zip(anomalies, np.flatnonzero(anomalous).tolist(), detectors.tolist()):
+            anomaly['threshold'] = float(result['threshold'][i])
+            anomaly['severity'] = str(SEVERITIES[result['severity'][i]])
+            anomaly['detectors'] = [name for name, flag in zip(('deviation', 'z_score', 'ewma'), flags) if flag]
+            anomaly['detected_at'] = detected_at
         
         return anomalies
     
-    def _calculate_severity(self, deviation_pct: float, threshold: float) -> str:
-        """Calculate anomaly severity"""
-        if deviation_pct > threshold * 3:
-            return 'critical'
-        elif deviation_pct > threshold * 2:
-            return 'high'
-        elif deviation_pct > threshold:
-            return 'medium'
-        else:
-            return 'low'
-    
     def _store_analysis_results(self, analysis_results: Dict[str, Any], anomalies: List[Dict[str, Any]]):
         """Store analysis results in database"""
         # This would store results in a monitoring_results table
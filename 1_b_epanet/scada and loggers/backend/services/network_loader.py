@@ -8,6 +8,8 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 from services.network_state import network_state
+from services.simulation_worker import simulation_worker
+from services.stream_hub import stream_hub
 
 class NetworkLoader:
     """
@@ -32,8 +34,10 @@ class NetworkLoader:
             # Load network with EPyT
             network = epyt.epanet(file_path)
             
-            # Update global state
+            # Update global state, the simulation worker loads its own handle on its next job
             network_state.set_network(network, file_path)
+            simulation_worker.reset()
+            stream_hub.reset()
             
             # Update local state for backward compatibility
             self.current_network = network
@@ -207,3 +211,5 @@ class NetworkLoader:
         """
         self.current_network = None
         self.network_file_path = None
+        simulation_worker.reset()
+        stream_hub.reset()
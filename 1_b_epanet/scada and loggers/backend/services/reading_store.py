@@ -0,0 +1,209 @@
+"""
+SCADA Reading Store
+Latest value per sensor and 1-min/15-min/1-hour rollups, maintained on ingest
+Reads of the current state and of trends do not grow with the reading history
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+from sqlalchemy import (Table, Column, String, Float, Integer, DateTime, Index,
+                        select, delete, func)
+from sqlalchemy.dialects import postgresql, sqlite
+
+from config import RAW_READING_RETENTION, ROLLUP_RETENTION, STORE_MAINTENANCE_INTERVAL
+from models.database import Base
+from models.tables import SCADAReading
+
+logger = logging.getLogger(__name__)
+
+# Bucket size of every rollup resolution
+RESOLUTIONS = {
+    "1m": timedelta(minutes=1),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+}
+
+# Composite index of the raw readings, used by per-sensor history queries
+reading_index = Index("ix_scada_readings_node_sensor_time",
+                      SCADAReading.node_id, SCADAReading.sensor_type, SCADAReading.timestamp)
+# Time index of the raw readings, the retention delete filters on the time alone
+retention_index = Index("ix_scada_readings_time", SCADAReading.timestamp)
+
+latest_table = Table(
+    "scada_latest", Base.metadata,
+    Column("node_id", String, primary_key=True),
+    Column("sensor_type", String, primary_key=True),
+    Column("value", Float),
+    Column("unit", String),
+    Column("quality", String),
+    Column("timestamp", DateTime, index=True),
+)
+
+
+def _rollup_table(resolution: str) -> Table:
+    return Table(
+        f"scada_rollup_{resolution}", Base.metadata,
+        Column("node_id", String, primary_key=True),
+        Column("sensor_type", String, primary_key=True),
+        Column("bucket", DateTime, primary_key=True),
+        Column("min", Float),
+        Column("max", Float),
+        Column("sum", Float),
+        Column("count", Integer),
+        Column("unit", String),
+        Index(f"ix_scada_rollup_{resolution}_bucket", "bucket"),
+    )
+
+
+rollup_tables = {resolution: _rollup_table(resolution) for resolution in RESOLUTIONS}
+
+
+def bucket_start(timestamp: datetime, step: timedelta) -> datetime:
+    """Start of the rollup bucket that contains timestamp"""
+    return datetime.min + ((timestamp - datetime.min) // step) * step
+
+
+class ReadingStore:
+    """Maintains the latest value and rollup tables from the ingested readings"""
+
+    def __init__(self):
+        self._last_maintenance: Optional[datetime] = None
+
+    @staticmethod
+    def _dialect(connection):
+        name = connection.dialect.name
+        if name == "sqlite":
+            return sqlite, func.min, func.max
+        if name == "postgresql":
+            return postgresql, func.least, func.greatest
+        raise ValueError(f"Upserts are not supported for the {name} dialect")
+
+    def prepare(self, connection):
+        """Create the store tables and the reading indexes if they do not exist"""
+        for table in [latest_table, *rollup_tables.values()]:
+            table.create(connection, checkfirst=True)
+        reading_index.create(connection, checkfirst=True)
+        retention_index.create(connection, checkfirst=True)
+
+    def write(self, connection, rows: List[Dict[str, Any]]):
+        """
+        Update the latest values and the rollups with the rows of one flush
+        Runs inside the transaction that inserts the raw rows
+        """
+        if not rows:
+            return
+        dialect, least, greatest = self._dialect(connection)
+
+        # Latest value per sensor, the rows of a flush are in time order
+        latest = {}
+        for row in rows:
+            latest[(row["node_id"], row["sensor_type"])] = row
+        stmt = dialect.insert(latest_table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["node_id", "sensor_type"],
+            set_={name: stmt.excluded[name] for name in ("value", "unit", "quality", "timestamp")},
+            where=latest_table.c.timestamp <= stmt.excluded.timestamp,
+        )
+        connection.execute(stmt, list(latest.values()))
+
+        for resolution, step in RESOLUTIONS.items():
+            table = rollup_tables[resolution]
+            buckets = {}
+            for row in rows:
+                key = (row["node_id"], row["sensor_type"], bucket_start(row["timestamp"], step))
+                value = row["value"]
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = {"node_id": key[0], "sensor_type": key[1], "bucket": key[2], "min": value,
+                                    "max": value, "sum": value, "count": 1, "unit": row["unit"]}
+                else:
+                    bucket["min"] = min(bucket["min"], value)
+                    bucket["max"] = max(bucket["max"], value)
+                    bucket["sum"] += value
+                    bucket["count"] += 1
+            stmt = dialect.insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["node_id", "sensor_type", "bucket"],
+                set_={
+                    "min": least(table.c.min, stmt.excluded.min),
+                    "max": greatest(table.c.max, stmt.excluded.max),
+                    "sum": table.c.sum + stmt.excluded.sum,
+                    "count": table.c.count + stmt.excluded.count,
+                    "unit": stmt.excluded.unit,
+                },
+            )
+            connection.execute(stmt, list(buckets.values()))
+
+    def maintain(self, connection, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Delete raw readings and rollup buckets older than their retention
+        Runs at most once per STORE_MAINTENANCE_INTERVAL in its own transaction, after a flush,
+        returns the deleted rows per table
+        """
+        now = now or datetime.now()
+        if self._last_maintenance and now - self._last_maintenance < STORE_MAINTENANCE_INTERVAL:
+            return {}
+        self._last_maintenance = now
+
+        deleted = {}
+        reading_table = SCADAReading.__table__
+        result = connection.execute(
+            delete(reading_table).where(reading_table.c.timestamp < now - RAW_READING_RETENTION))
+        deleted[reading_table.name] = result.rowcount
+        for resolution, table in rollup_tables.items():
+            result = connection.execute(delete(table).where(table.c.bucket < now - ROLLUP_RETENTION[resolution]))
+            deleted[table.name] = result.rowcount
+        if any(deleted.values()):
+            logger.info(f"Reading store retention removed {deleted}")
+        return deleted
+
+    def get_latest(self, connection, since: Optional[datetime] = None,
+                   limit: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Latest reading of every sensor, grouped by node and sensor type
+        since skips sensors without a reading after that time, limit keeps the most recent sensors
+        """
+        query = select(latest_table).order_by(latest_table.c.timestamp.desc())
+        if since is not None:
+            query = query.where(latest_table.c.timestamp >= since)
+        if limit is not None:
+            query = query.limit(limit)
+
+        grouped_readings = {}
+        for row in connection.execute(query):
+            grouped_readings.setdefault(row.node_id, {})[row.sensor_type] = {
+                "value": row.value,
+                "unit": row.unit,
+                "timestamp": row.timestamp,
+                "quality": row.quality
+            }
+        return grouped_readings
+
+    def get_rollups(self, connection, node_id: str, sensor_type: str, resolution: str = "1m",
+                    start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Min/max/mean/count of one sensor per bucket, oldest first"""
+        if resolution not in rollup_tables:
+            raise ValueError(f"Unknown resolution '{resolution}', use one of {list(rollup_tables)}")
+        table = rollup_tables[resolution]
+        query = select(table).where(table.c.node_id == node_id, table.c.sensor_type == sensor_type)
+        if start is not None:
+            query = query.where(table.c.bucket >= bucket_start(start, RESOLUTIONS[resolution]))
+        if end is not None:
+            query = query.where(table.c.bucket <= end)
+        query = query.order_by(table.c.bucket)
+        return [
+            {
+                "bucket": row.bucket.isoformat(),
+                "min": row.min,
+                "max": row.max,
+                "mean": row.sum / row.count if row.count else None,
+                "count": row.count,
+                "unit": row.unit
+            }
+            for row in connection.execute(query)
+        ]
+
+
+# Global reading store
+reading_store = ReadingStore()
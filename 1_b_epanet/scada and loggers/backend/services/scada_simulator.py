@@ -3,6 +3,7 @@ import random
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
+import numpy as np
 from sqlalchemy.orm import Session
 from models.database import SessionLocal
 from models.tables import SCADAReading, SCADASimulatorConfig, NetworkComponent
@@ -10,6 +11,9 @@ from services.network_loader import NetworkLoader
 from services.network_state import network_state
 from services.demand_forecaster import DemandForecaster
 from services.baseline_engine import baseline_engine
+from services.ingestion import ingestion_pipeline, ReadingBuffer
+from services.stream_hub import stream_hub
+from services.reading_store import reading_store
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,6 +28,7 @@ class SCADASimulator:
         # Use the global singleton instance
         self._network_loader = NetworkLoader()
         self._demand_forecaster = DemandForecaster()
+        self._rng = np.random.default_rng()
         
     @property
     def is_running(self) -> bool:
@@ -103,6 +108,7 @@ class SCADASimulator:
                     await self._task
                 except asyncio.CancelledError:
                     pass
+            await ingestion_pipeline.close_async()
             
             # Update database
             db = SessionLocal()
@@ -142,6 +148,7 @@ class SCADASimulator:
                     "level_variation": config.level_variation,
                     "fault_injection": config.fault_injection
                 },
+                "ingestion": ingestion_pipeline.get_metrics(),
                 "success": True
             }
         except Exception as e:
@@ -151,27 +158,20 @@ class SCADASimulator:
             db.close()
     
     async def get_latest_readings(self, limit: int = 100) -> Dict[str, Any]:
-        """Get latest SCADA readings"""
+        """Get the latest reading of the most recently updated sensors"""
         db = SessionLocal()
         try:
-            readings = db.query(SCADAReading).order_by(SCADAReading.timestamp.desc()).limit(limit).all()
-            
-            # Group readings by node and sensor type
-            grouped_readings = {}
-            for reading in readings:
-                node_id = reading.node_id
-                if node_id not in grouped_readings:
-                    grouped_readings[node_id] = {}
-                grouped_readings[node_id][reading.sensor_type] = {
-                    "value": reading.value,
-                    "unit": reading.unit,
-                    "timestamp": reading.timestamp.isoformat(),
-                    "quality": reading.quality
-                }
+            # One row per (node, sensor type) in the latest value table
+            grouped_readings = reading_store.get_latest(db.connection(), limit=limit)
+            count = 0
+            for sensors in grouped_readings.values():
+                for reading in sensors.values():
+                    reading["timestamp"] = reading["timestamp"].isoformat()
+                    count += 1
             
             return {
                 "readings": grouped_readings,
-                "count": len(readings),
+                "count": count,
                 "success": True
             }
         except Exception as e:
@@ -180,6 +180,27 @@ class SCADASimulator:
         finally:
             db.close()
     
+    async def get_trend(self, node_id: str, sensor_type: str, resolution: str = "15m",
+                        hours: float = 24) -> Dict[str, Any]:
+        """Get min/max/mean/count of one sensor per rollup bucket over the last hours"""
+        db = SessionLocal()
+        try:
+            start = datetime.now() - timedelta(hours=hours)
+            buckets = reading_store.get_rollups(db.connection(), node_id, sensor_type, resolution, start=start)
+            return {
+                "node_id": node_id,
+                "sensor_type": sensor_type,
+                "resolution": resolution,
+                "buckets": buckets,
+                "count": len(buckets),
+                "success": True
+            }
+        except Exception as e:
+            logger.error(f"Failed to get trend: {str(e)}")
+            return {"message": f"Failed to get trend: {str(e)}", "success": False}
+        finally:
+            db.close()
+    
     async def _simulation_loop(self):
         """Main simulation loop that generates SCADA data"""
         logger.info("SCADA simulation loop started")
@@ -202,7 +223,6 @@ class SCADASimulator:
         if not network_state.is_loaded:
             return
         
-        db = SessionLocal()
         try:
             current_time = datetime.now()
             
@@ -212,119 +232,48 @@ class SCADASimulator:
                 raise Exception("Baseline not established. Please establish baseline first.")
             
             # Generate SCADA data based on baseline + realistic variations
-            await self._generate_baseline_based_data(db, current_time)
+            buffer = ingestion_pipeline.buffer
+            await self._generate_baseline_based_data(buffer, current_time)
             
-            db.commit()
-            logger.debug(f"Generated SCADA data based on baseline + variations")
+            # Push the changed sensors to the stream subscribers before the write
+            stream_hub.publish_readings(buffer.node_id, buffer.sensor_type, buffer.value, buffer.unit, current_time)
+            
+            # One bulk insert per tick, written on the ingestion thread
+            rows = await ingestion_pipeline.flush_async(current_time)
+            logger.debug(f"Generated {rows} SCADA readings based on baseline + variations")
             
         except Exception as e:
             logger.error(f"Error generating SCADA data: {str(e)}")
-            db.rollback()
-        finally:
-            db.close()
+            ingestion_pipeline.buffer.clear()
     
-    async def _generate_baseline_based_data(self, db, current_time: datetime):
-        """Generate SCADA data based on baseline + realistic variations"""
+    async def _generate_baseline_based_data(self, buffer: ReadingBuffer, current_time: datetime):
+        """Generate SCADA data from the baseline profile at the current time of day + sensor noise"""
         try:
-            # Get baseline values
-            baseline_pressures = baseline_engine.get_baseline_pressures()
-            baseline_flows = baseline_engine.get_baseline_flows()
-            baseline_levels = baseline_engine.get_baseline_tank_levels()
+            # Baseline values interpolated at the current time, diurnal variation included
+            baseline = baseline_engine.get_baseline_arrays(current_time)
             
-            # Generate pressure readings with realistic variations
-            for junction_id, baseline_pressure in baseline_pressures.items():
-                # Add time-of-day variation (±20% typical for water systems)
-                time_variation = self._get_time_of_day_variation(current_time)
-                variation_factor = 1.0 + (time_variation * 0.2)  # ±20% max variation
-                
-                # Add random noise (±2% typical sensor noise)
-                noise_factor = 1.0 + random.gauss(0, 0.02)
-                
-                # Calculate final pressure
-                final_pressure = baseline_pressure * variation_factor * noise_factor
-                
-                # Ensure reasonable pressure range (10-150 PSI)
-                final_pressure = max(10, min(150, final_pressure))
-                
-                reading = SCADAReading(
-                    node_id=junction_id,
-                    sensor_type="pressure",
-                    value=round(final_pressure, 2),
-                    unit="psi",
-                    quality="good"
-                )
-                db.add(reading)
+            # Pressure readings: ±2% sensor noise, 10-150 PSI
+            junction_ids, pressures = baseline['pressures']
+            pressures = self._add_noise(pressures, 0.02)
+            buffer.extend(junction_ids, "pressure", np.clip(pressures, 10, 150).round(2), "psi")
             
-            # Generate flow readings with realistic variations
-            for pump_id, baseline_flow in baseline_flows.items():
-                # Add time-of-day variation (±30% typical for pump flows)
-                time_variation = self._get_time_of_day_variation(current_time)
-                variation_factor = 1.0 + (time_variation * 0.3)  # ±30% max variation
-                
-                # Add random noise (±5% typical flow meter noise)
-                noise_factor = 1.0 + random.gauss(0, 0.05)
-                
-                # Calculate final flow
-                final_flow = baseline_flow * variation_factor * noise_factor
-                
-                # Ensure non-negative flow
-                final_flow = max(0, final_flow)
-                
-                reading = SCADAReading(
-                    node_id=pump_id,
-                    sensor_type="flow",
-                    value=round(final_flow, 2),
-                    unit="gpm",
-                    quality="good"
-                )
-                db.add(reading)
+            # Pump flow readings: ±5% flow meter noise, non-negative
+            pump_ids, flows = baseline['flows']
+            flows = self._add_noise(flows, 0.05)
+            buffer.extend(pump_ids, "flow", np.maximum(flows, 0).round(2), "gpm")
             
-            # Generate tank level readings with realistic variations
-            for tank_id, baseline_level in baseline_levels.items():
-                # Add time-of-day variation (±15% typical for tank levels)
-                time_variation = self._get_time_of_day_variation(current_time)
-                variation_factor = 1.0 + (time_variation * 0.15)  # ±15% max variation
-                
-                # Add random noise (±1% typical level sensor noise)
-                noise_factor = 1.0 + random.gauss(0, 0.01)
-                
-                # Calculate final level
-                final_level = baseline_level * variation_factor * noise_factor
-                
-                # Ensure non-negative level
-                final_level = max(0, final_level)
-                
-                reading = SCADAReading(
-                    node_id=tank_id,
-                    sensor_type="level",
-                    value=round(final_level, 2),
-                    unit="ft",
-                    quality="good"
-                )
-                db.add(reading)
+            # Tank level readings: ±1% level sensor noise, non-negative
+            tank_ids, levels = baseline['tank_levels']
+            levels = self._add_noise(levels, 0.01)
+            buffer.extend(tank_ids, "level", np.maximum(levels, 0).round(2), "ft")
                 
         except Exception as e:
             logger.error(f"Error generating baseline-based data: {str(e)}")
             raise
     
-    def _get_time_of_day_variation(self, current_time: datetime) -> float:
-        """Get time-of-day variation factor (-1 to +1)"""
-        hour = current_time.hour
-        
-        # Typical water system variation pattern
-        # Morning peak (7-9 AM): +0.5 to +1.0
-        # Evening peak (6-8 PM): +0.3 to +0.8
-        # Night low (2-5 AM): -0.5 to -0.8
-        # Day normal (10 AM-5 PM): -0.2 to +0.2
-        
-        if 7 <= hour <= 9:  # Morning peak
-            return random.uniform(0.5, 1.0)
-        elif 18 <= hour <= 20:  # Evening peak
-            return random.uniform(0.3, 0.8)
-        elif 2 <= hour <= 5:  # Night low
-            return random.uniform(-0.8, -0.5)
-        else:  # Normal day
-            return random.uniform(-0.2, 0.2)
+    def _add_noise(self, values: np.ndarray, noise: float) -> np.ndarray:
+        """Baseline values times a relative sensor noise, drawn per reading"""
+        return values * (1.0 + self._rng.normal(0, noise, len(values)))
     
     def _run_hydraulic_simulation(self, network, demands: Dict[str, float]) -> Optional[Dict[str, Any]]:
         """
@@ -374,7 +323,7 @@ class SCADASimulator:
                 pass
             return None
     
-    async def _store_pressure_readings(self, db, results: Dict[str, Any]):
+    async def _store_pressure_readings(self, buffer: ReadingBuffer, results: Dict[str, Any]):
         """Store pressure readings with sensor noise"""
         junction_ids = results['junction_ids']
         pressures = results['pressures']
@@ -392,16 +341,9 @@ class SCADASimulator:
                 # Ensure reasonable pressure range (10-150 PSI)
                 final_pressure = max(10, min(150, final_pressure))
                 
-                reading = SCADAReading(
-                    node_id=junction_id,
-                    sensor_type="pressure",
-                    value=round(final_pressure, 2),
-                    unit="psi",
-                    quality="good"
-                )
-                db.add(reading)
+                buffer.add(junction_id, "pressure", round(final_pressure, 2), "psi")
     
-    async def _store_flow_readings(self, db, results: Dict[str, Any]):
+    async def _store_flow_readings(self, buffer: ReadingBuffer, results: Dict[str, Any]):
         """Store flow readings for pumps and instrumented pipes"""
         pump_ids = results['pump_ids']
         flows = results['flows']
@@ -421,18 +363,11 @@ class SCADASimulator:
                     # Ensure non-negative flow
                     final_flow = max(0, final_flow)
                     
-                    reading = SCADAReading(
-                        node_id=pump_id,
-                        sensor_type="flow",
-                        value=round(final_flow, 2),
-                        unit="gpm",
-                        quality="good"
-                    )
-                    db.add(reading)
+                    buffer.add(pump_id, "flow", round(final_flow, 2), "gpm")
             except Exception as e:
                 logger.warning(f"Could not get flow for pump {pump_id}: {str(e)}")
     
-    async def _store_tank_levels(self, db, results: Dict[str, Any]):
+    async def _store_tank_levels(self, buffer: ReadingBuffer, results: Dict[str, Any]):
         """Store tank level readings"""
         tank_ids = results['tank_ids']
         tank_levels = results['tank_levels']
@@ -449,14 +384,7 @@ class SCADASimulator:
                 # Ensure non-negative level
                 final_level = max(0, final_level)
                 
-                reading = SCADAReading(
-                    node_id=tank_id,
-                    sensor_type="level",
-                    value=round(final_level, 2),
-                    unit="ft",
-                    quality="good"
-                )
-                db.add(reading)
+                buffer.add(tank_id, "level", round(final_level, 2), "ft")
     
 
 # Global simulator instance
@@ -0,0 +1,157 @@
+"""
+Simulation Worker Service
+Runs EPANET jobs on a dedicated thread with its own network handle
+The event loop only awaits results, so API requests are served while solves run
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Hashable, Optional
+
+import epyt
+
+from services.network_state import network_state
+
+logger = logging.getLogger(__name__)
+
+
+class SimulationCancelled(Exception):
+    """Raised inside a job when all the requests waiting for it were cancelled"""
+
+
+class _Job:
+    """A submitted job, shared by every request with the same key"""
+
+    def __init__(self, future: asyncio.Future, cancel: threading.Event):
+        self.future = future
+        self.cancel = cancel
+        self.waiters = 0
+
+
+class SimulationWorker:
+    """
+    Single worker thread that owns an epanet handle separate from network_state
+    Requests with the same key while a job is pending share its result, and a job
+    whose requests were all cancelled is dropped or told to stop
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="epanet-worker")
+        self._network = None
+        self._network_path: Optional[str] = None
+        self._pending: Dict[Hashable, _Job] = {}
+        self._stats = {"submitted": 0, "coalesced": 0, "completed": 0, "cancelled": 0, "failed": 0}
+        self._busy_seconds = 0.0
+
+    async def submit(self, key: Hashable, job: Callable, *args) -> Any:
+        """
+        Run job(network, cancel_event, *args) on the worker thread and await its result
+        A pending job with the same key is awaited instead of starting another one
+        """
+        job_entry = self._pending.get(key)
+        if job_entry is None:
+            cancel = threading.Event()
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._run, job, cancel, args)
+            job_entry = _Job(future, cancel)
+            self._pending[key] = job_entry
+            future.add_done_callback(lambda f, key=key, job_entry=job_entry: self._finished(key, job_entry))
+            self._stats["submitted"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        job_entry.waiters += 1
+        try:
+            return await asyncio.shield(job_entry.future)
+        except asyncio.CancelledError:
+            job_entry.waiters -= 1
+            if job_entry.future.cancelled():
+                # The job was cancelled through cancel(), not the awaiting request
+                raise SimulationCancelled(f"Simulation job {key!r} was cancelled") from None
+            if job_entry.waiters == 0 and not job_entry.future.done():
+                self._cancel(key, job_entry)
+            raise
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancel a pending job for all its requests, returns False if there is none"""
+        job_entry = self._pending.get(key)
+        if job_entry is None:
+            return False
+        self._cancel(key, job_entry)
+        return True
+
+    def _cancel(self, key: Hashable, job_entry: _Job):
+        # Jobs that have not started are dropped, running jobs see the event at their next check
+        job_entry.cancel.set()
+        job_entry.future.cancel()
+        if self._pending.get(key) is job_entry:
+            del self._pending[key]
+        self._stats["cancelled"] += 1
+        logger.info(f"Simulation job {key!r} cancelled")
+
+    def _finished(self, key: Hashable, job_entry: _Job):
+        if self._pending.get(key) is job_entry:
+            del self._pending[key]
+        if job_entry.future.cancelled() or isinstance(job_entry.future.exception(), SimulationCancelled):
+            # Counted by _cancel
+            return
+        if job_entry.future.exception() is not None:
+            self._stats["failed"] += 1
+            logger.error(f"Simulation job {key!r} failed: {job_entry.future.exception()}")
+        else:
+            self._stats["completed"] += 1
+
+    def _run(self, job: Callable, cancel: threading.Event, args) -> Any:
+        """Runs on the worker thread"""
+        if cancel.is_set():
+            raise SimulationCancelled("Cancelled before start")
+        start = time.perf_counter()
+        try:
+            return job(self._get_network(), cancel, *args)
+        finally:
+            self._busy_seconds += time.perf_counter() - start
+
+    def _get_network(self):
+        """The worker's own handle of the loaded network, reloaded when the network changes"""
+        path = network_state.network_path
+        if path is None:
+            raise ValueError("No network loaded")
+        if path != self._network_path:
+            self._unload()
+            # Project handle API, so this handle does not share solver state with network_state
+            self._network = epyt.epanet(path, ph=True, display_msg=False)
+            self._network_path = path
+            logger.info(f"Simulation worker loaded {path}")
+        return self._network
+
+    def _unload(self):
+        if self._network is not None:
+            try:
+                self._network.unload()
+            except Exception as e:
+                logger.warning(f"Failed to unload worker network: {str(e)}")
+        self._network = None
+        self._network_path = None
+
+    def reset(self):
+        """Drop the worker's network handle, after its current job, e.g. when the network is cleared"""
+        self._executor.submit(self._unload)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Job counters and the network of the worker"""
+        return {
+            **self._stats,
+            "pending": len(self._pending),
+            "busy_seconds": round(self._busy_seconds, 3),
+            "network_file": self._network_path
+        }
+
+    def shutdown(self):
+        """Stop the worker thread after the running job"""
+        self.reset()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global simulation worker
+simulation_worker = SimulationWorker()
@@ -0,0 +1,147 @@
+"""
+SCADA Stream Hub
+Pushes the simulator readings and monitoring anomalies to WebSocket and SSE subscribers
+A subscriber gets one snapshot on connect, then per-tick deltas of the sensors that changed
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Sequence, Set
+
+import numpy as np
+
+from config import STREAM_QUANTUM, STREAM_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch_ms(timestamp: Optional[datetime]) -> int:
+    return int((timestamp.timestamp() if timestamp else time.time()) * 1000)
+
+
+class StreamHub:
+    """
+    Fan-out of encoded messages to subscriber queues
+    Sensors are numbered in the order they first report, deltas carry numbers instead of ids,
+    and values are quantized to STREAM_QUANTUM so noise below it is not sent
+    Every message is encoded once, whatever the number of subscribers
+    """
+
+    def __init__(self, quantum: float = STREAM_QUANTUM, queue_size: int = STREAM_QUEUE_SIZE):
+        self.quantum = quantum
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._messages = 0
+        self._bytes = 0
+        self._resyncs = 0
+        self.reset()
+
+    def reset(self):
+        """Forget all sensors, e.g. when another network is loaded, subscribers get a new snapshot"""
+        self.keys: List[List[str]] = []
+        self.positions: Dict[tuple, int] = {}
+        self.values = np.empty(0, dtype=np.int64)
+        self.seq = 0
+        self.updated_at: Optional[datetime] = None
+        for queue in list(self._subscribers):
+            self._resync(queue)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Register a subscriber, its queue starts with a snapshot of the current values"""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        queue.put_nowait(self.snapshot())
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def snapshot(self) -> str:
+        """All sensors with their last values, encoded"""
+        return self._encode({
+            "type": "snapshot",
+            "seq": self.seq,
+            "t": _epoch_ms(self.updated_at),
+            "quantum": self.quantum,
+            "keys": self.keys,
+            "v": self.values.tolist()
+        })
+
+    def publish_readings(self, node_ids: Sequence[str], sensor_types: Sequence[str], values,
+                         units: Sequence[str], timestamp: Optional[datetime] = None) -> int:
+        """
+        Send the readings of one tick, as columns, to all subscribers
+        Returns the number of sensors in the delta
+        """
+        values = np.rint(np.asarray(values, dtype=float) / self.quantum).astype(np.int64)
+        indices = np.empty(len(values), dtype=np.int64)
+        new_keys = []
+        for k, key in enumerate(zip(node_ids, sensor_types)):
+            i = self.positions.get(key)
+            if i is None:
+                i = self.positions[key] = len(self.keys) + len(new_keys)
+                new_keys.append([key[0], key[1], units[k]])
+            indices[k] = i
+        if new_keys:
+            self.keys.extend(new_keys)
+            # New sensors start with a value no reading can have, so their first reading is sent
+            self.values = np.concatenate([self.values, np.full(len(new_keys), np.iinfo(np.int64).min)])
+
+        changed = self.values[indices] != values
+        indices, values = indices[changed], values[changed]
+        self.values[indices] = values
+        self.seq += 1
+        self.updated_at = timestamp or datetime.now()
+        if self._subscribers and (len(indices) or new_keys):
+            message = {"type": "delta", "seq": self.seq, "t": _epoch_ms(self.updated_at),
+                       "i": indices.tolist(), "v": values.tolist()}
+            if new_keys:
+                message["keys"] = new_keys
+            self._broadcast(self._encode(message))
+        return len(indices)
+
+    def publish_anomalies(self, anomalies: List[Dict[str, Any]], timestamp: Optional[datetime] = None):
+        """Send the anomalies of one monitoring analysis as [node_id, sensor_type, severity, deviation_pct] rows"""
+        if not self._subscribers:
+            return
+        rows = [
+            [a["node_id"], a["sensor_type"], a.get("severity"), round(a["deviation_pct"], 1)]
+            for a in anomalies
+        ]
+        self._broadcast(self._encode({"type": "anomalies", "t": _epoch_ms(timestamp), "a": rows}))
+
+    def _encode(self, message: Dict[str, Any]) -> str:
+        return json.dumps(message, separators=(",", ":"))
+
+    def _broadcast(self, text: str):
+        self._messages += 1
+        self._bytes += len(text)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(text)
+            except asyncio.QueueFull:
+                self._resync(queue)
+
+    def _resync(self, queue: asyncio.Queue):
+        # A subscriber that fell behind skips the queued deltas and starts over from a snapshot
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(self.snapshot())
+        self._resyncs += 1
+
+    def get_status(self) -> Dict[str, Any]:
+        """Subscribers, sensors and traffic since startup"""
+        return {
+            "subscribers": len(self._subscribers),
+            "sensors": len(self.keys),
+            "seq": self.seq,
+            "messages": self._messages,
+            "bytes_encoded": self._bytes,
+            "resyncs": self._resyncs
+        }
+
+
+# Global stream hub
+stream_hub = StreamHub()
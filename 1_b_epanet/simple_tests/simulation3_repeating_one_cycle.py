@@ -1,74 +1,36 @@
 import time
-import random
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from threading import Event, Thread
-from epyt import epanet
+from epyt.session import SimulationSession
 
 
 # ================================================================
 # 1. Simulate sensor data (replace with real API/MQTT later)
 # ================================================================
-def get_sensor_data(structure):
-    """Return a dict of simulated real-time sensor data."""
-    data = {
-        "demands": {},
-        "pump_status": {},
-        "tank_levels": {},
+def get_sensor_data(session, rng=np.random.default_rng()):
+    """Return a dict of simulated real-time sensor arrays, ordered like the session indices."""
+    return {
+        "demand_multipliers": rng.uniform(0.8, 1.2, len(session.junction_index)),
+        "pump_status": rng.integers(0, 2, len(session.pump_index)),
+        "tank_levels": rng.uniform(2.0, 6.0, len(session.tank_index)),
     }
 
-    for j in structure["junctions"]:
-        data["demands"][j] = random.uniform(0.8, 1.2)
-
-    for p in structure["pumps"]:
-        data["pump_status"][p] = random.choice([0, 1])
-
-    for t in structure["tanks"]:
-        data["tank_levels"][t] = random.uniform(2.0, 6.0)
-
-    return data
-
 
 # ================================================================
 # 2. One-cycle run (snapshot)
 # ================================================================
-def run_snapshot(inp_file, log_list):
-    """Run one hydraulic snapshot using latest data."""
-    d = epanet(inp_file)
-    nodes = d.getNodeNameID()
-    links = d.getLinkNameID()
-
-    structure = {
-        "junctions": [n for n, t in zip(nodes, d.getNodeType()) if t == 0],
-        "tanks": [n for n, t in zip(nodes, d.getNodeType()) if t == 2],
-        "pumps": [l for l, t in zip(links, d.getLinkType()) if t == 2],
-    }
-
-    # Get "live" data
-    sensors = get_sensor_data(structure)
-
-    # Apply updates
-    for junc_id, factor in sensors["demands"].items():
-        base = d.getNodeBaseDemands(junc_id)
-        d.setNodeBaseDemands(junc_id, base * factor)
-
-    for pump_id, status in sensors["pump_status"].items():
-        d.setLinkStatus(pump_id, status)
-
-    for tank_id, level in sensors["tank_levels"].items():
-        try:
-            d.setNodeTankLevel(tank_id, level)
-        except Exception:
-            pass  # skip if not supported
+def run_snapshot(session, log_list):
+    """Run one hydraulic snapshot using latest data on the already loaded network."""
+    # Get "live" data and apply only what changed
+    session.set_state(**get_sensor_data(session))
 
     # Solve hydraulics
-    d.openHydraulicAnalysis()
-    d.initializeHydraulicAnalysis()
-    d.runHydraulicAnalysis()
-    d.closeHydraulicAnalysis()
+    snapshot = session.solve()
 
-    pressure = d.getNodePressure()[0]
-    flow = d.getLinkFlows()[0]
+    pressure = snapshot.Pressure[0]
+    flow = snapshot.Flow[0]
     timestamp = datetime.now()
 
     print(f"{timestamp:%H:%M:%S} | P={pressure:7.2f} m | Q={flow:7.2f} L/s")
@@ -79,9 +41,6 @@ def run_snapshot(inp_file, log_list):
         "flow_Ls": flow,
     })
 
-    # Clean up memory
-    del d
-
 
 # ================================================================
 # 3. Repeating timer for real-time loop
@@ -89,19 +48,20 @@ def run_snapshot(inp_file, log_list):
 def run_digital_twin_realtime(inp_file, interval=10, cycles=10):
     """
     Run EPANET snapshot simulation repeatedly, every `interval` seconds.
-    Each cycle reloads the network, reads sensor data, runs hydraulics,
-    and logs results.
+    The network is loaded once; each cycle reads sensor data, updates the
+    state, re-solves the hydraulics and logs results.
     """
     print("Starting timer-based EPANET digital twin...\n")
     stop_event = Event()
     logs = []
 
     def loop():
-        for _ in range(cycles):
-            if stop_event.is_set():
-                break
-            run_snapshot(inp_file, logs)
-            time.sleep(interval)
+        with SimulationSession(inp_file) as session:
+            for _ in range(cycles):
+                if stop_event.is_set():
+                    break
+                run_snapshot(session, logs)
+                time.sleep(interval)
         print("\nDigital twin loop completed.")
 
     thread = Thread(target=loop)
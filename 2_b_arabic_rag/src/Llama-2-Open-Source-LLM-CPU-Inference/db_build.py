@@ -2,6 +2,8 @@
 #  Module: Vector DB Build
 # =========================
 import box
+import faiss
+import numpy as np
 import yaml
 from langchain.vectorstores import FAISS
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -23,11 +25,32 @@ def run_db_build():
                                                    chunk_overlap=cfg.CHUNK_OVERLAP)
     texts = text_splitter.split_documents(documents)
 
-    embeddings = HuggingFaceEmbeddings(model_name='sentence-transformers/all-MiniLM-L6-v2',
+    embeddings = HuggingFaceEmbeddings(model_name=cfg.EMBEDDING_MODEL,
                                        model_kwargs={'device': 'cpu'})
 
     vectorstore = FAISS.from_documents(texts, embeddings)
+    vectorstore.index = build_index(vectorstore.index, cfg.FAISS_INDEX_TYPE)
     vectorstore.save_local(cfg.DB_FAISS_PATH)
 
+
+# Rebuild the exact index as an approximate one for large corpora
+def build_index(flat_index, index_type):
+    if index_type == 'flat':
+        return flat_index
+
+    vectors = flat_index.reconstruct_n(0, flat_index.ntotal).astype(np.float32)
+    dim = flat_index.d
+    if index_type == 'ivf':
+        # FAISS wants about 39 training vectors per list
+        nlist = max(1, min(cfg.IVF_NLIST, len(vectors) // 39))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.train(vectors)
+    elif index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, cfg.HNSW_M)
+    else:
+        raise ValueError(f"Unknown FAISS_INDEX_TYPE '{index_type}', use 'flat', 'ivf' or 'hnsw'")
+    index.add(vectors)
+    return index
+
 if __name__ == "__main__":
     run_db_build()
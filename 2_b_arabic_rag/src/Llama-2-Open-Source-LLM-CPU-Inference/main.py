@@ -2,8 +2,11 @@ import box
 import timeit
 import yaml
 import argparse
+import json
+import urllib.request
 from dotenv import find_dotenv, load_dotenv
 from src.utils import setup_dbqa
+from langchain.docstore.document import Document
 
 # Load environment variables from .env file
 load_dotenv(find_dotenv())
@@ -21,14 +24,27 @@ if __name__ == "__main__":
                         default='ما هي عقوبة بروز الحمولة عن عرض المركبة',
                         # default = 'What allowed Manchester United Football Club to borrow up to £75 million from Bank',
                         help='Enter the query to pass into the LLM')
+    parser.add_argument('--url',
+                        type=str,
+                        default=None,
+                        help='Ask a running retrieval service (server.py), e.g. http://127.0.0.1:8001, '
+                             'instead of loading the models here')
     
 
     args = parser.parse_args()
 
-    # Setup DBQA
     start = timeit.default_timer()
-    dbqa = setup_dbqa()
-    response = dbqa({'query': args.input})
+    if args.url:
+        request = urllib.request.Request(f'{args.url.rstrip("/")}/query',
+                                         data=json.dumps({'query': args.input}).encode('utf8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as http_response:
+            response = json.loads(http_response.read().decode('utf8'))
+        response['source_documents'] = [Document(**doc) for doc in response['source_documents']]
+    else:
+        # Setup DBQA
+        dbqa = setup_dbqa()
+        response = dbqa({'query': args.input})
     end = timeit.default_timer()
 
     print(f'\nAnswer: {response["result"]}')
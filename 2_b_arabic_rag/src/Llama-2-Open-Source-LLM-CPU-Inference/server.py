@@ -0,0 +1,64 @@
+'''
+===========================================
+        Module: Retrieval service HTTP endpoint
+===========================================
+'''
+import box
+import uvicorn
+import yaml
+from dotenv import find_dotenv, load_dotenv
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+
+from src.retrieval import RetrievalService
+
+# Load environment variables from .env file
+load_dotenv(find_dotenv())
+
+# Import config vars
+with open('config/config.yml', 'r', encoding='utf8') as ymlfile:
+    cfg = box.Box(yaml.safe_load(ymlfile))
+
+app = FastAPI(title='Document Q&A retrieval service')
+service = None
+
+
+class QueryRequest(BaseModel):
+    query: str
+    k: int = None
+
+
+@app.on_event('startup')
+def load_service():
+    # Embedder, index and LLM are loaded once, for all requests
+    global service
+    service = RetrievalService()
+
+
+@app.on_event('shutdown')
+def close_service():
+    if service is not None:
+        service.close()
+
+
+# Plain def: requests run in the threadpool, so concurrent questions share embedding batches
+@app.post('/query')
+def query(request: QueryRequest):
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail='Empty query')
+    response = service.answer(request.query, request.k)
+    response['source_documents'] = [
+        {'page_content': doc.page_content, 'metadata': doc.metadata}
+        for doc in response['source_documents']
+    ]
+    return response
+
+
+@app.get('/health')
+def health():
+    return {'status': 'ok' if service is not None else 'loading',
+            **(service.stats() if service is not None else {})}
+
+
+if __name__ == '__main__':
+    uvicorn.run(app, host=cfg.SERVICE_HOST, port=cfg.SERVICE_PORT)
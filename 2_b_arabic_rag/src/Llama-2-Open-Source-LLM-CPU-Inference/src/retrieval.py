@@ -0,0 +1,128 @@
+'''
+===========================================
+        Module: Long-lived retrieval service
+===========================================
+'''
+import queue
+import threading
+import timeit
+from concurrent.futures import Future
+
+import box
+import yaml
+
+from langchain.chains.question_answering import load_qa_chain
+from src.llm import build_llm
+from src.utils import build_embeddings, load_vectordb, set_qa_prompt
+
+# Import config vars
+with open('config/config.yml', 'r', encoding='utf8') as ymlfile:
+    cfg = box.Box(yaml.safe_load(ymlfile))
+
+
+class QueryBatcher:
+    """
+    Embeds the questions of concurrent requests with one model call
+    A batch is closed when it is full or EMBED_BATCH_WAIT_MS after its first question
+    """
+
+    def __init__(self, embeddings, batch_size=16, wait_ms=10):
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.wait = wait_ms / 1000
+        self.batches = 0
+        self.queries = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='query-batcher', daemon=True)
+        self._thread.start()
+
+    def embed(self, text):
+        """Embedding of one question, blocks until its batch is embedded"""
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = timeit.default_timer() + self.wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - timeit.default_timer()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            try:
+                vectors = self.embeddings.embed_documents([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector)
+            self.batches += 1
+            self.queries += len(batch)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class RetrievalService:
+    """
+    Keeps the embedding model, the FAISS index and the LLM loaded between questions,
+    so a question only pays for retrieval and generation
+    """
+
+    def __init__(self):
+        self.embeddings = build_embeddings()
+        self.vectordb = load_vectordb(self.embeddings)
+        self.llm = build_llm()
+        # Same prompt and 'stuff' chain as the RetrievalQA of setup_dbqa
+        self.chain = load_qa_chain(self.llm, chain_type='stuff', prompt=set_qa_prompt())
+        self.batcher = QueryBatcher(self.embeddings, cfg.EMBED_BATCH_SIZE, cfg.EMBED_BATCH_WAIT_MS)
+        # The GGML model runs one generation at a time
+        self._llm_lock = threading.Lock()
+
+    def retrieve(self, question, k=None):
+        vector = self.batcher.embed(question)
+        return self.vectordb.similarity_search_by_vector(vector, k=k or cfg.VECTOR_COUNT)
+
+    def answer(self, question, k=None):
+        start = timeit.default_timer()
+        docs = self.retrieve(question, k)
+        retrieved = timeit.default_timer()
+        with self._llm_lock:
+            waited = timeit.default_timer()
+            result = self.chain({'input_documents': docs, 'question': question}, return_only_outputs=True)
+        end = timeit.default_timer()
+
+        return {
+            'result': result['output_text'],
+            'source_documents': docs if cfg.RETURN_SOURCE_DOCUMENTS else [],
+            'timings': {
+                'retrieval': retrieved - start,
+                'llm_wait': waited - retrieved,
+                'generation': end - waited
+            }
+        }
+
+    def stats(self):
+        return {
+            'index_size': self.vectordb.index.ntotal,
+            'embedding_batches': self.batcher.batches,
+            'embedded_queries': self.batcher.queries
+        }
+
+    def close(self):
+        self.batcher.close()
@@ -3,7 +3,11 @@
         Module: Util functions
 ===========================================
 '''
+import os
+import pickle
+
 import box
+import faiss
 import yaml
 
 from langchain import PromptTemplate
@@ -37,10 +41,45 @@ def build_retrieval_qa(llm, prompt, vectordb):
     return dbqa
 
 
+def build_embeddings():
+    return HuggingFaceEmbeddings(model_name=cfg.EMBEDDING_MODEL,
+                                 model_kwargs={'device': 'cpu'})
+
+
+def load_vectordb(embeddings, path=None):
+    """
+    Load the FAISS vector store saved by db_build.py
+    The index is memory-mapped where FAISS supports it (IVF inverted lists),
+    so large indexes are paged in on demand instead of read whole
+    """
+    path = path or cfg.DB_FAISS_PATH
+    index_file = os.path.join(path, 'index.faiss')
+    try:
+        index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        index = faiss.read_index(index_file)
+    set_search_params(index)
+
+    # Same layout as FAISS.save_local: the docstore and the index -> docstore id map
+    with open(os.path.join(path, 'index.pkl'), 'rb') as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings.embed_query, index, docstore, index_to_docstore_id)
+
+
+def set_search_params(index):
+    """
+    Query-time accuracy/speed settings of approximate indexes
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = cfg.IVF_NPROBE
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = cfg.HNSW_EF_SEARCH
+
+
 def setup_dbqa():
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2",
-                                       model_kwargs={'device': 'cpu'})
-    vectordb = FAISS.load_local(cfg.DB_FAISS_PATH, embeddings)
+    embeddings = build_embeddings()
+    vectordb = load_vectordb(embeddings)
     llm = build_llm()
     qa_prompt = set_qa_prompt()
     dbqa = build_retrieval_qa(llm, qa_prompt, vectordb)